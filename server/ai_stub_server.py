@@ -0,0 +1,85 @@
+"""
+Локальная заглушка OpenRouter для офлайн-проверок и бенчмарков AI-шлюза.
+
+Отвечает на POST /v1/chat/completions в формате OpenRouter (обычный ответ
+и stream=true через SSE) детерминированным текстом с полем usage.
+Задержка и доля ошибок 429/500 настраиваются, чтобы проверять повторы.
+
+Запуск:
+    python ai_stub_server.py --port 8090 --latency-ms 800 --error-rate 0.1
+В .env:
+    OPENROUTER_BASE_URL=http://127.0.0.1:8090/v1
+    OPENROUTER_API_KEY=stub
+"""
+import argparse
+import asyncio
+import hashlib
+import json
+import random
+import time
+
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+app = FastAPI(title="OpenRouter stub")
+config = {"latency_ms": 500, "error_rate": 0.0, "chunks": 20}
+
+
+def _reply(prompt: str) -> str:
+    digest = hashlib.sha256(prompt.encode()).hexdigest()[:8]
+    return (
+        f"Здравствуйте! Тестовый отчёт {digest}.\n\n"
+        "📊 Посещаемость\n✅ Присутствовал — все уроки\n\n"
+        "📝 Домашние задания\nВыполнено полностью.\n\n"
+        "💡 Рекомендации\n• Продолжать в том же духе!\n\n"
+        "С уважением, администрация школы"
+    )
+
+
+@app.post("/v1/chat/completions")
+async def chat_completions(request: Request):
+    body = await request.json()
+    if random.random() < config["error_rate"]:
+        status = random.choice([429, 500])
+        headers = {"Retry-After": "1"} if status == 429 else {}
+        return JSONResponse({"error": {"message": "stub failure"}}, status_code=status, headers=headers)
+
+    prompt = "\n".join(m.get("content", "") for m in body.get("messages", []))
+    text = _reply(prompt)
+    usage = {"prompt_tokens": len(prompt) // 4, "completion_tokens": len(text) // 4}
+    latency = config["latency_ms"] / 1000
+
+    if not body.get("stream"):
+        await asyncio.sleep(latency)
+        return {
+            "id": f"stub-{time.time_ns()}",
+            "model": body.get("model", "stub"),
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": text}, "finish_reason": "stop"}],
+            "usage": {**usage, "total_tokens": sum(usage.values())},
+        }
+
+    async def events():
+        # Time to first token ~ a third of the latency, the rest spread over the chunks
+        await asyncio.sleep(latency / 3)
+        step = max(1, len(text) // config["chunks"])
+        for start in range(0, len(text), step):
+            chunk = {"choices": [{"index": 0, "delta": {"content": text[start:start + step]}}]}
+            yield f"data: {json.dumps(chunk, ensure_ascii=False)}\n\n"
+            await asyncio.sleep(latency * 2 / 3 / config["chunks"])
+        final = {"choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}], "usage": usage}
+        yield f"data: {json.dumps(final)}\n\n"
+        yield "data: [DONE]\n\n"
+
+    return StreamingResponse(events(), media_type="text/event-stream")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8090)
+    parser.add_argument("--latency-ms", type=int, default=500)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    args = parser.parse_args()
+    config.update(latency_ms=args.latency_ms, error_rate=args.error_rate)
+    uvicorn.run(app, host=args.host, port=args.port)
@@ -0,0 +1,25 @@
+"""exam answer keys and raw student answers
+
+Revision ID: a1n2s3k4e5y6
+Revises: p1r2o3g4r5s6
+Create Date: 2026-10-19
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+revision = "a1n2s3k4e5y6"
+down_revision = "p1r2o3g4r5s6"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column("exams", sa.Column("answer_key", postgresql.JSONB(), nullable=True))
+    op.add_column("exam_results", sa.Column("raw_answers", postgresql.JSONB(), nullable=True))
+
+
+def downgrade():
+    op.drop_column("exam_results", "raw_answers")
+    op.drop_column("exams", "answer_key")
@@ -0,0 +1,26 @@
+"""file_meta (thumbnails, LQIP) on chat messages
+
+Revision ID: c1h2t3f4m5
+Revises: n2w3a4t5e6
+Create Date: 2026-10-19
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+revision = "c1h2t3f4m5"
+down_revision = "n2w3a4t5e6"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column(
+        "chat_messages",
+        sa.Column("file_meta", postgresql.JSONB(), nullable=True),
+    )
+
+
+def downgrade():
+    op.drop_column("chat_messages", "file_meta")
@@ -0,0 +1,27 @@
+"""index chat_messages.file_url for download names
+
+Revision ID: c2f3i4l5e6n7
+Revises: n3p4u5b6a7t8
+Create Date: 2026-10-19
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "c2f3i4l5e6n7"
+down_revision = "n3p4u5b6a7t8"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index(
+        "ix_chat_messages_file_url",
+        "chat_messages",
+        ["file_url"],
+        postgresql_where=sa.text("file_url IS NOT NULL"),
+    )
+
+
+def downgrade():
+    op.drop_index("ix_chat_messages_file_url", table_name="chat_messages")
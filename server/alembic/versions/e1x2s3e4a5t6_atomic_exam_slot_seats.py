@@ -0,0 +1,67 @@
+"""atomic exam slot seats: registered_count, waitlist, unique registration
+
+Revision ID: e1x2s3e4a5t6
+Revises: s2t3o4r5e6
+Create Date: 2026-10-19
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "e1x2s3e4a5t6"
+down_revision = "s2t3o4r5e6"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column(
+        "exam_time_slots",
+        sa.Column("registered_count", sa.Integer(), nullable=False, server_default="0"),
+    )
+    op.add_column(
+        "exam_time_slots",
+        sa.Column("waitlist_enabled", sa.Boolean(), nullable=False, server_default="false"),
+    )
+    op.add_column(
+        "exam_registrations",
+        sa.Column("status", sa.String(20), nullable=False, server_default="registered"),
+    )
+
+    # Duplicates left by the old check-then-insert race: keep the earliest registration
+    op.execute("""
+        DELETE FROM exam_registrations r
+        USING exam_registrations older
+        WHERE older.student_id = r.student_id
+          AND older.time_slot_id = r.time_slot_id
+          AND (older.registered_at, older.id) < (r.registered_at, r.id)
+    """)
+    op.create_unique_constraint(
+        "uq_exam_registrations_student_slot",
+        "exam_registrations",
+        ["student_id", "time_slot_id"],
+    )
+    op.create_index(
+        "ix_exam_registrations_slot_status",
+        "exam_registrations",
+        ["time_slot_id", "status", "registered_at"],
+    )
+
+    op.execute("""
+        UPDATE exam_time_slots s
+        SET registered_count = c.n
+        FROM (
+            SELECT time_slot_id, count(*) AS n
+            FROM exam_registrations
+            GROUP BY time_slot_id
+        ) c
+        WHERE c.time_slot_id = s.id
+    """)
+
+
+def downgrade():
+    op.drop_index("ix_exam_registrations_slot_status", table_name="exam_registrations")
+    op.drop_constraint("uq_exam_registrations_student_slot", "exam_registrations", type_="unique")
+    op.drop_column("exam_registrations", "status")
+    op.drop_column("exam_time_slots", "waitlist_enabled")
+    op.drop_column("exam_time_slots", "registered_count")
@@ -0,0 +1,23 @@
+"""add holidays calendar to settings
+
+Revision ID: h2o3l4i5d6
+Revises: p1u2s3h4
+Create Date: 2026-10-19
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+revision = "h2o3l4i5d6"
+down_revision = "p1u2s3h4"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column("settings", sa.Column("holidays", postgresql.JSONB(), nullable=True))
+
+
+def downgrade():
+    op.drop_column("settings", "holidays")
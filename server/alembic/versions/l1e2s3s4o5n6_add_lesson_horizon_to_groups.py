@@ -0,0 +1,27 @@
+"""add rolling lesson horizon fields to groups
+
+Revision ID: l1e2s3s4o5n6
+Revises: h2o3l4i5d6
+Create Date: 2026-10-19
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "l1e2s3s4o5n6"
+down_revision = "h2o3l4i5d6"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column("groups", sa.Column("lessons_generated_until", sa.Date(), nullable=True))
+    op.add_column(
+        "groups",
+        sa.Column("schedule_changed", sa.Boolean(), server_default=sa.false(), nullable=False),
+    )
+
+
+def downgrade():
+    op.drop_column("groups", "schedule_changed")
+    op.drop_column("groups", "lessons_generated_until")
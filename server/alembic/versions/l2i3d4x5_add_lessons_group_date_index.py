@@ -0,0 +1,21 @@
+"""add composite (group_id, date) index on lessons
+
+Revision ID: l2i3d4x5
+Revises: l1e2s3s4o5n6
+Create Date: 2026-10-19
+
+"""
+from alembic import op
+
+revision = "l2i3d4x5"
+down_revision = "l1e2s3s4o5n6"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index("ix_lessons_group_id_date", "lessons", ["group_id", "date"])
+
+
+def downgrade():
+    op.drop_index("ix_lessons_group_id_date", table_name="lessons")
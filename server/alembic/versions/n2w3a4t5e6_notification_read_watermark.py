@@ -0,0 +1,75 @@
+"""notification read watermark on students
+
+Revision ID: n2w3a4t5e6
+Revises: l2i3d4x5
+Create Date: 2026-10-19
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "n2w3a4t5e6"
+down_revision = "l2i3d4x5"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column(
+        "students",
+        sa.Column("notifications_read_up_to", sa.TIMESTAMP(timezone=True), nullable=True),
+    )
+    op.create_index(
+        "ix_notifications_published_created_at",
+        "notifications",
+        ["created_at"],
+        postgresql_where=sa.text("is_published"),
+    )
+
+    # Watermark = newest published notification before the student's first unread one
+    op.execute("""
+        WITH first_unread AS (
+            SELECT rd.student_id,
+                   (SELECT min(n.created_at)
+                      FROM notifications n
+                     WHERE n.is_published
+                       AND NOT EXISTS (
+                           SELECT 1 FROM notification_reads r
+                            WHERE r.notification_id = n.id AND r.student_id = rd.student_id
+                       )) AS ts
+              FROM (SELECT DISTINCT student_id FROM notification_reads) rd
+        )
+        UPDATE students s
+           SET notifications_read_up_to = (
+               SELECT max(n.created_at)
+                 FROM notifications n
+                WHERE n.is_published AND (fu.ts IS NULL OR n.created_at < fu.ts)
+           )
+          FROM first_unread fu
+         WHERE s.id = fu.student_id
+    """)
+
+    # Explicit reads covered by the watermark are redundant
+    op.execute("""
+        DELETE FROM notification_reads r
+         USING notifications n, students s
+         WHERE r.notification_id = n.id
+           AND r.student_id = s.id
+           AND s.notifications_read_up_to IS NOT NULL
+           AND n.created_at <= s.notifications_read_up_to
+    """)
+
+
+def downgrade():
+    # Expand watermarks back into per-notification rows
+    op.execute("""
+        INSERT INTO notification_reads (id, notification_id, student_id, read_at)
+        SELECT gen_random_uuid(), n.id, s.id, now()
+          FROM students s
+          JOIN notifications n
+            ON n.is_published AND n.created_at <= s.notifications_read_up_to
+         WHERE s.notifications_read_up_to IS NOT NULL
+        ON CONFLICT ON CONSTRAINT uq_notification_reads_notif_student DO NOTHING
+    """)
+    op.drop_index("ix_notifications_published_created_at", table_name="notifications")
+    op.drop_column("students", "notifications_read_up_to")
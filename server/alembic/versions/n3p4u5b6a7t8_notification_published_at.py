@@ -0,0 +1,43 @@
+"""notification published_at for the read watermark
+
+Revision ID: n3p4u5b6a7t8
+Revises: w1e2e3k4l5y6
+Create Date: 2026-10-19
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "n3p4u5b6a7t8"
+down_revision = "w1e2e3k4l5y6"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column(
+        "notifications",
+        sa.Column("published_at", sa.TIMESTAMP(timezone=True), nullable=True),
+    )
+    # The real publication time of old rows is unknown; created_at is what the
+    # watermark backfill (n2w3a4t5e6) compared with, so existing read states don't change
+    op.execute("UPDATE notifications SET published_at = created_at WHERE is_published")
+
+    op.drop_index("ix_notifications_published_created_at", table_name="notifications")
+    op.create_index(
+        "ix_notifications_published_at",
+        "notifications",
+        ["published_at"],
+        postgresql_where=sa.text("is_published"),
+    )
+
+
+def downgrade():
+    op.drop_index("ix_notifications_published_at", table_name="notifications")
+    op.create_index(
+        "ix_notifications_published_created_at",
+        "notifications",
+        ["created_at"],
+        postgresql_where=sa.text("is_published"),
+    )
+    op.drop_column("notifications", "published_at")
@@ -0,0 +1,24 @@
+"""indexes for exam result analytics and student progress
+
+Revision ID: p1r2o3g4r5s6
+Revises: e1x2s3e4a5t6
+Create Date: 2026-10-19
+
+"""
+from alembic import op
+
+revision = "p1r2o3g4r5s6"
+down_revision = "e1x2s3e4a5t6"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index("ix_exam_results_student_id", "exam_results", ["student_id"])
+    # Cohort windows: PARTITION BY exam_id ORDER BY final_score
+    op.create_index("ix_exam_results_exam_id_final_score", "exam_results", ["exam_id", "final_score"])
+
+
+def downgrade():
+    op.drop_index("ix_exam_results_exam_id_final_score", table_name="exam_results")
+    op.drop_index("ix_exam_results_student_id", table_name="exam_results")
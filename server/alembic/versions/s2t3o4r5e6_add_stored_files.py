@@ -0,0 +1,37 @@
+"""content-addressed stored_files
+
+Revision ID: s2t3o4r5e6
+Revises: c1h2t3f4m5
+Create Date: 2026-10-19
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+revision = "s2t3o4r5e6"
+down_revision = "c1h2t3f4m5"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        "stored_files",
+        sa.Column("id", postgresql.UUID(as_uuid=True), primary_key=True),
+        sa.Column("key", sa.String(500), nullable=False),
+        sa.Column("prefix", sa.String(50), nullable=False),
+        sa.Column("sha256", sa.String(64), nullable=False),
+        sa.Column("size", sa.BigInteger(), nullable=False),
+        sa.Column("content_type", sa.String(200), nullable=False),
+        sa.Column("ref_count", sa.Integer(), nullable=False, server_default="1"),
+        sa.Column("meta", postgresql.JSONB(), nullable=True),
+        sa.Column("created_at", sa.TIMESTAMP(timezone=True), nullable=True),
+        sa.Column("last_uploaded_at", sa.TIMESTAMP(timezone=True), nullable=True),
+        sa.UniqueConstraint("key", name="uq_stored_files_key"),
+        sa.UniqueConstraint("prefix", "sha256", name="uq_stored_files_prefix_sha256"),
+    )
+
+
+def downgrade():
+    op.drop_table("stored_files")
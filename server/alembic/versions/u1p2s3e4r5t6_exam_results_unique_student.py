@@ -0,0 +1,34 @@
+"""one result per student per exam
+
+Revision ID: u1p2s3e4r5t6
+Revises: a1n2s3k4e5y6
+Create Date: 2026-10-19
+
+"""
+from alembic import op
+
+revision = "u1p2s3e4r5t6"
+down_revision = "a1n2s3k4e5y6"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Keep the most recently edited result of each (exam, student)
+    op.execute("""
+        DELETE FROM exam_results r
+         USING (
+            SELECT id,
+                   row_number() OVER (
+                       PARTITION BY exam_id, student_id
+                       ORDER BY COALESCE(updated_at, added_at) DESC, id
+                   ) AS rn
+              FROM exam_results
+         ) d
+         WHERE r.id = d.id AND d.rn > 1
+    """)
+    op.create_unique_constraint("uq_exam_results_exam_student", "exam_results", ["exam_id", "student_id"])
+
+
+def downgrade():
+    op.drop_constraint("uq_exam_results_exam_student", "exam_results", type_="unique")
@@ -0,0 +1,27 @@
+"""index for the latest weekly report per student
+
+Revision ID: w1e2e3k4l5y6
+Revises: u1p2s3e4r5t6
+Create Date: 2026-10-19
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "w1e2e3k4l5y6"
+down_revision = "u1p2s3e4r5t6"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # DISTINCT ON (student_id) ... ORDER BY student_id, created_at DESC
+    op.create_index(
+        "ix_weekly_reports_student_id_created_at",
+        "weekly_reports",
+        ["student_id", sa.text("created_at DESC")],
+    )
+
+
+def downgrade():
+    op.drop_index("ix_weekly_reports_student_id_created_at", table_name="weekly_reports")
@@ -7,8 +7,24 @@ class Settings(BaseSettings):
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 60
     REFRESH_TOKEN_EXPIRE_DAYS: int = 7
     ALGORITHM: str = "HS256"
+    # Bearer token for GET /metrics (Prometheus); empty disables the endpoint
+    METRICS_TOKEN: str = ""
+    # X-DB-Query-Count / X-DB-Time-Ms on every response (dev and tests)
+    DB_QUERY_DEBUG_HEADERS: bool = False
+    # Statements slower than this are logged with their EXPLAIN plan
+    DB_SLOW_QUERY_MS: int = 500
+    DB_SLOW_QUERY_EXPLAIN: bool = True
     OPENROUTER_API_KEY: str = ""
 
+    # AI gateway (app/services/ai.py); point OPENROUTER_BASE_URL at ai_stub_server.py to work offline
+    OPENROUTER_BASE_URL: str = "https://openrouter.ai/api/v1"
+    AI_MODEL: str = "qwen/qwen3.5-plus-02-15"
+    AI_MAX_CONCURRENCY: int = 4
+    AI_TIMEOUT_SECONDS: float = 60.0
+    AI_MAX_RETRIES: int = 3
+    AI_CACHE_TTL_SECONDS: int = 86400
+    WEEKLY_REPORT_BATCH_CHUNK: int = 25
+
     # S3 storage for chat file attachments
     S3_ENDPOINT_URL: str = ""
     S3_ACCESS_KEY: str = ""
@@ -29,6 +45,29 @@ class Settings(BaseSettings):
     SMTP_FROM_NAME: str = "Школа Гарри"
     SMTP_USE_SSL: bool = True
 
+    # Background lesson scheduler: keeps future lessons generated N weeks ahead
+    LESSON_SCHEDULER_ENABLED: bool = True
+    LESSON_SCHEDULER_INTERVAL_MINUTES: int = 60
+    LESSON_HORIZON_WEEKS: int = 8
+    LESSON_HORIZON_SLACK_DAYS: int = 7
+
+    # Portal content cache (banners, home info, plans, subjects); cross-worker invalidation via LISTEN/NOTIFY
+    PORTAL_CACHE_TTL_SECONDS: int = 600
+    PORTAL_CACHE_CLIENT_MAX_AGE: int = 0
+    PORTAL_CACHE_LISTENER_ENABLED: bool = True
+
+    # Local disk LRU cache for S3 objects served by the API (avatars, banner images)
+    FILE_CACHE_DIR: str = "/tmp/crm_file_cache"
+    FILE_CACHE_MAX_MB: int = 512
+
+    # Processes rendering chat image thumbnails
+    THUMBNAIL_WORKERS: int = 2
+
+    # Garbage collection of unreferenced content-addressed uploads (stored_files)
+    FILE_GC_ENABLED: bool = True
+    FILE_GC_INTERVAL_HOURS: int = 24
+    FILE_GC_GRACE_HOURS: int = 24
+
     class Config:
         env_file = ".env"
 
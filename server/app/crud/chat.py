@@ -113,6 +113,7 @@ async def create_message(
     file_name: Optional[str] = None,
     file_size: Optional[int] = None,
     reply_to_id: Optional[uuid.UUID] = None,
+    file_meta: Optional[dict] = None,
 ) -> ChatMessage:
     msg = ChatMessage(
         id=uuid.uuid4(),
@@ -124,6 +125,7 @@ async def create_message(
         file_url=file_url,
         file_name=file_name,
         file_size=file_size,
+        file_meta=file_meta,
         reply_to_id=reply_to_id,
     )
     db.add(msg)
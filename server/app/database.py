@@ -2,8 +2,11 @@ from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine, Asyn
 from sqlalchemy.orm import DeclarativeBase
 
 from app.config import settings
+from app.metrics import TimedQueuePool
+from app.query_stats import install_query_hooks
 
-engine = create_async_engine(settings.DATABASE_URL, echo=False)
+engine = create_async_engine(settings.DATABASE_URL, echo=False, poolclass=TimedQueuePool)
+install_query_hooks(engine)
 async_session = async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
 
 
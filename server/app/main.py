@@ -1,18 +1,48 @@
+import asyncio
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from uvicorn.middleware.proxy_headers import ProxyHeadersMiddleware
 
-from app.routers import auth, employees, subjects, groups, students, lessons, exams, exam_templates, finances, reports, settings, schedules, school_locations, leads, subscriptions, home_banners, notifications, home_info_card
+from app.routers import auth, employees, subjects, groups, students, lessons, exams, exam_templates, finances, reports, settings, schedules, school_locations, leads, subscriptions, home_banners, notifications, home_info_card, teachers
 from app.routers.student_auth import router as student_auth_router
 from app.routers.student_portal import router as student_portal_router
 from app.routers.exam_sessions import router as exam_sessions_router, students_router as portal_creds_router
 from app.routers.chat import router as chat_router
 from app.routers.app_users import router as app_users_router, auth_router as app_auth_router
 from app.routers.app_auth_email import router as app_auth_email_router
+from app.routers.metrics import router as metrics_router
+from app.config import settings as app_settings
+from app.metrics import MetricsMiddleware
+from app.services.ai import close_ai_client
+from app.services.file_gc import run_file_gc
+from app.services.lesson_scheduler import run_lesson_scheduler
+from app.services.portal_cache import run_portal_cache_listener
+from app.services.thumbnails import shutdown_thumbnail_pool
+
+
+@asynccontextmanager
+async def lifespan(_: FastAPI):
+    background: list[asyncio.Task] = []
+    if app_settings.LESSON_SCHEDULER_ENABLED:
+        background.append(asyncio.create_task(run_lesson_scheduler()))
+    if app_settings.PORTAL_CACHE_LISTENER_ENABLED:
+        background.append(asyncio.create_task(run_portal_cache_listener()))
+    if app_settings.FILE_GC_ENABLED:
+        background.append(asyncio.create_task(run_file_gc()))
+    yield
+    for task in background:
+        task.cancel()
+    await asyncio.gather(*background, return_exceptions=True)
+    shutdown_thumbnail_pool()
+    await close_ai_client()
+
 
-app = FastAPI(title="CRM School API", version="1.0.0")
+app = FastAPI(title="CRM School API", version="1.0.0", lifespan=lifespan)
 
 app.add_middleware(ProxyHeadersMiddleware, trusted_hosts="*")
+app.add_middleware(MetricsMiddleware)
 
 app.add_middleware(
     CORSMiddleware,
@@ -26,10 +56,12 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "ETag"],
 )
 
 app.include_router(auth.router)
 app.include_router(employees.router)
+app.include_router(teachers.router)
 app.include_router(subjects.router)
 app.include_router(groups.router)
 app.include_router(schedules.router)
@@ -54,6 +86,7 @@ app.include_router(chat_router)
 app.include_router(app_users_router)
 app.include_router(app_auth_router)
 app.include_router(app_auth_email_router)
+app.include_router(metrics_router)
 
 
 @app.get("/")
@@ -0,0 +1,160 @@
+"""
+Метрики в формате Prometheus (GET /metrics, см. app/routers/metrics.py).
+
+На горячем пути только то, что нельзя посчитать иначе: гистограмма задержки
+HTTP по шаблону маршрута и статусу (чистый ASGI-middleware, без
+BaseHTTPMiddleware — стриминговые ответы не буферизуются), число SQL-запросов
+на HTTP-запрос (app/query_stats.py), время ожидания
+соединения из пула SQLAlchemy и задержки внешних вызовов (push, email, AI).
+
+Всё остальное — WebSocket-соединения ConnectionManager, заполненность пула,
+счётчики AI-шлюза и файлового кэша — читается в момент опроса, в
+RuntimeCollector, и ничего не стоит между опросами.
+"""
+import time
+from contextlib import contextmanager
+
+from prometheus_client import CONTENT_TYPE_LATEST, REGISTRY, Histogram, generate_latest
+from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+
+from app.config import settings
+from app.query_stats import debug_headers, record_request, start_query_stats
+
+HTTP_REQUEST_DURATION = Histogram(
+    "http_request_duration_seconds",
+    "HTTP request latency by route template and status",
+    ["method", "route", "status"],
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30),
+)
+DB_POOL_WAIT = Histogram(
+    "db_pool_checkout_seconds",
+    "Time to get a connection from the SQLAlchemy pool (including opening a new one)",
+    buckets=(0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1, 5, 30),
+)
+OUTBOUND_DURATION = Histogram(
+    "outbound_request_duration_seconds",
+    "Latency of calls to external services",
+    ["service", "outcome"],
+    buckets=(0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60),
+)
+AI_TIME_TO_FIRST_TOKEN = Histogram(
+    "ai_time_to_first_token_seconds",
+    "Time to the first streamed token of an AI completion",
+    buckets=(0.1, 0.25, 0.5, 1, 2, 3, 5, 10, 20),
+)
+
+# Requests that matched no route share one label instead of one series per URL
+_UNMATCHED_ROUTE = "<unmatched>"
+
+
+@contextmanager
+def observe_outbound(service: str):
+    """
+    Time a call to an external service. The outcome is "error" if the block raises
+    or sets call["ok"] = False (e.g. on an HTTP error status).
+    """
+    started = time.perf_counter()
+    call = {"ok": True}
+    try:
+        yield call
+    except BaseException:
+        call["ok"] = False
+        raise
+    finally:
+        OUTBOUND_DURATION.labels(service, "ok" if call["ok"] else "error").observe(time.perf_counter() - started)
+
+
+class MetricsMiddleware:
+    """
+    Observe HTTP_REQUEST_DURATION for every HTTP request, from receipt to the last body chunk,
+    and count its SQL statements (app/query_stats.py).
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        started = time.perf_counter()
+        queries = start_query_stats()
+        status = 500
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                if settings.DB_QUERY_DEBUG_HEADERS:
+                    message["headers"] = [*message.get("headers", []), *debug_headers(queries)]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            # The router stores the matched route in the (shared) scope
+            route = getattr(scope.get("route"), "path", _UNMATCHED_ROUTE)
+            HTTP_REQUEST_DURATION.labels(scope["method"], route, str(status)).observe(time.perf_counter() - started)
+            record_request(route, queries)
+
+
+class TimedQueuePool(AsyncAdaptedQueuePool):
+    """The default async pool, timing how long each checkout waits."""
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            DB_POOL_WAIT.observe(time.perf_counter() - started)
+
+
+class RuntimeCollector:
+    """Gauges and counters read from live objects at scrape time."""
+
+    def describe(self):
+        # Without describe() the registry calls collect() on register, i.e. at import time
+        return []
+
+    def collect(self):
+        # Imported here: these modules import this one
+        from app.database import engine
+        from app.services.ai import get_ai_stats
+        from app.services.file_cache import get_file_cache_stats
+        from app.websocket_manager import manager
+
+        ws = GaugeMetricFamily("websocket_connections", "Live WebSocket connections by kind", labels=["kind"])
+        kinds: dict[str, int] = {}
+        for topic, sockets in manager.active_connections.items():
+            kinds[topic] = kinds.get(topic, 0) + len(sockets)
+        for user_key, sockets in manager.user_connections.items():
+            # "student:<uuid>" → "chat:student"
+            kind = "chat:" + user_key.split(":", 1)[0]
+            kinds[kind] = kinds.get(kind, 0) + len(sockets)
+        for kind, count in sorted(kinds.items()):
+            ws.add_metric([kind], count)
+        yield ws
+
+        pool = engine.pool
+        if isinstance(pool, AsyncAdaptedQueuePool):
+            yield GaugeMetricFamily("db_pool_size", "Configured pool size", value=pool.size())
+            yield GaugeMetricFamily("db_pool_checked_out", "Connections currently in use", value=pool.checkedout())
+            yield GaugeMetricFamily("db_pool_checked_in", "Idle connections in the pool", value=pool.checkedin())
+            yield GaugeMetricFamily("db_pool_overflow", "Connections open beyond pool_size", value=max(pool.overflow(), 0))
+
+        ai = get_ai_stats()
+        for key in ("calls", "cache_hits", "retries", "failures", "prompt_tokens", "completion_tokens", "stream_cancelled"):
+            yield CounterMetricFamily(f"ai_{key}", f"AI gateway: {key.replace('_', ' ')}", value=ai[key])
+
+        files = get_file_cache_stats()
+        for key in ("hits", "misses", "not_modified", "evicted_files", "bytes_saved"):
+            yield CounterMetricFamily(f"file_cache_{key}", f"Image disk cache: {key.replace('_', ' ')}", value=files[key])
+
+
+REGISTRY.register(RuntimeCollector())
+
+
+def render_metrics() -> tuple[bytes, str]:
+    return generate_latest(REGISTRY), CONTENT_TYPE_LATEST
@@ -17,3 +17,4 @@ from app.models.notification import Notification, NotificationRead
 from app.models.home_info_card import HomeInfoCard
 from app.models.email_verification_code import EmailVerificationCode
 from app.models.push_token import PushToken
+from app.models.stored_file import StoredFile
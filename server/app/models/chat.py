@@ -2,8 +2,8 @@ import uuid
 import enum
 from datetime import datetime, timezone
 
-from sqlalchemy import String, Text, Integer, ForeignKey, Boolean, Enum as SAEnum
-from sqlalchemy.dialects.postgresql import UUID, TIMESTAMP
+from sqlalchemy import String, Text, Integer, ForeignKey, Boolean, Index, text, Enum as SAEnum
+from sqlalchemy.dialects.postgresql import UUID, TIMESTAMP, JSONB
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
 from app.database import Base
@@ -59,6 +59,10 @@ class ChatRoomMember(Base):
 
 class ChatMessage(Base):
     __tablename__ = "chat_messages"
+    __table_args__ = (
+        # Download name lookup by stored key (GET /chat/files/{key})
+        Index("ix_chat_messages_file_url", "file_url", postgresql_where=text("file_url IS NOT NULL")),
+    )
 
     id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     room_id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), ForeignKey("chat_rooms.id", ondelete="CASCADE"), nullable=False)
@@ -70,6 +74,8 @@ class ChatMessage(Base):
     file_url: Mapped[str | None] = mapped_column(Text, nullable=True)
     file_name: Mapped[str | None] = mapped_column(String(500), nullable=True)
     file_size: Mapped[int | None] = mapped_column(Integer, nullable=True)
+    # Images: {"variants": {"thumb": key, "preview": key}, "lqip": data URI, "width", "height"}
+    file_meta: Mapped[dict | None] = mapped_column(JSONB, nullable=True)
     reply_to_id: Mapped[uuid.UUID | None] = mapped_column(UUID(as_uuid=True), ForeignKey("chat_messages.id", ondelete="SET NULL"), nullable=True)
     is_deleted: Mapped[bool] = mapped_column(Boolean, default=False)
     edited_at: Mapped[datetime | None] = mapped_column(TIMESTAMP(timezone=True), nullable=True)
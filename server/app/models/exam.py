@@ -1,7 +1,7 @@
 import uuid
 from datetime import datetime, timezone
 
-from sqlalchemy import String, Integer, Text, Date, ForeignKey, Float
+from sqlalchemy import String, Integer, Text, Date, ForeignKey, Float, Index, UniqueConstraint
 from sqlalchemy.dialects.postgresql import UUID, JSONB, TIMESTAMP
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
@@ -21,6 +21,8 @@ class Exam(Base):
     threshold_score: Mapped[int | None] = mapped_column(Integer)
     selected_tasks: Mapped[dict | None] = mapped_column(JSONB)
     task_topics: Mapped[dict | None] = mapped_column(JSONB)
+    # {"<task number>": {"answer": "12|21", "max_score": 2, "rule": "one_error"}} — app/services/exam_scoring.py
+    answer_key: Mapped[dict | None] = mapped_column(JSONB)
     comment: Mapped[str | None] = mapped_column(Text)
 
     # Template flag
@@ -43,6 +45,11 @@ class Exam(Base):
 
 class ExamResult(Base):
     __tablename__ = "exam_results"
+    __table_args__ = (
+        UniqueConstraint("exam_id", "student_id", name="uq_exam_results_exam_student"),
+        Index("ix_exam_results_student_id", "student_id"),
+        Index("ix_exam_results_exam_id_final_score", "exam_id", "final_score"),
+    )
 
     id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     exam_id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), ForeignKey("exams.id"), nullable=False)
@@ -50,6 +57,8 @@ class ExamResult(Base):
     primary_score: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
     final_score: Mapped[float] = mapped_column(Float, default=0.0, nullable=False)
     answers: Mapped[dict | None] = mapped_column(JSONB)
+    # Student's own answers, checked against exam.answer_key into answers
+    raw_answers: Mapped[list | None] = mapped_column(JSONB)
     task_comments: Mapped[dict | None] = mapped_column(JSONB)
     student_comment: Mapped[str | None] = mapped_column(Text)
 
@@ -1,13 +1,19 @@
+import enum
 import uuid
 from datetime import datetime, timezone
 
-from sqlalchemy import String, Integer, Text, Date, Boolean, ForeignKey
+from sqlalchemy import String, Integer, Text, Date, Boolean, ForeignKey, UniqueConstraint, Index
 from sqlalchemy.dialects.postgresql import UUID, TIMESTAMP
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
 from app.database import Base
 
 
+class RegistrationStatus(str, enum.Enum):
+    registered = "registered"
+    waitlisted = "waitlisted"
+
+
 class ExamPortalSession(Base):
     """Настройка экзамена для записи через портал ученика."""
     __tablename__ = "exam_portal_sessions"
@@ -34,28 +40,34 @@ class ExamTimeSlot(Base):
     date: Mapped[str] = mapped_column(Date, nullable=False)
     start_time: Mapped[str] = mapped_column(String(10), nullable=False)  # "09:00"
     total_seats: Mapped[int] = mapped_column(Integer, default=10, nullable=False)
+    # Занятые места; меняется только атомарным UPDATE (app/services/exam_registration.py)
+    registered_count: Mapped[int] = mapped_column(Integer, default=0, server_default="0", nullable=False)
+    # Когда мест нет — записывать в лист ожидания вместо отказа
+    waitlist_enabled: Mapped[bool] = mapped_column(Boolean, default=False, server_default="false", nullable=False)
 
     session = relationship("ExamPortalSession", back_populates="time_slots")
     registrations = relationship("ExamRegistration", back_populates="time_slot", cascade="all, delete-orphan")
 
-    @property
-    def registered_count(self) -> int:
-        return len(self.registrations)
-
     @property
     def available_seats(self) -> int:
-        return max(0, self.total_seats - len(self.registrations))
+        return max(0, self.total_seats - self.registered_count)
 
 
 class ExamRegistration(Base):
     """Запись ученика на экзамен."""
     __tablename__ = "exam_registrations"
+    __table_args__ = (
+        UniqueConstraint("student_id", "time_slot_id", name="uq_exam_registrations_student_slot"),
+        Index("ix_exam_registrations_slot_status", "time_slot_id", "status", "registered_at"),
+    )
 
     id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     student_id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), ForeignKey("students.id", ondelete="CASCADE"), nullable=False)
     time_slot_id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), ForeignKey("exam_time_slots.id", ondelete="CASCADE"), nullable=False)
     subject_id: Mapped[uuid.UUID | None] = mapped_column(UUID(as_uuid=True), ForeignKey("subjects.id", ondelete="SET NULL"), nullable=True)
     registered_at: Mapped[datetime] = mapped_column(TIMESTAMP(timezone=True), default=lambda: datetime.now(timezone.utc))
+    # "registered" — занимает место, "waitlisted" — ждёт освободившегося места (по registered_at)
+    status: Mapped[str] = mapped_column(String(20), default=RegistrationStatus.registered.value, server_default=RegistrationStatus.registered.value, nullable=False)
     # Отметка присутствия и результата (заполняется после экзамена)
     attendance: Mapped[str | None] = mapped_column(String(20), nullable=True)  # "present" | "absent"
     passed: Mapped[bool | None] = mapped_column(Boolean, nullable=True)  # True = сдал, False = не сдал
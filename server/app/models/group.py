@@ -24,6 +24,9 @@ class Group(Base):
     description: Mapped[str | None] = mapped_column(Text)
     comment: Mapped[str | None] = mapped_column(Text)
     is_archived: Mapped[bool] = mapped_column(Boolean, default=False)
+    # Rolling lesson horizon (see app/services/lesson_scheduler.py)
+    lessons_generated_until: Mapped[date | None] = mapped_column(Date, nullable=True)
+    schedule_changed: Mapped[bool] = mapped_column(Boolean, default=False, server_default="false", nullable=False)
     created_at: Mapped[datetime] = mapped_column(TIMESTAMP(timezone=True), default=lambda: datetime.now(timezone.utc))
 
     subject = relationship("Subject", back_populates="groups")
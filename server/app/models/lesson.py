@@ -2,7 +2,7 @@ import uuid
 import enum
 from datetime import datetime, date, time
 
-from sqlalchemy import String, Integer, Text, Date, Time, DateTime, Boolean, ForeignKey, Enum as SAEnum
+from sqlalchemy import String, Integer, Text, Date, Time, DateTime, Boolean, ForeignKey, Index, Enum as SAEnum
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
@@ -40,6 +40,9 @@ class AttendanceStatus(str, enum.Enum):
 
 class Lesson(Base):
     __tablename__ = "lessons"
+    __table_args__ = (
+        Index("ix_lessons_group_id_date", "group_id", "date"),
+    )
 
     id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     group_id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), ForeignKey("groups.id"), nullable=False)
@@ -2,7 +2,7 @@ import uuid
 import enum
 from datetime import datetime, date, time, timezone
 
-from sqlalchemy import String, Integer, Text, Numeric, Date, Time, Boolean, ForeignKey, Enum as SAEnum
+from sqlalchemy import String, Integer, Text, Numeric, Date, Time, Boolean, ForeignKey, Index, Enum as SAEnum
 from sqlalchemy.dialects.postgresql import UUID, TIMESTAMP
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
@@ -123,3 +123,7 @@ class WeeklyReport(Base):
 
     student = relationship("Student", back_populates="weekly_reports")
     creator = relationship("Employee", back_populates="created_weekly_reports")
+
+
+# Latest report per student: DISTINCT ON (student_id) ORDER BY student_id, created_at DESC
+Index("ix_weekly_reports_student_id_created_at", WeeklyReport.student_id, WeeklyReport.created_at.desc())
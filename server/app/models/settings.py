@@ -1,7 +1,7 @@
 import uuid
 
 from sqlalchemy import String, Text, Numeric
-from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy.dialects.postgresql import UUID, JSONB
 from sqlalchemy.orm import Mapped, mapped_column
 
 from app.database import Base
@@ -18,3 +18,4 @@ class Settings(Base):
     address: Mapped[str | None] = mapped_column(Text)
     default_rate: Mapped[float | None] = mapped_column(Numeric(10, 2))
     student_fee: Mapped[float | None] = mapped_column(Numeric(10, 2))
+    holidays: Mapped[list | None] = mapped_column(JSONB, nullable=True)  # ["2026-01-01", ...] — дни без уроков
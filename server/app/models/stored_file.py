@@ -0,0 +1,34 @@
+import uuid
+from datetime import datetime, timezone
+
+from sqlalchemy import String, Integer, BigInteger, UniqueConstraint
+from sqlalchemy.dialects.postgresql import UUID, TIMESTAMP, JSONB
+from sqlalchemy.orm import Mapped, mapped_column
+
+from app.database import Base
+
+
+class StoredFile(Base):
+    """An S3 object stored under its content hash; identical uploads share one object."""
+
+    __tablename__ = "stored_files"
+    __table_args__ = (
+        UniqueConstraint("prefix", "sha256", name="uq_stored_files_prefix_sha256"),
+    )
+
+    id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    key: Mapped[str] = mapped_column(String(500), nullable=False, unique=True)  # "<prefix>/<sha256>"
+    prefix: Mapped[str] = mapped_column(String(50), nullable=False)  # "chat" | "avatars" | "banners"
+    sha256: Mapped[str] = mapped_column(String(64), nullable=False)
+    size: Mapped[int] = mapped_column(BigInteger, nullable=False)
+    content_type: Mapped[str] = mapped_column(String(200), nullable=False)
+    # Messages/avatars/banners pointing at the key; bumped on upload, reconciled by the GC job
+    ref_count: Mapped[int] = mapped_column(Integer, nullable=False, default=1, server_default="1")
+    # Derived data worth reusing on a dedup hit (chat image thumbnails, see services/thumbnails.py)
+    meta: Mapped[dict | None] = mapped_column(JSONB, nullable=True)
+    created_at: Mapped[datetime] = mapped_column(
+        TIMESTAMP(timezone=True), default=lambda: datetime.now(timezone.utc)
+    )
+    last_uploaded_at: Mapped[datetime] = mapped_column(
+        TIMESTAMP(timezone=True), default=lambda: datetime.now(timezone.utc)
+    )
@@ -95,6 +95,8 @@ class Student(Base):
     chat_display_name: Mapped[str | None] = mapped_column(String(100), nullable=True)
     avatar_key: Mapped[str | None] = mapped_column(String(500), nullable=True)  # S3 key for profile avatar
     public_key: Mapped[str | None] = mapped_column(Text, nullable=True)  # X25519 public key (base64) for E2E encryption
+    # Notifications created up to this moment count as read; later ones use sparse notification_reads rows
+    notifications_read_up_to: Mapped[datetime | None] = mapped_column(TIMESTAMP(timezone=True), nullable=True)
     created_at: Mapped[datetime] = mapped_column(TIMESTAMP(timezone=True), default=lambda: datetime.now(timezone.utc))
 
     groups = relationship("GroupStudent", back_populates="student")
@@ -0,0 +1,150 @@
+"""
+Счётчик SQL-запросов на HTTP-запрос и защита от N+1.
+
+Хуки before/after_cursor_execute на engine считают выражения и время в БД
+для текущего запроса (ContextVar, который открывает MetricsMiddleware).
+Итог попадает в метрики (db_queries_per_request, db_time_per_request_seconds)
+и, при DB_QUERY_DEBUG_HEADERS, в заголовки ответа X-DB-Query-Count и
+X-DB-Time-Ms.
+
+Выражения дольше DB_SLOW_QUERY_MS пишутся в лог вместе с планом
+(EXPLAIN без ANALYZE — запрос повторно не выполняется).
+
+query_budget(n) — ограничение числа запросов для проверок и тестов:
+
+    with query_budget(3) as q:
+        await list_rooms(db, user)
+    # больше 3 выражений → QueryBudgetExceeded со списком выполненных SQL
+
+В тестах — одноимённая фикстура из tests/conftest.py.
+"""
+import logging
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass
+
+from prometheus_client import Counter, Histogram
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from app.config import settings
+
+log = logging.getLogger(__name__)
+
+DB_QUERIES_PER_REQUEST = Histogram(
+    "db_queries_per_request",
+    "SQL statements executed per HTTP request",
+    ["route"],
+    buckets=(0, 1, 2, 3, 5, 8, 13, 21, 34, 55, 100, 250),
+)
+DB_TIME_PER_REQUEST = Histogram(
+    "db_time_per_request_seconds",
+    "Time spent in SQL statements per HTTP request",
+    ["route"],
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5),
+)
+DB_SLOW_STATEMENTS = Counter("db_slow_statements", "Statements slower than DB_SLOW_QUERY_MS")
+
+# Statement text kept for budget reports is cut to this length
+_STATEMENT_PREVIEW = 300
+# A failing EXPLAIN would abort the caller's transaction, so only explainable statements get one
+_EXPLAINABLE = ("SELECT", "WITH", "INSERT", "UPDATE", "DELETE")
+
+
+class QueryBudgetExceeded(AssertionError):
+    pass
+
+
+@dataclass
+class QueryStats:
+    count: int = 0
+    seconds: float = 0.0
+    # Filled only under query_budget(), to show what ran
+    statements: list[str] | None = None
+
+
+_current: ContextVar[QueryStats | None] = ContextVar("query_stats", default=None)
+
+
+def start_query_stats() -> QueryStats:
+    """Begin counting for the current request/task. Child tasks and SQLAlchemy greenlets share the object."""
+    stats = QueryStats()
+    _current.set(stats)
+    return stats
+
+
+def current_query_stats() -> QueryStats | None:
+    return _current.get()
+
+
+def record_request(route: str, stats: QueryStats) -> None:
+    DB_QUERIES_PER_REQUEST.labels(route).observe(stats.count)
+    DB_TIME_PER_REQUEST.labels(route).observe(stats.seconds)
+
+
+def debug_headers(stats: QueryStats) -> list[tuple[bytes, bytes]]:
+    return [
+        (b"x-db-query-count", str(stats.count).encode()),
+        (b"x-db-time-ms", f"{stats.seconds * 1000:.1f}".encode()),
+    ]
+
+
+@contextmanager
+def query_budget(max_queries: int):
+    """Fail with QueryBudgetExceeded if the block runs more than max_queries statements."""
+    outer = _current.get()
+    stats = QueryStats(statements=[])
+    token = _current.set(stats)
+    try:
+        yield stats
+    finally:
+        _current.reset(token)
+        if outer is not None:
+            outer.count += stats.count
+            outer.seconds += stats.seconds
+    if stats.count > max_queries:
+        listing = "\n".join(f"  {i}. {sql}" for i, sql in enumerate(stats.statements, 1))
+        raise QueryBudgetExceeded(f"{stats.count} SQL statements, budget {max_queries}:\n{listing}")
+
+
+def _explain(conn, statement: str, parameters) -> str:
+    # Raw DBAPI cursor: bypasses these hooks and SQLAlchemy's execution machinery
+    cursor = conn.connection.dbapi_connection.cursor()
+    try:
+        cursor.execute(f"EXPLAIN {statement}", parameters)
+        return "\n".join(" ".join(str(v) for v in row) for row in cursor.fetchall())
+    finally:
+        cursor.close()
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    # One statement at a time per connection; a failed one is simply overwritten by the next
+    conn.info["query_started"] = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - conn.info.pop("query_started", time.perf_counter())
+
+    stats = _current.get()
+    if stats is not None:
+        stats.count += 1
+        stats.seconds += elapsed
+        if stats.statements is not None:
+            stats.statements.append(" ".join(statement.split())[:_STATEMENT_PREVIEW])
+
+    if elapsed * 1000 < settings.DB_SLOW_QUERY_MS:
+        return
+    DB_SLOW_STATEMENTS.inc()
+    plan = ""
+    if settings.DB_SLOW_QUERY_EXPLAIN and not executemany and statement.lstrip().upper().startswith(_EXPLAINABLE):
+        try:
+            plan = "\n" + _explain(conn, statement, parameters)
+        except Exception as e:
+            plan = f"\n(EXPLAIN failed: {e})"
+    log.warning("Slow SQL (%.0f ms): %s%s", elapsed * 1000, " ".join(statement.split()), plan)
+
+
+def install_query_hooks(engine: AsyncEngine) -> None:
+    event.listen(engine.sync_engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(engine.sync_engine, "after_cursor_execute", _after_cursor_execute)
@@ -12,13 +12,15 @@ REST:
 WebSocket:
   WS /chat/ws?token={jwt}
 """
+import asyncio
+import logging
 import uuid
 from dataclasses import dataclass
 from datetime import datetime, timezone
 from typing import Optional
+from urllib.parse import quote
 
 from fastapi import APIRouter, Depends, HTTPException, Query, UploadFile, File, WebSocket, WebSocketDisconnect, Request
-from fastapi.responses import Response
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from sqlalchemy import select, and_
 from sqlalchemy.ext.asyncio import AsyncSession
@@ -31,6 +33,7 @@ from app.models.student import Student, StudentStatus
 from app.models.app_user import AppUser
 from app.models.employee import Employee
 from app.models.group import Group, GroupStudent
+from app.models.chat import ChatMessage as ChatMessageModel, ChatRoomMember
 from app.schemas.chat import (
     ChatRoomSchema,
     ChatMessageSchema,
@@ -39,11 +42,18 @@ from app.schemas.chat import (
     EditMessageRequest,
     ForwardMessageRequest,
 )
+from app.schemas.upload import PresignUploadRequest, PresignedUploadResponse, FinalizeUploadRequest
 from app.websocket_manager import manager
 from app.services.push import send_push_to_users
+from app.services.file_cache import get_cached_file, cached_file_response
+from app.services.thumbnails import THUMBNAIL_SIZES, build_image_variants, clean_file_meta, variant_key
+from app.services.uploads import presign_upload, finalize_upload
+from app.services.file_store import store_upload, set_stored_file_meta
 
 router = APIRouter(prefix="/chat", tags=["chat"])
 
+log = logging.getLogger(__name__)
+
 _bearer = HTTPBearer()
 
 
@@ -152,6 +162,7 @@ async def _serialize_message(msg, db: AsyncSession) -> dict:
         "file_url": msg.file_url,
         "file_name": msg.file_name,
         "file_size": msg.file_size,
+        "file_meta": msg.file_meta,
         "reply_to_id": str(msg.reply_to_id) if msg.reply_to_id else None,
         "is_deleted": msg.is_deleted,
         "edited_at": msg.edited_at.isoformat() if msg.edited_at else None,
@@ -443,6 +454,7 @@ async def send_message(
         file_url=body.get("file_url"),
         file_name=body.get("file_name"),
         file_size=body.get("file_size"),
+        file_meta=clean_file_meta(body.get("file_url"), body.get("file_meta")),
         reply_to_id=uuid.UUID(body["reply_to_id"]) if body.get("reply_to_id") else None,
     )
 
@@ -867,7 +879,6 @@ async def edit_message(
     me: ChatIdentity = Depends(get_chat_identity),
     db: AsyncSession = Depends(get_db),
 ):
-    from app.models.chat import ChatMessage as ChatMessageModel
     res = await db.execute(select(ChatMessageModel).where(ChatMessageModel.id == message_id))
     msg = res.scalar_one_or_none()
     if not msg or msg.is_deleted:
@@ -899,7 +910,7 @@ async def forward_messages(
     target_room_id = uuid.UUID(body.target_room_id)
     if not await crud.is_member(db, target_room_id, me.member_id, me.member_type):
         raise HTTPException(status_code=403, detail="Вы не состоите в целевом чате")
-    from app.models.chat import ChatMessage as ChatMessageModel
+    from app.models.chat import ChatMessage as ChatMessageModel, ChatRoomMember
     out: list[dict] = []
     for mid_str in body.message_ids:
         try:
@@ -926,6 +937,7 @@ async def forward_messages(
             file_url=src.file_url,
             file_name=src.file_name,
             file_size=src.file_size,
+            file_meta=src.file_meta,
             forwarded_from_sender_name=original_sender_name,
         )
         db.add(new_msg)
@@ -978,12 +990,14 @@ async def leave_room(
 async def upload_chat_file(
     file: UploadFile = File(...),
     me: ChatIdentity = Depends(get_chat_identity),
+    db: AsyncSession = Depends(get_db),
 ):
-    """Upload a file to S3 for chat attachment. Returns file metadata."""
-    from app.s3 import (
-        ALLOWED_CONTENT_TYPES, MAX_FILE_SIZE,
-        upload_file as s3_upload, get_message_type_for_content,
-    )
+    """Upload a file to S3 for chat attachment. Returns file metadata.
+
+    Files are stored by content hash: re-sending the same file reuses the stored
+    object and its thumbnails.
+    """
+    from app.s3 import ALLOWED_CONTENT_TYPES, ALLOWED_IMAGE_TYPES, get_message_type_for_content
 
     content_type = file.content_type or "application/octet-stream"
     if content_type not in ALLOWED_CONTENT_TYPES:
@@ -992,53 +1006,169 @@ async def upload_chat_file(
             detail=f"Неподдерживаемый тип файла: {content_type}",
         )
 
-    data = await file.read()
-    if len(data) > MAX_FILE_SIZE:
-        raise HTTPException(status_code=400, detail="Файл слишком большой (макс. 10 МБ)")
+    is_image = content_type in ALLOWED_IMAGE_TYPES
+    stored = await store_upload(db, file, prefix="chat", content_type=content_type, keep_data=is_image)
+    file_meta = stored.meta
+    if is_image and stored.data is not None:
+        file_meta = await _store_image_variants(stored.key, stored.data)
+        await set_stored_file_meta(db, stored.key, file_meta)
+    await db.commit()
+
+    return {
+        "file_url": stored.key,
+        "file_name": file.filename or "file",
+        "file_size": stored.size,
+        "message_type": get_message_type_for_content(content_type),
+        "file_meta": file_meta,
+    }
 
-    original_name = file.filename or "file"
-    key = await s3_upload(data, original_name, content_type)
-    msg_type = get_message_type_for_content(content_type)
+
+@router.post("/upload/presign", response_model=PresignedUploadResponse)
+async def presign_chat_upload(
+    body: PresignUploadRequest,
+    me: ChatIdentity = Depends(get_chat_identity),
+):
+    """Step 1 of a direct upload: presigned POST to S3 for a chat attachment."""
+    from app.s3 import ALLOWED_CONTENT_TYPES
+
+    return presign_upload(
+        body,
+        purpose="chat",
+        owner=f"{me.member_type}:{me.member_id}",
+        prefix="chat",
+        allowed_types=ALLOWED_CONTENT_TYPES,
+    )
+
+
+@router.post("/upload/finalize")
+async def finalize_chat_upload(
+    body: FinalizeUploadRequest,
+    me: ChatIdentity = Depends(get_chat_identity),
+):
+    """Step 2: verify the uploaded object; returns the same metadata as POST /chat/upload."""
+    from app.s3 import ALLOWED_IMAGE_TYPES, download_file, get_message_type_for_content
+
+    upload = await finalize_upload(
+        body.upload_token, purpose="chat", owner=f"{me.member_type}:{me.member_id}"
+    )
+
+    file_meta = None
+    if upload.content_type in ALLOWED_IMAGE_TYPES:
+        try:
+            data, _ = await asyncio.to_thread(download_file, upload.key)
+            file_meta = await _store_image_variants(upload.key, data)
+        except Exception:
+            log.exception("Failed to build thumbnails for %s", upload.key)
 
     return {
-        "file_url": key,
-        "file_name": original_name,
-        "file_size": len(data),
-        "message_type": msg_type,
+        "file_url": upload.key,
+        "file_name": upload.file_name,
+        "file_size": upload.size,
+        "message_type": get_message_type_for_content(upload.content_type),
+        "file_meta": file_meta,
+    }
+
+
+async def _store_image_variants(key: str, data: bytes) -> dict | None:
+    """Render thumbnails in the worker pool and put them next to the original in S3."""
+    from app.s3 import put_object
+
+    rendered = await build_image_variants(data)
+    if rendered is None:
+        return None
+    variants = {name: variant_key(key, name) for name in rendered["variants"]}
+    try:
+        await asyncio.gather(*(
+            asyncio.to_thread(put_object, variants[name], body, "image/jpeg")
+            for name, body in rendered["variants"].items()
+        ))
+    except Exception:
+        log.exception("Failed to store thumbnails for %s", key)
+        variants = {}
+    return {
+        "variants": variants,
+        "lqip": rendered["lqip"],
+        "width": rendered["width"],
+        "height": rendered["height"],
     }
 
 
 @router.get("/files/{file_key:path}")
 async def serve_chat_file(
     file_key: str,
+    request: Request,
     token: str = Query(...),
+    variant: Optional[str] = Query(None, description="thumb | preview; falls back to the original"),
     db: AsyncSession = Depends(get_db),
 ):
     """Proxy-serve a chat file from S3. Auth via ?token= query param (for <img src>)."""
-    from app.s3 import download_file
-
     # Validate token
     payload = decode_token(token)
     if not payload:
         raise HTTPException(status_code=401, detail="Invalid token")
 
-    try:
-        data, content_type = download_file(file_key)
-    except Exception:
-        raise HTTPException(status_code=404, detail="Файл не найден")
+    if variant is not None and variant not in THUMBNAIL_SIZES:
+        raise HTTPException(status_code=400, detail="Unknown variant")
 
-    filename = file_key.rsplit("/", 1)[-1] if "/" in file_key else file_key
+    cached = None
+    if variant is not None:
+        # Small originals and files uploaded before thumbnails existed have no variants
+        try:
+            cached = await get_cached_file(variant_key(file_key, variant))
+        except Exception:
+            cached = None
+    if cached is None:
+        try:
+            cached = await get_cached_file(file_key)
+        except Exception:
+            raise HTTPException(status_code=404, detail="Файл не найден")
 
-    return Response(
-        content=data,
-        media_type=content_type,
-        headers={
-            "Content-Disposition": f'inline; filename="{filename}"',
-            "Cache-Control": "private, max-age=86400",
-        },
+    return cached_file_response(
+        request,
+        cached,
+        "private, max-age=86400",
+        extra_headers={"Content-Disposition": await _content_disposition(db, file_key, payload)},
     )
 
 
+def _token_member(payload: dict) -> tuple[uuid.UUID, str] | None:
+    """Chat member (id, type) of a decoded token, same mapping as get_chat_identity."""
+    role = payload.get("role")
+    if role in ("student", "app_user"):
+        return uuid.UUID(payload["sub"]), role
+    if role is None and payload.get("type") == "access":
+        return uuid.UUID(payload["sub"]), "employee"
+    return None
+
+
+async def _content_disposition(db: AsyncSession, file_key: str, payload: dict) -> str:
+    """
+    Stored keys are content hashes without an extension, so the download name
+    comes from the message that attached the file (RFC 5987 for non-ASCII names).
+    The same content may be attached by other users elsewhere: only messages in
+    rooms the token holder belongs to are looked at.
+    """
+    member = _token_member(payload)
+    filename = None
+    if member is not None:
+        filename = (await db.execute(
+            select(ChatMessageModel.file_name)
+            .join(ChatRoomMember, ChatRoomMember.room_id == ChatMessageModel.room_id)
+            .where(
+                ChatMessageModel.file_url == file_key,
+                ChatMessageModel.file_name.isnot(None),
+                ChatRoomMember.member_id == member[0],
+                ChatRoomMember.member_type == member[1],
+            )
+            .order_by(ChatMessageModel.created_at.desc())
+            .limit(1)
+        )).scalar_one_or_none()
+    if not filename:
+        filename = file_key.rsplit("/", 1)[-1]
+    fallback = "".join(c if c.isascii() and c.isprintable() and c not in '"\\' else "_" for c in filename)
+    return f"inline; filename=\"{fallback}\"; filename*=UTF-8''{quote(filename, safe='')}"
+
+
 @router.patch("/rooms/{room_id}/room-key")
 async def update_room_key(
     room_id: uuid.UUID,
@@ -1164,6 +1294,7 @@ async def chat_websocket(
                     file_url=data.get("file_url"),
                     file_name=data.get("file_name"),
                     file_size=data.get("file_size"),
+                    file_meta=clean_file_meta(data.get("file_url"), data.get("file_meta")),
                     reply_to_id=reply_to_id,
                 )
 
@@ -15,7 +15,7 @@ from typing import Optional
 
 from fastapi import APIRouter, Depends, HTTPException
 from pydantic import BaseModel
-from sqlalchemy import select, exists
+from sqlalchemy import select, exists, func
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import selectinload
 from uuid import UUID
@@ -24,7 +24,7 @@ from app.auth.dependencies import get_current_user, get_manager_location_id
 from app.database import get_db
 from app.models.employee import Employee, EmployeeRole
 from app.models.exam import Exam
-from app.models.exam_portal import ExamPortalSession, ExamTimeSlot, ExamRegistration
+from app.models.exam_portal import ExamPortalSession, ExamTimeSlot, ExamRegistration, RegistrationStatus
 from app.models.group import GroupStudent, Group
 from app.models.student import Student
 from app.models.subject import Subject
@@ -92,6 +92,7 @@ class TimeSlotCreate(BaseModel):
     date: date_type    # "YYYY-MM-DD" → parsed to datetime.date by Pydantic
     start_time: str    # "09:00"
     total_seats: int = 10
+    waitlist_enabled: bool = False
 
 
 class SessionResponse(BaseModel):
@@ -184,6 +185,7 @@ async def list_all_registrations(
             "start_time": r.time_slot.start_time,
             "registered_at": r.registered_at.isoformat(),
             "exam_type": r.subject.exam_type if r.subject else None,
+            "status": r.status,
             "attendance": r.attendance,
             "passed": r.passed,
         }
@@ -224,15 +226,12 @@ async def list_sessions(
 ):
     result = await db.execute(
         select(ExamPortalSession)
-        .options(
-            selectinload(ExamPortalSession.exam),
-            selectinload(ExamPortalSession.school_location),
-            selectinload(ExamPortalSession.time_slots).selectinload(ExamTimeSlot.registrations),
-        )
+        .options(*_SESSION_LOAD_OPTIONS)
         .order_by(ExamPortalSession.created_at.desc())
     )
     sessions = result.scalars().all()
-    return [_session_to_response(s) for s in sessions]
+    stats = await _slot_stats(db, [slot.id for s in sessions for slot in s.time_slots])
+    return [_session_to_response(s, stats) for s in sessions]
 
 
 @router.post("/", response_model=SessionResponse)
@@ -255,16 +254,7 @@ async def create_session(
     await db.commit()
     await db.refresh(session)
 
-    result = await db.execute(
-        select(ExamPortalSession)
-        .options(
-            selectinload(ExamPortalSession.exam),
-            selectinload(ExamPortalSession.school_location),
-            selectinload(ExamPortalSession.time_slots).selectinload(ExamTimeSlot.registrations),
-        )
-        .where(ExamPortalSession.id == session.id)
-    )
-    return _session_to_response(result.scalar_one())
+    return await _get_session_response(db, session.id)
 
 
 @router.patch("/{session_id}", response_model=SessionResponse)
@@ -274,16 +264,7 @@ async def update_session(
     db: AsyncSession = Depends(get_db),
     current_user: Employee = Depends(get_current_user),
 ):
-    result = await db.execute(
-        select(ExamPortalSession)
-        .options(
-            selectinload(ExamPortalSession.exam),
-            selectinload(ExamPortalSession.school_location),
-            selectinload(ExamPortalSession.time_slots).selectinload(ExamTimeSlot.registrations),
-        )
-        .where(ExamPortalSession.id == session_id)
-    )
-    session = result.scalar_one_or_none()
+    session = await db.get(ExamPortalSession, session_id)
     if not session:
         raise HTTPException(status_code=404, detail="Сессия не найдена")
 
@@ -295,16 +276,7 @@ async def update_session(
     await db.commit()
     await db.refresh(session)
 
-    result = await db.execute(
-        select(ExamPortalSession)
-        .options(
-            selectinload(ExamPortalSession.exam),
-            selectinload(ExamPortalSession.school_location),
-            selectinload(ExamPortalSession.time_slots).selectinload(ExamTimeSlot.registrations),
-        )
-        .where(ExamPortalSession.id == session_id)
-    )
-    return _session_to_response(result.scalar_one())
+    return await _get_session_response(db, session_id)
 
 
 @router.delete("/{session_id}", status_code=204)
@@ -336,20 +308,12 @@ async def add_time_slot(
         date=data.date,
         start_time=data.start_time,
         total_seats=data.total_seats,
+        waitlist_enabled=data.waitlist_enabled,
     )
     db.add(slot)
     await db.commit()
 
-    result = await db.execute(
-        select(ExamPortalSession)
-        .options(
-            selectinload(ExamPortalSession.exam),
-            selectinload(ExamPortalSession.school_location),
-            selectinload(ExamPortalSession.time_slots).selectinload(ExamTimeSlot.registrations),
-        )
-        .where(ExamPortalSession.id == session_id)
-    )
-    return _session_to_response(result.scalar_one())
+    return await _get_session_response(db, session_id)
 
 
 @router.delete("/{session_id}/slots/{slot_id}", status_code=204)
@@ -631,7 +595,62 @@ async def backfill_chat_public_keys(
 
 # ── Helper ─────────────────────────────────────────────────────────────────────
 
-def _session_to_response(s: ExamPortalSession) -> SessionResponse:
+# Registrations are never loaded for listings: seat counts are stored on the slot,
+# everything else comes from one grouped query (_slot_stats)
+_SESSION_LOAD_OPTIONS = (
+    selectinload(ExamPortalSession.exam),
+    selectinload(ExamPortalSession.school_location),
+    selectinload(ExamPortalSession.time_slots),
+)
+
+_EMPTY_SLOT_STATS = {
+    "waitlisted_count": 0,
+    "attendance": {"present": 0, "absent": 0, "unmarked": 0},
+    "passed": {"passed": 0, "failed": 0, "unmarked": 0},
+}
+
+
+async def _slot_stats(db: AsyncSession, slot_ids: list[uuid.UUID]) -> dict[uuid.UUID, dict]:
+    """Per-slot waitlist size and attendance/passed breakdown of seated registrations."""
+    if not slot_ids:
+        return {}
+    seated = ExamRegistration.status == RegistrationStatus.registered.value
+    result = await db.execute(
+        select(
+            ExamRegistration.time_slot_id,
+            func.count().filter(ExamRegistration.status == RegistrationStatus.waitlisted.value).label("waitlisted"),
+            func.count().filter(seated, ExamRegistration.attendance == "present").label("present"),
+            func.count().filter(seated, ExamRegistration.attendance == "absent").label("absent"),
+            func.count().filter(seated, ExamRegistration.attendance.is_(None)).label("attendance_unmarked"),
+            func.count().filter(seated, ExamRegistration.passed.is_(True)).label("passed"),
+            func.count().filter(seated, ExamRegistration.passed.is_(False)).label("failed"),
+            func.count().filter(seated, ExamRegistration.passed.is_(None)).label("passed_unmarked"),
+        )
+        .where(ExamRegistration.time_slot_id.in_(slot_ids))
+        .group_by(ExamRegistration.time_slot_id)
+    )
+    return {
+        row.time_slot_id: {
+            "waitlisted_count": row.waitlisted,
+            "attendance": {"present": row.present, "absent": row.absent, "unmarked": row.attendance_unmarked},
+            "passed": {"passed": row.passed, "failed": row.failed, "unmarked": row.passed_unmarked},
+        }
+        for row in result
+    }
+
+
+async def _get_session_response(db: AsyncSession, session_id: uuid.UUID) -> SessionResponse:
+    result = await db.execute(
+        select(ExamPortalSession)
+        .options(*_SESSION_LOAD_OPTIONS)
+        .where(ExamPortalSession.id == session_id)
+    )
+    session = result.scalar_one()
+    stats = await _slot_stats(db, [slot.id for slot in session.time_slots])
+    return _session_to_response(session, stats)
+
+
+def _session_to_response(s: ExamPortalSession, stats: dict[uuid.UUID, dict]) -> SessionResponse:
     return SessionResponse(
         id=str(s.id),
         exam_id=str(s.exam_id),
@@ -646,8 +665,10 @@ def _session_to_response(s: ExamPortalSession) -> SessionResponse:
                 "date": str(slot.date),
                 "start_time": slot.start_time,
                 "total_seats": slot.total_seats,
-                "registered_count": len(slot.registrations),
-                "available_seats": max(0, slot.total_seats - len(slot.registrations)),
+                "registered_count": slot.registered_count,
+                "available_seats": slot.available_seats,
+                "waitlist_enabled": slot.waitlist_enabled,
+                **stats.get(slot.id, _EMPTY_SLOT_STATS),
             }
             for slot in s.time_slots
         ],
@@ -1,6 +1,8 @@
+import asyncio
+from dataclasses import asdict
 from uuid import UUID
 
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, status
 from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import selectinload
@@ -9,15 +11,49 @@ from app.database import get_db
 from app.models.exam import Exam, ExamResult
 from app.models.group import Group
 from app.models.employee import Employee
+from app.models.student import Student
 from app.schemas.exam import (
     ExamCreate, ExamUpdate, ExamResponse,
     ExamResultCreate, ExamResultUpdate, ExamResultResponse,
+    ExamAnalyticsResponse,
+    ExamAnswerKey, ExamAnswerKeyResponse, ExamRescoreResponse,
+    ExamSubmissionBatch, ScoredResultResponse,
+    ExamResultGrid, ExamResultsBulkResponse,
 )
 from app.auth.dependencies import get_current_user
+from app.services.exam_analytics import get_exam_analytics, invalidate_exam_analytics
+from app.s3 import MAX_FILE_SIZE
+from app.services.exam_results_import import ResultRow, parse_result_file, resolve_students, upsert_exam_results
+from app.services.exam_scoring import invalidate_rescored, load_exam_for_scoring, rescore_exam, score_batch
+from app.services.student_progress import invalidate_exam_progress, invalidate_student_progress, exam_student_ids
 
 router = APIRouter(prefix="/exams", tags=["exams"])
 
 
+async def _get_exam_for_edit(db: AsyncSession, exam_id: UUID, current_user: Employee) -> Exam:
+    """404 for a missing exam, 403 for a teacher editing another teacher's group exam."""
+    exam = await db.get(Exam, exam_id)
+    if not exam:
+        raise HTTPException(status_code=404, detail="Exam not found")
+    if current_user.role == "teacher" and exam.group_id:
+        group = await db.get(Group, exam.group_id)
+        if group and group.teacher_id != current_user.id:
+            raise HTTPException(status_code=403, detail="Access denied")
+    return exam
+
+
+async def _apply_answer_key(db: AsyncSession, er: ExamResult) -> None:
+    """Compute answers and scores of one result from its raw answers, if the exam has a key."""
+    loaded = await load_exam_for_scoring(db, er.exam_id)
+    if loaded is None or not loaded[0].answer_key:
+        return
+    exam, subject = loaded
+    scored = score_batch([er.raw_answers], [er.answers], answer_key=exam.answer_key, subject=subject)
+    er.answers = scored.answers[0]
+    er.primary_score = scored.primary_scores[0]
+    er.final_score = scored.final_scores[0]
+
+
 @router.get("/", response_model=list[ExamResponse])
 async def list_exams(
     group_id: UUID | None = None,
@@ -143,6 +179,8 @@ async def update_exam(
             exam.subject = subject.name
 
     await db.commit()
+    invalidate_exam_analytics(exam_id)
+    await invalidate_exam_progress(db, exam_id)
 
     # Reload exam with relationships
     result = await db.execute(
@@ -176,11 +214,189 @@ async def delete_exam(
         if group and group.teacher_id != current_user.id:
             raise HTTPException(status_code=403, detail="Access denied")
 
+    student_ids = await exam_student_ids(db, exam_id)
     await db.delete(exam)
     await db.commit()
+    invalidate_exam_analytics(exam_id)
+    invalidate_student_progress(*student_ids)
     return {"detail": "Deleted"}
 
 
+@router.get("/{exam_id}/analytics", response_model=ExamAnalyticsResponse)
+async def get_exam_analytics_endpoint(
+    exam_id: UUID,
+    db: AsyncSession = Depends(get_db),
+    _: Employee = Depends(get_current_user),
+):
+    """Per-task solve rates, discrimination and distributions, topic mastery, pass rate."""
+    return await get_exam_analytics(db, exam_id)
+
+
+# --- Answer key & automatic scoring ---
+
+@router.get("/{exam_id}/answer-key", response_model=ExamAnswerKeyResponse)
+async def get_answer_key(
+    exam_id: UUID,
+    db: AsyncSession = Depends(get_db),
+    current_user: Employee = Depends(get_current_user),
+):
+    exam = await _get_exam_for_edit(db, exam_id, current_user)
+    return ExamAnswerKeyResponse(exam_id=exam.id, tasks=exam.answer_key or {})
+
+
+@router.put("/{exam_id}/answer-key", response_model=ExamAnswerKeyResponse)
+async def set_answer_key(
+    exam_id: UUID,
+    data: ExamAnswerKey,
+    db: AsyncSession = Depends(get_db),
+    current_user: Employee = Depends(get_current_user),
+):
+    """Save the key and re-score every result of the exam with it."""
+    exam = await _get_exam_for_edit(db, exam_id, current_user)
+    exam.answer_key = {str(number): task.model_dump() for number, task in data.tasks.items()} or None
+    await db.flush()
+    rescored = await rescore_exam(db, exam_id)
+    await db.commit()
+    invalidate_rescored(rescored)
+    return ExamAnswerKeyResponse(exam_id=exam.id, tasks=exam.answer_key or {}, rescored=rescored.count)
+
+
+@router.post("/{exam_id}/rescore", response_model=ExamRescoreResponse)
+async def rescore_exam_results(
+    exam_id: UUID,
+    db: AsyncSession = Depends(get_db),
+    current_user: Employee = Depends(get_current_user),
+):
+    """Re-score all results with the current key and the subject's scale."""
+    await _get_exam_for_edit(db, exam_id, current_user)
+    rescored = await rescore_exam(db, exam_id)
+    await db.commit()
+    invalidate_rescored(rescored)
+    return ExamRescoreResponse(rescored=rescored.count)
+
+
+@router.post("/{exam_id}/results/score-batch", response_model=list[ScoredResultResponse])
+async def score_submission_batch(
+    exam_id: UUID,
+    data: ExamSubmissionBatch,
+    db: AsyncSession = Depends(get_db),
+    current_user: Employee = Depends(get_current_user),
+):
+    """Score a group's submissions against the answer key in one pass and save the results."""
+    exam = await _get_exam_for_edit(db, exam_id, current_user)
+    if not exam.answer_key:
+        raise HTTPException(status_code=400, detail="У экзамена нет ключа ответов")
+    submissions = list({s.student_id: s for s in data.submissions}.values())
+    if not submissions:
+        return []
+    student_ids = [s.student_id for s in submissions]
+
+    known = set((await db.execute(select(Student.id).where(Student.id.in_(student_ids)))).scalars().all())
+    unknown = [str(sid) for sid in student_ids if sid not in known]
+    if unknown:
+        raise HTTPException(status_code=404, detail=f"Ученики не найдены: {', '.join(unknown)}")
+
+    _, subject = await load_exam_for_scoring(db, exam_id)
+    scored = score_batch(
+        [s.raw_answers for s in submissions],
+        [s.answers for s in submissions],
+        answer_key=exam.answer_key,
+        subject=subject,
+    )
+    existing = {
+        er.student_id: er
+        for er in (await db.execute(
+            select(ExamResult).where(ExamResult.exam_id == exam_id, ExamResult.student_id.in_(student_ids))
+        )).scalars().all()
+    }
+
+    saved = []
+    for s, answers, primary, final in zip(submissions, scored.answers, scored.primary_scores, scored.final_scores):
+        er = existing.get(s.student_id)
+        created = er is None
+        if created:
+            er = ExamResult(
+                exam_id=exam_id,
+                student_id=s.student_id,
+                added_by=current_user.id,
+                added_by_first_name=current_user.first_name,
+                added_by_last_name=current_user.last_name,
+            )
+            db.add(er)
+        er.raw_answers = s.raw_answers
+        er.answers = answers
+        er.primary_score = primary
+        er.final_score = final
+        saved.append((er, created))
+    await db.commit()
+    invalidate_exam_analytics(exam_id)
+    await invalidate_exam_progress(db, exam_id)
+
+    return [
+        ScoredResultResponse(
+            result_id=er.id,
+            student_id=er.student_id,
+            answers=er.answers,
+            primary_score=er.primary_score,
+            final_score=er.final_score,
+            created=created,
+        )
+        for er, created in saved
+    ]
+
+
+# --- Bulk results ---
+
+@router.put("/{exam_id}/results/grid", response_model=ExamResultsBulkResponse)
+async def upsert_result_grid(
+    exam_id: UUID,
+    data: ExamResultGrid,
+    db: AsyncSession = Depends(get_db),
+    current_user: Employee = Depends(get_current_user),
+):
+    """Save a whole group's result grid; rows with errors are reported, the rest are saved."""
+    exam = await _get_exam_for_edit(db, exam_id, current_user)
+    rows = [ResultRow(row=i, **r.model_dump()) for i, r in enumerate(data.rows, 1)]
+    outcome = await upsert_exam_results(db, exam, rows, current_user)
+    return ExamResultsBulkResponse(
+        created=outcome.created,
+        updated=outcome.updated,
+        errors=[asdict(e) for e in outcome.errors],
+    )
+
+
+@router.post("/{exam_id}/results/import", response_model=ExamResultsBulkResponse)
+async def import_results(
+    exam_id: UUID,
+    file: UploadFile = File(...),
+    db: AsyncSession = Depends(get_db),
+    current_user: Employee = Depends(get_current_user),
+):
+    """
+    Import results from CSV or XLSX. Students are matched by portal login or name;
+    task columns hold answers for tasks in the answer key and scores for the rest.
+    """
+    exam = await _get_exam_for_edit(db, exam_id, current_user)
+    name = (file.filename or "").lower()
+    if not name.endswith((".csv", ".xlsx")):
+        raise HTTPException(status_code=400, detail="Поддерживаются только файлы CSV и XLSX")
+    if file.size is not None and file.size > MAX_FILE_SIZE:
+        raise HTTPException(status_code=400, detail="Файл слишком большой (макс. 10 МБ)")
+
+    try:
+        parsed, parse_errors = await asyncio.to_thread(parse_result_file, file.file, name, exam)
+    except Exception:
+        raise HTTPException(status_code=400, detail="Не удалось прочитать файл")
+    rows, match_errors = await resolve_students(db, exam, parsed)
+    outcome = await upsert_exam_results(db, exam, rows, current_user)
+    errors = sorted([*parse_errors, *match_errors, *outcome.errors], key=lambda e: e.row)
+    return ExamResultsBulkResponse(
+        created=outcome.created,
+        updated=outcome.updated,
+        errors=[asdict(e) for e in errors],
+    )
+
+
 # --- Exam Results ---
 
 @router.get("/results/all", response_model=list[ExamResultResponse])
@@ -246,6 +462,12 @@ async def create_exam_result(
             if group and group.teacher_id != current_user.id:
                 raise HTTPException(status_code=403, detail="Access denied")
 
+    duplicate = await db.execute(
+        select(ExamResult.id).where(ExamResult.exam_id == exam_id, ExamResult.student_id == data.student_id)
+    )
+    if duplicate.scalar_one_or_none() is not None:
+        raise HTTPException(status_code=400, detail="Результат этого ученика уже добавлен")
+
     er = ExamResult(
         exam_id=exam_id,
         **data.model_dump(),
@@ -253,8 +475,12 @@ async def create_exam_result(
         added_by_first_name=current_user.first_name,
         added_by_last_name=current_user.last_name
     )
+    if er.raw_answers is not None:
+        await _apply_answer_key(db, er)
     db.add(er)
     await db.commit()
+    invalidate_exam_analytics(exam_id)
+    await invalidate_exam_progress(db, exam_id)
     await db.refresh(er, ["student", "added_by_employee"])
     return er
 
@@ -287,10 +513,15 @@ async def update_exam_result(
     if not er:
         raise HTTPException(status_code=404, detail="Result not found")
 
-    for field, value in data.model_dump(exclude_unset=True).items():
+    changes = data.model_dump(exclude_unset=True)
+    for field, value in changes.items():
         setattr(er, field, value)
+    if er.raw_answers is not None and ("raw_answers" in changes or "answers" in changes):
+        await _apply_answer_key(db, er)
 
     await db.commit()
+    invalidate_exam_analytics(er.exam_id)
+    await invalidate_exam_progress(db, er.exam_id)
     await db.refresh(er, ["student", "added_by_employee"])
     return er
 
@@ -324,4 +555,7 @@ async def delete_exam_result(
 
     await db.delete(er)
     await db.commit()
+    invalidate_exam_analytics(exam_id)
+    await invalidate_exam_progress(db, exam_id)
+    invalidate_student_progress(er.student_id)
     return {"detail": "Deleted"}
@@ -11,11 +11,19 @@ from pydantic import BaseModel
 from app.database import get_db
 from app.models.group import Group, GroupStudent
 from app.models.employee import Employee
-from app.models.lesson import Lesson
+from app.models.lesson import Lesson, LessonAttendance, LessonStatus, AttendanceStatus, GradingSystem, HomeworkGrading
 from app.models.student import Student, StudentHistory, HistoryEventType
-from app.schemas.group import GroupCreate, GroupUpdate, GroupResponse, GroupStudentAdd, GroupStudentResponse
+from app.schemas.group import (
+    GroupCreate, GroupUpdate, GroupResponse, GroupStudentAdd, GroupStudentResponse,
+    GroupJournalResponse, JournalStudent, JournalLesson, JournalCells, JournalStudentStats,
+)
 from app.schemas.lesson import LessonResponse
 from app.auth.dependencies import get_current_user, get_manager_location_id
+from app.services.performance import invalidate_student_performance
+from app.services.lessons import (
+    expand_schedule_dates, build_lesson_rows, insert_lessons, delete_unmarked_lessons,
+    get_existing_lesson_dates, get_holidays,
+)
 
 router = APIRouter(prefix="/groups", tags=["groups"])
 
@@ -23,6 +31,7 @@ router = APIRouter(prefix="/groups", tags=["groups"])
 class GenerateLessonsRequest(BaseModel):
     end_date: Optional[date] = None
     months: Optional[int] = None
+    exclude_dates: Optional[list[date]] = None  # one-off days off in addition to school holidays
 
 
 @router.get("/")
@@ -191,6 +200,8 @@ async def update_group(
     update_data = data.model_dump(exclude_unset=True, exclude_none=False)
     for field, value in update_data.items():
         setattr(group, field, value)
+    if "start_date" in update_data:
+        group.schedule_changed = True
 
     await db.commit()
     await db.refresh(group, ["subject", "teacher", "students", "schedules", "location"])
@@ -320,6 +331,7 @@ async def add_student_to_group(
 
     await db.commit()
     await db.refresh(gs)
+    invalidate_student_performance(data.student_id)
 
     # Load the student relationship
     result = await db.execute(
@@ -371,6 +383,7 @@ async def remove_student_from_group(
         gs.is_archived = True
 
     await db.commit()
+    invalidate_student_performance(student_id)
     return {"detail": "Archived"}
 
 
@@ -428,6 +441,7 @@ async def restore_student_to_group(
         await db.delete(duplicate)
 
     await db.commit()
+    invalidate_student_performance(student_id)
     return {"detail": "Restored"}
 
 
@@ -502,20 +516,169 @@ async def get_archived_students(
     return result.scalars().all()
 
 
-# --- Lesson Generation ---
+# --- Group Journal ---
+
+JOURNAL_ATTENDANCE_CODES = [s.value for s in AttendanceStatus]
+_JOURNAL_CODE_INDEX = {code: i for i, code in enumerate(JOURNAL_ATTENDANCE_CODES)}
+
+
+def _numeric_grade(value: Optional[str]) -> Optional[float]:
+    """Parse a 5-point grade stored as text; non-numeric marks (e.g. pass/fail) return None."""
+    if not value:
+        return None
+    try:
+        return float(value.strip().replace(",", "."))
+    except ValueError:
+        return None
+
+
+@router.get("/{group_id}/journal", response_model=GroupJournalResponse)
+async def get_group_journal(
+    group_id: UUID,
+    date_from: Optional[date] = Query(None, alias="from"),
+    date_to: Optional[date] = Query(None, alias="to"),
+    db: AsyncSession = Depends(get_db),
+    current_user: Employee = Depends(get_current_user),
+    manager_location_id: Optional[UUID] = Depends(get_manager_location_id),
+):
+    """
+    Students × lessons journal of a group in compact columnar form.
+    Only filled cells are sent: cells.student_idx[i] / cells.lesson_idx[i] point into
+    `students` / `lessons`, cells.attendance[i] points into `attendance_codes`.
+    """
+    result = await db.execute(select(Group).where(Group.id == group_id))
+    group = result.scalar_one_or_none()
+    if not group:
+        raise HTTPException(status_code=404, detail="Group not found")
 
-# Mapping of Russian day names to weekday numbers (0 = Monday, 6 = Sunday)
-DAY_NAME_TO_WEEKDAY = {
-    "Понедельник": 0,
-    "Вторник": 1,
-    "Среда": 2,
-    "Четверг": 3,
-    "Пятница": 4,
-    "Суббота": 5,
-    "Воскресенье": 6,
-}
+    if current_user.role == "teacher" and group.teacher_id != current_user.id:
+        raise HTTPException(status_code=403, detail="Access denied")
+
+    if manager_location_id is not None and group.school_location_id != manager_location_id:
+        raise HTTPException(status_code=403, detail="Access denied")
+
+    # One pass over lessons ⟕ lesson_attendance for the whole range
+    query = (
+        select(
+            Lesson.id,
+            Lesson.date,
+            Lesson.time,
+            Lesson.topic,
+            Lesson.status,
+            Lesson.is_cancelled,
+            Lesson.grading_system,
+            Lesson.homework_grading,
+            LessonAttendance.student_id,
+            LessonAttendance.attendance,
+            LessonAttendance.lesson_grade,
+            LessonAttendance.homework_grade,
+        )
+        .outerjoin(LessonAttendance, LessonAttendance.lesson_id == Lesson.id)
+        .where(Lesson.group_id == group_id)
+        .order_by(Lesson.date, Lesson.time, Lesson.id)
+    )
+    if date_from:
+        query = query.where(Lesson.date >= date_from)
+    if date_to:
+        query = query.where(Lesson.date <= date_to)
+    rows = (await db.execute(query)).all()
+
+    members_result = await db.execute(
+        select(Student.id, Student.first_name, Student.last_name, GroupStudent.is_archived)
+        .join(GroupStudent, GroupStudent.student_id == Student.id)
+        .where(GroupStudent.group_id == group_id)
+        .order_by(Student.last_name, Student.first_name)
+    )
+    # A student may have duplicate membership rows; active membership wins
+    members: dict[UUID, tuple] = {}
+    for sid, first_name, last_name, is_archived in members_result.all():
+        if sid not in members or not is_archived:
+            members[sid] = (first_name, last_name, bool(is_archived))
+
+    # Archived students are kept only if they have marks in the requested range
+    marked_ids = {row.student_id for row in rows if row.student_id is not None}
+    students = [
+        JournalStudent(id=sid, first_name=fn, last_name=ln, is_archived=archived)
+        for sid, (fn, ln, archived) in members.items()
+        if not archived or sid in marked_ids
+    ]
+    student_index = {s.id: i for i, s in enumerate(students)}
+
+    lessons: list[JournalLesson] = []
+    lesson_index: dict[UUID, int] = {}
+    cells = JournalCells()
+    # Plain per-student accumulators on purpose: a journal is tens of students × lessons,
+    # so array code (numpy) would cost more in conversion than the loop itself
+    n = len(students)
+    conducted_total = [0] * n
+    attended = [0] * n
+    lesson_sum, lesson_cnt = [0.0] * n, [0] * n
+    hw_sum, hw_cnt = [0.0] * n, [0] * n
+
+    for row in rows:
+        l_idx = lesson_index.get(row.id)
+        if l_idx is None:
+            l_idx = lesson_index[row.id] = len(lessons)
+            lessons.append(JournalLesson(
+                id=row.id,
+                date=row.date,
+                time=row.time,
+                topic=row.topic,
+                status=row.status.value if row.status else None,
+                is_cancelled=bool(row.is_cancelled),
+            ))
+
+        s_idx = student_index.get(row.student_id)
+        if s_idx is None:
+            continue
+
+        code = row.attendance.value if row.attendance else None
+        cells.student_idx.append(s_idx)
+        cells.lesson_idx.append(l_idx)
+        cells.attendance.append(_JOURNAL_CODE_INDEX[code] if code else None)
+        cells.lesson_grade.append(row.lesson_grade)
+        cells.homework_grade.append(row.homework_grade)
+
+        if row.status != LessonStatus.conducted or row.is_cancelled:
+            continue
+        if code:
+            conducted_total[s_idx] += 1
+            if code in ("present", "late"):
+                attended[s_idx] += 1
+        if row.grading_system != GradingSystem.tasks:
+            grade = _numeric_grade(row.lesson_grade)
+            if grade is not None:
+                lesson_sum[s_idx] += grade
+                lesson_cnt[s_idx] += 1
+        if row.homework_grading not in (HomeworkGrading.tasks, HomeworkGrading.passfall):
+            grade = _numeric_grade(row.homework_grade)
+            if grade is not None:
+                hw_sum[s_idx] += grade
+                hw_cnt[s_idx] += 1
+
+    stats = JournalStudentStats(
+        attendance_rate=[
+            round(attended[i] / conducted_total[i] * 100, 1) if conducted_total[i] else None
+            for i in range(n)
+        ],
+        mean_lesson_grade=[round(lesson_sum[i] / lesson_cnt[i], 2) if lesson_cnt[i] else None for i in range(n)],
+        mean_homework_grade=[round(hw_sum[i] / hw_cnt[i], 2) if hw_cnt[i] else None for i in range(n)],
+    )
+
+    return GroupJournalResponse(
+        group_id=group_id,
+        date_from=date_from,
+        date_to=date_to,
+        attendance_codes=JOURNAL_ATTENDANCE_CODES,
+        students=students,
+        lessons=lessons,
+        cells=cells,
+        stats=stats,
+    )
 
 
+# --- Lesson Generation ---
+
 @router.post("/{group_id}/generate-lessons", response_model=list[LessonResponse])
 async def generate_lessons(
     group_id: UUID,
@@ -526,6 +689,7 @@ async def generate_lessons(
     """
     Generate lessons for a group based on its schedule.
     Either end_date or months must be provided.
+    School holidays and request.exclude_dates are skipped.
     """
     # Get group with schedules
     result = await db.execute(
@@ -556,44 +720,18 @@ async def generate_lessons(
         # Default to 3 months
         end_date = group.start_date + timedelta(days=90)
 
-    # Generate lessons
-    created_lessons = []
-    current_date = group.start_date
-
-    # Get existing lessons to avoid duplicates
-    existing_result = await db.execute(
-        select(Lesson.date).where(Lesson.group_id == group_id)
-    )
-    existing_dates = {row[0] for row in existing_result.all()}
-
-    while current_date <= end_date:
-        weekday = current_date.weekday()
-
-        # Check if there's a schedule for this weekday
-        for schedule in group.schedules:
-            schedule_weekday = DAY_NAME_TO_WEEKDAY.get(schedule.day_of_week)
-
-            if schedule_weekday == weekday and current_date not in existing_dates:
-                lesson = Lesson(
-                    group_id=group_id,
-                    date=current_date,
-                    time=schedule.start_time,
-                    duration=schedule.duration_minutes,
-                    is_cancelled=False,
-                    work_type="none",
-                    had_previous_homework=False,
-                )
-                db.add(lesson)
-                created_lessons.append(lesson)
-
-        current_date += timedelta(days=1)
+    # Skip dates that already have lessons, holidays and explicit exclusions
+    skip_dates = await get_existing_lesson_dates(db, group_id)
+    skip_dates |= await get_holidays(db)
+    skip_dates |= set(request.exclude_dates or [])
 
+    slots = expand_schedule_dates(group.schedules, group.start_date, end_date, skip_dates)
+    created_lessons = await insert_lessons(db, build_lesson_rows(group_id, slots))
+    # Let the background scheduler continue after these dates instead of recreating them
+    if group.lessons_generated_until is None or group.lessons_generated_until < end_date:
+        group.lessons_generated_until = end_date
     await db.commit()
 
-    # Refresh all lessons to get their IDs
-    for lesson in created_lessons:
-        await db.refresh(lesson)
-
     return created_lessons
 
 
@@ -622,32 +760,14 @@ async def delete_group_lessons(
     if current_user.role == "teacher" and group.teacher_id != current_user.id:
         raise HTTPException(status_code=403, detail="Access denied")
 
-    # Build query - load attendances to check if lesson was conducted
-    query = select(Lesson).options(selectinload(Lesson.attendances)).where(Lesson.group_id == group_id)
-
     if from_date:
-        query = query.where(Lesson.date >= from_date)
+        delete_from = from_date
     elif only_future:
-        from datetime import datetime
-        today = datetime.now().date()
-        query = query.where(Lesson.date >= today)
-
-    # Get lessons to delete
-    lessons_result = await db.execute(query)
-    lessons = lessons_result.scalars().all()
-
-    # Filter out conducted lessons and lessons with attendance
-    deleted_count = 0
-    skipped_count = 0
-    for lesson in lessons:
-        # Skip if lesson is conducted or has attendance records
-        if lesson.status == "conducted" or len(lesson.attendances) > 0:
-            skipped_count += 1
-            continue
-
-        await db.delete(lesson)
-        deleted_count += 1
+        delete_from = datetime.now().date()
+    else:
+        delete_from = None
 
+    deleted_count, skipped_count = await delete_unmarked_lessons(db, group_id, delete_from)
     await db.commit()
 
     return {
@@ -670,8 +790,12 @@ async def regenerate_lessons(
     First deletes existing future lessons (if delete_existing=true),
     then generates new ones based on current schedule.
     """
-    # Get group
-    result = await db.execute(select(Group).where(Group.id == group_id))
+    # Get group with schedules
+    result = await db.execute(
+        select(Group)
+        .options(selectinload(Group.schedules))
+        .where(Group.id == group_id)
+    )
     group = result.scalar_one_or_none()
     if not group:
         raise HTTPException(status_code=404, detail="Group not found")
@@ -680,38 +804,15 @@ async def regenerate_lessons(
     if current_user.role == "teacher" and group.teacher_id != current_user.id:
         raise HTTPException(status_code=403, detail="Access denied")
 
+    today = datetime.now().date()
+
     deleted_count = 0
     skipped_count = 0
     if delete_existing:
-        # Delete future lessons (but not conducted ones)
-        from datetime import datetime
-        today = datetime.now().date()
-        lessons_result = await db.execute(
-            select(Lesson)
-            .options(selectinload(Lesson.attendances))
-            .where(
-                Lesson.group_id == group_id,
-                Lesson.date >= today
-            )
-        )
-        lessons = lessons_result.scalars().all()
-        for lesson in lessons:
-            # Skip if lesson is conducted or has attendance records
-            if lesson.status == "conducted" or len(lesson.attendances) > 0:
-                skipped_count += 1
-                continue
-            await db.delete(lesson)
-            deleted_count += 1
+        # Delete future lessons (but not conducted ones) with a single DELETE
+        deleted_count, skipped_count = await delete_unmarked_lessons(db, group_id, today)
         await db.commit()
 
-    # Generate new lessons using the existing generate_lessons logic
-    result = await db.execute(
-        select(Group)
-        .options(selectinload(Group.schedules))
-        .where(Group.id == group_id)
-    )
-    group = result.scalar_one_or_none()
-
     if not group.start_date:
         raise HTTPException(status_code=400, detail="Group must have a start_date to generate lessons")
 
@@ -722,55 +823,26 @@ async def regenerate_lessons(
     if request.end_date:
         end_date = request.end_date
     elif request.months:
-        from datetime import datetime
-        today = datetime.now().date()
         end_date = today + timedelta(days=30 * request.months)
     else:
         # Default to 3 months from today
-        from datetime import datetime
-        today = datetime.now().date()
         end_date = today + timedelta(days=90)
 
-    # Generate lessons
-    created_lessons = []
-    from datetime import datetime
-    today = datetime.now().date()
-    current_date = max(group.start_date, today)  # Start from today or group start date, whichever is later
+    # Start from today or group start date, whichever is later
+    start_date = max(group.start_date, today)
 
-    # Get existing lessons to avoid duplicates
-    existing_result = await db.execute(
-        select(Lesson.date).where(Lesson.group_id == group_id)
-    )
-    existing_dates = {row[0] for row in existing_result.all()}
-
-    while current_date <= end_date:
-        weekday = current_date.weekday()
-
-        # Check if there's a schedule for this weekday
-        for schedule in group.schedules:
-            schedule_weekday = DAY_NAME_TO_WEEKDAY.get(schedule.day_of_week)
-
-            if schedule_weekday == weekday and current_date not in existing_dates:
-                lesson = Lesson(
-                    group_id=group_id,
-                    date=current_date,
-                    time=schedule.start_time,
-                    duration=schedule.duration_minutes,
-                    is_cancelled=False,
-                    work_type="none",
-                    had_previous_homework=False,
-                )
-                db.add(lesson)
-                created_lessons.append(lesson)
-
-        current_date += timedelta(days=1)
+    skip_dates = await get_existing_lesson_dates(db, group_id)
+    skip_dates |= await get_holidays(db)
+    skip_dates |= set(request.exclude_dates or [])
 
+    slots = expand_schedule_dates(group.schedules, start_date, end_date, skip_dates)
+    created_lessons = await insert_lessons(db, build_lesson_rows(group_id, slots))
+    # Lessons now follow the current schedule — the background scheduler continues from end_date
+    group.schedule_changed = False
+    if group.lessons_generated_until is None or group.lessons_generated_until < end_date:
+        group.lessons_generated_until = end_date
     await db.commit()
 
-    # Refresh all lessons to get their IDs
-    for lesson in created_lessons:
-        await db.refresh(lesson)
-
     detail_parts = [f"Создано {len(created_lessons)} новых уроков"]
     if deleted_count > 0:
         detail_parts.insert(0, f"Удалено {deleted_count} уроков")
@@ -782,5 +854,5 @@ async def regenerate_lessons(
         "deleted_count": deleted_count,
         "skipped_count": skipped_count,
         "created_count": len(created_lessons),
-        "lessons": created_lessons
+        "lessons": [LessonResponse.model_validate(lesson) for lesson in created_lessons]
     }
@@ -1,8 +1,6 @@
-import uuid
 from uuid import UUID
 
 from fastapi import APIRouter, Depends, File, HTTPException, Request, UploadFile, status
-from fastapi.responses import Response
 from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import selectinload
@@ -18,6 +16,11 @@ from app.schemas.home_banner import (
     HomeBannerSignupUpdate,
 )
 from app.auth.dependencies import get_current_user, require_role
+from app.schemas.upload import PresignUploadRequest, PresignedUploadResponse, FinalizeUploadRequest
+from app.services.file_cache import get_cached_file, cached_file_response, get_file_cache_stats
+from app.services.portal_cache import invalidate_portal_content, BANNERS
+from app.services.uploads import presign_upload, finalize_upload
+from app.services.file_store import store_upload
 
 router = APIRouter(prefix="/home-banners", tags=["home-banners"])
 
@@ -52,6 +55,7 @@ async def create_banner(
         banner.form_fields.append(HomeBannerFormField(**f))
     db.add(banner)
     await db.commit()
+    await invalidate_portal_content(BANNERS)
 
     result = await db.execute(
         select(HomeBanner)
@@ -90,6 +94,7 @@ async def update_banner(
             banner.form_fields.append(HomeBannerFormField(**f))
 
     await db.commit()
+    await invalidate_portal_content(BANNERS)
 
     result = await db.execute(
         select(HomeBanner)
@@ -112,6 +117,7 @@ async def delete_banner(
 
     await db.delete(banner)
     await db.commit()
+    await invalidate_portal_content(BANNERS)
     return {"detail": "Deleted"}
 
 
@@ -169,40 +175,18 @@ async def delete_signup(
 async def upload_banner_image(
     request: Request,
     file: UploadFile = File(...),
+    db: AsyncSession = Depends(get_db),
     _: Employee = Depends(require_role(EmployeeRole.admin)),
 ):
-    from app.s3 import ALLOWED_IMAGE_TYPES, MAX_FILE_SIZE
-    from app.config import settings as app_settings
-    import boto3
-    from botocore.config import Config as BotoConfig
-    from io import BytesIO
+    from app.s3 import ALLOWED_IMAGE_TYPES
 
     content_type = file.content_type or "application/octet-stream"
     if content_type not in ALLOWED_IMAGE_TYPES:
         raise HTTPException(status_code=400, detail="Только изображения (jpeg/png/gif/webp)")
 
-    data = await file.read()
-    if len(data) > MAX_FILE_SIZE:
-        raise HTTPException(status_code=400, detail="Файл слишком большой (макс. 10 МБ)")
-
-    original_name = file.filename or "image"
-    ext = original_name.rsplit(".", 1)[-1] if "." in original_name else "bin"
-    key = f"banners/{uuid.uuid4().hex}.{ext}"
-
-    client = boto3.client(
-        "s3",
-        endpoint_url=app_settings.S3_ENDPOINT_URL or None,
-        aws_access_key_id=app_settings.S3_ACCESS_KEY,
-        aws_secret_access_key=app_settings.S3_SECRET_KEY,
-        region_name=app_settings.S3_REGION or None,
-        config=BotoConfig(signature_version="s3v4"),
-    )
-    client.upload_fileobj(
-        BytesIO(data),
-        app_settings.S3_BUCKET_NAME,
-        key,
-        ExtraArgs={"ContentType": content_type},
-    )
+    stored = await store_upload(db, file, prefix="banners", content_type=content_type)
+    await db.commit()
+    key = stored.key
 
     # Public URL served by this router (no auth — banner images are public)
     base = str(request.base_url).rstrip("/")
@@ -210,20 +194,53 @@ async def upload_banner_image(
     return {"url": url, "key": key}
 
 
-@router.get("/images/{file_key:path}")
-async def serve_banner_image(file_key: str):
-    from app.s3 import download_file
+@router.post("/image/presign", response_model=PresignedUploadResponse)
+async def presign_banner_image_upload(
+    body: PresignUploadRequest,
+    current_user: Employee = Depends(require_role(EmployeeRole.admin)),
+):
+    """Direct upload, step 1: presigned POST to S3. POST /upload-image remains as a fallback."""
+    from app.s3 import ALLOWED_IMAGE_TYPES
+
+    return presign_upload(
+        body,
+        purpose="banner",
+        owner=f"employee:{current_user.id}",
+        prefix="banners",
+        allowed_types=ALLOWED_IMAGE_TYPES,
+    )
+
+
+@router.post("/image/finalize")
+async def finalize_banner_image_upload(
+    request: Request,
+    body: FinalizeUploadRequest,
+    current_user: Employee = Depends(require_role(EmployeeRole.admin)),
+):
+    """Direct upload, step 2: verify the object; returns the same payload as POST /upload-image."""
+    upload = await finalize_upload(
+        body.upload_token, purpose="banner", owner=f"employee:{current_user.id}"
+    )
+    base = str(request.base_url).rstrip("/")
+    return {"url": f"{base}/home-banners/images/{upload.key}", "key": upload.key}
 
+
+@router.get("/images/{file_key:path}")
+async def serve_banner_image(file_key: str, request: Request):
     if not file_key.startswith("banners/"):
         raise HTTPException(status_code=404, detail="Not found")
 
     try:
-        data, content_type = download_file(file_key)
+        cached = await get_cached_file(file_key)
     except Exception:
         raise HTTPException(status_code=404, detail="Not found")
 
-    return Response(
-        content=data,
-        media_type=content_type,
-        headers={"Cache-Control": "public, max-age=86400"},
-    )
+    return cached_file_response(request, cached, "public, max-age=86400")
+
+
+@router.get("/image-cache/stats")
+async def image_cache_stats(
+    _: Employee = Depends(require_role(EmployeeRole.admin)),
+):
+    """Disk cache of avatars and banner images: hits, misses, 304s, bytes not re-downloaded from S3."""
+    return get_file_cache_stats()
@@ -7,6 +7,7 @@ from app.models.home_info_card import HomeInfoCard
 from app.models.employee import Employee, EmployeeRole
 from app.schemas.home_info_card import HomeInfoCardResponse, HomeInfoCardUpdate
 from app.auth.dependencies import get_current_user, require_role
+from app.services.portal_cache import invalidate_portal_content, HOME_INFO
 
 router = APIRouter(prefix="/home-info", tags=["home-info"])
 
@@ -18,6 +19,7 @@ async def _get_or_create(db: AsyncSession) -> HomeInfoCard:
         card = HomeInfoCard()
         db.add(card)
         await db.commit()
+        await invalidate_portal_content(HOME_INFO)
         await db.refresh(card)
     return card
 
@@ -43,5 +45,6 @@ async def update_info_card(
             value = [v.model_dump() if hasattr(v, "model_dump") else v for v in value]
         setattr(card, field, value)
     await db.commit()
+    await invalidate_portal_content(HOME_INFO)
     await db.refresh(card)
     return card
@@ -1,11 +1,12 @@
 from uuid import UUID
+from datetime import date
 
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy import select, func
+from fastapi import APIRouter, Depends, HTTPException, Query, Response, status
+from sqlalchemy import select, func, tuple_
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.database import get_db
-from app.models.lesson import Lesson, LessonAttendance
+from app.models.lesson import Lesson, LessonAttendance, LessonStatus
 from app.models.group import Group
 from app.models.employee import Employee
 from app.models.lead import Lead, LeadStatus, LeadComment
@@ -18,17 +19,38 @@ from app.schemas.lesson import (
     AttendanceCreate, AttendanceUpdate, AttendanceResponse,
 )
 from app.auth.dependencies import get_current_user
+from app.services.performance import invalidate_student_performance, lesson_student_ids
 
 router = APIRouter(prefix="/lessons", tags=["lessons"])
 
 
+def _parse_lesson_cursor(cursor: str) -> tuple[date, UUID]:
+    """Cursor format: "<YYYY-MM-DD>_<lesson uuid>" of the last lesson on the previous page."""
+    try:
+        cursor_date, cursor_id = cursor.split("_", 1)
+        return date.fromisoformat(cursor_date), UUID(cursor_id)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
 @router.get("/", response_model=list[LessonResponse])
 async def list_lessons(
+    response: Response,
     group_id: UUID | None = None,
+    date_from: date | None = Query(None, alias="from"),
+    date_to: date | None = Query(None, alias="to"),
+    lesson_status: LessonStatus | None = Query(None, alias="status"),
+    location_id: UUID | None = Query(None, description="School location of the lesson's group"),
+    cursor: str | None = Query(None, description="Keyset cursor from the X-Next-Cursor header"),
+    limit: int | None = Query(None, ge=1, le=1000, description="Page size; without it all matching lessons are returned"),
     db: AsyncSession = Depends(get_db),
     current_user: Employee = Depends(get_current_user),
 ):
-    query = select(Lesson).order_by(Lesson.date.desc())
+    """
+    Lessons ordered by date (newest first). Paginated with a (date, id) keyset:
+    when more rows exist, the X-Next-Cursor response header holds the cursor for the next page.
+    """
+    query = select(Lesson).order_by(Lesson.date.desc(), Lesson.id.desc())
 
     if group_id:
         # Verify group access for teachers
@@ -40,16 +62,39 @@ async def list_lessons(
             if group.teacher_id != current_user.id:
                 raise HTTPException(status_code=403, detail="Access denied")
         query = query.where(Lesson.group_id == group_id)
-    elif current_user.role == "teacher":
-        # Filter lessons to only show teacher's groups
-        teacher_groups = await db.execute(
-            select(Group.id).where(Group.teacher_id == current_user.id)
-        )
-        group_ids = [row[0] for row in teacher_groups.all()]
-        query = query.where(Lesson.group_id.in_(group_ids))
+
+    # Teacher scope and location filter are resolved through a join on groups
+    teacher_scope = current_user.role == "teacher" and not group_id
+    if teacher_scope or location_id:
+        query = query.join(Group, Group.id == Lesson.group_id)
+        if teacher_scope:
+            query = query.where(Group.teacher_id == current_user.id)
+        if location_id:
+            query = query.where(Group.school_location_id == location_id)
+
+    if date_from:
+        query = query.where(Lesson.date >= date_from)
+    if date_to:
+        query = query.where(Lesson.date <= date_to)
+    if lesson_status:
+        query = query.where(Lesson.status == lesson_status)
+
+    if cursor:
+        cursor_date, cursor_id = _parse_lesson_cursor(cursor)
+        query = query.where(tuple_(Lesson.date, Lesson.id) < tuple_(cursor_date, cursor_id))
+
+    if limit:
+        query = query.limit(limit + 1)
 
     result = await db.execute(query)
-    return result.scalars().all()
+    lessons = result.scalars().all()
+
+    if limit and len(lessons) > limit:
+        lessons = lessons[:limit]
+        last = lessons[-1]
+        response.headers["X-Next-Cursor"] = f"{last.date.isoformat()}_{last.id}"
+
+    return lessons
 
 
 @router.post("/", response_model=LessonResponse, status_code=status.HTTP_201_CREATED)
@@ -276,7 +321,10 @@ async def update_lesson(
             )
             db.add(salary)
 
+    marked = await lesson_student_ids(db, lesson.id) if lesson.status != old_status else []
+
     await db.commit()
+    invalidate_student_performance(*marked)
     await db.refresh(lesson)
     return lesson
 
@@ -299,8 +347,10 @@ async def delete_lesson(
         if group and group.teacher_id != current_user.id:
             raise HTTPException(status_code=403, detail="Access denied")
 
+    marked = await lesson_student_ids(db, lesson.id)
     await db.delete(lesson)
     await db.commit()
+    invalidate_student_performance(*marked)
     return {"detail": "Deleted"}
 
 
@@ -353,6 +403,7 @@ async def create_attendance(
     db.add(att)
     await db.commit()
     await db.refresh(att)
+    invalidate_student_performance(att.student_id)
     return att
 
 
@@ -388,4 +439,5 @@ async def update_attendance(
 
     await db.commit()
     await db.refresh(att)
+    invalidate_student_performance(att.student_id)
     return att
@@ -0,0 +1,20 @@
+import secrets
+
+from fastapi import APIRouter, Header, HTTPException, Response
+
+from app.config import settings
+from app.metrics import render_metrics
+
+router = APIRouter(tags=["metrics"])
+
+
+@router.get("/metrics", include_in_schema=False)
+async def metrics(authorization: str | None = Header(None)):
+    """Prometheus scrape endpoint. Requires `Authorization: Bearer <METRICS_TOKEN>`; disabled while the token is empty."""
+    if not settings.METRICS_TOKEN:
+        raise HTTPException(status_code=404, detail="Not Found")
+    expected = f"Bearer {settings.METRICS_TOKEN}"
+    if not authorization or not secrets.compare_digest(authorization.encode(), expected.encode()):
+        raise HTTPException(status_code=401, detail="Invalid metrics token")
+    body, content_type = render_metrics()
+    return Response(content=body, media_type=content_type)
@@ -1,3 +1,4 @@
+from datetime import datetime, timezone
 from uuid import UUID
 
 from fastapi import APIRouter, Depends, HTTPException, status
@@ -74,6 +75,8 @@ async def create_notification(
     _: Employee = Depends(require_role(EmployeeRole.admin)),
 ):
     n = Notification(**data.model_dump())
+    if n.is_published:
+        n.published_at = datetime.now(timezone.utc)
     db.add(n)
     await db.commit()
     await db.refresh(n)
@@ -107,8 +110,11 @@ async def update_notification(
     if not n:
         raise HTTPException(status_code=404, detail="Уведомление не найдено")
 
+    was_published = n.is_published
     for field, value in data.model_dump(exclude_unset=True).items():
         setattr(n, field, value)
+    if n.is_published and not was_published:
+        n.published_at = datetime.now(timezone.utc)
 
     await db.commit()
     await db.refresh(n)
@@ -1,7 +1,7 @@
 from uuid import UUID
 
 from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy import select
+from sqlalchemy import select, update
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.database import get_db
@@ -14,6 +14,11 @@ from app.auth.dependencies import get_current_user
 router = APIRouter(prefix="/groups/{group_id}/schedules", tags=["schedules"])
 
 
+async def _mark_schedule_changed(db: AsyncSession, group_id: UUID) -> None:
+    """Let the lesson scheduler rebuild this group's future lessons on its next pass."""
+    await db.execute(update(Group).where(Group.id == group_id).values(schedule_changed=True))
+
+
 @router.get("/", response_model=list[ScheduleResponse])
 async def list_schedules(
     group_id: UUID,
@@ -45,6 +50,7 @@ async def create_schedule(
 
     schedule = Schedule(group_id=group_id, **data.model_dump())
     db.add(schedule)
+    await _mark_schedule_changed(db, group_id)
     await db.commit()
     await db.refresh(schedule)
     return schedule
@@ -72,6 +78,7 @@ async def update_schedule(
     for field, value in data.model_dump(exclude_unset=True).items():
         setattr(schedule, field, value)
 
+    await _mark_schedule_changed(db, group_id)
     await db.commit()
     await db.refresh(schedule)
     return schedule
@@ -96,5 +103,6 @@ async def delete_schedule(
         raise HTTPException(status_code=404, detail="Schedule not found")
 
     await db.delete(schedule)
+    await _mark_schedule_changed(db, group_id)
     await db.commit()
     return None
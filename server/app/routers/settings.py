@@ -40,13 +40,18 @@ async def update_settings(
     result = await db.execute(select(Settings))
     settings = result.scalar_one_or_none()
 
+    update_data = data.model_dump(exclude_unset=True)
+    if update_data.get("holidays") is not None:
+        # Stored as JSONB — keep sorted unique ISO strings
+        update_data["holidays"] = sorted({d.isoformat() for d in update_data["holidays"]})
+
     if not settings:
         # Create if doesn't exist
-        settings = Settings(**data.model_dump(exclude_unset=True))
+        settings = Settings(**update_data)
         db.add(settings)
     else:
         # Update existing
-        for field, value in data.model_dump(exclude_unset=True).items():
+        for field, value in update_data.items():
             setattr(settings, field, value)
 
     await db.commit()
@@ -10,24 +10,29 @@ POST /student-portal/exam-sessions/{slot_id}/register   — запись на с
 DELETE /student-portal/registrations/{reg_id}    — отмена записи
 GET  /student-portal/my-registrations            — мои записи
 GET  /student-portal/results                     — результаты экзаменов
+GET  /student-portal/progress                    — динамика по пробным экзаменам
+GET  /student-portal/home                        — всё для главного экрана одним запросом
 """
+import hashlib
+import json
 import uuid
 from datetime import date, datetime, timezone
+from typing import Any
 
-from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Request
-from fastapi.responses import StreamingResponse
+from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Request, Query
+from fastapi.encoders import jsonable_encoder
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from pydantic import BaseModel
-from sqlalchemy import select
+from sqlalchemy import select, update, func, exists, delete as sa_delete
+from sqlalchemy.dialects.postgresql import insert as pg_insert
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import selectinload
-from io import BytesIO
 
 from app.database import get_db
 from app.models.exam import Exam, ExamResult
-from app.models.exam_portal import ExamPortalSession, ExamTimeSlot, ExamRegistration
+from app.models.exam_portal import ExamPortalSession, ExamTimeSlot, ExamRegistration, RegistrationStatus
 from app.models.group import Group, GroupStudent
-from app.models.lesson import Lesson, LessonAttendance
+from app.models.lesson import Lesson
 from app.models.schedule import Schedule
 from app.models.student import Student
 from app.models.subject import Subject
@@ -39,6 +44,17 @@ from app.models.lead import Lead, LeadStatus
 from app.auth.security import decode_token, verify_password
 from app.models.app_user import AppUser
 from app.routers.student_auth import get_current_student_dep, get_portal_identity_dep, PortalIdentity
+from app.schemas.exam import StudentProgressResponse
+from app.schemas.upload import PresignUploadRequest, PresignedUploadResponse, FinalizeUploadRequest
+from app.services.exam_registration import reserve_seat, release_registration
+from app.services.file_cache import get_cached_file, cached_file_response
+from app.services.performance import get_student_performance
+from app.services.student_progress import get_student_progress
+from app.services.uploads import presign_upload, finalize_upload
+from app.services.file_store import store_upload
+from app.services.portal_cache import (
+    BANNERS, HOME_INFO, SUBSCRIPTION_PLANS, SUBJECTS, get_portal_content, portal_content_response,
+)
 
 _bearer = HTTPBearer()
 
@@ -99,6 +115,8 @@ class TimeSlotResponse(BaseModel):
     total_seats: int
     available_seats: int
     is_registered: bool
+    waitlist_enabled: bool = False
+    is_waitlisted: bool = False
 
 
 class ExamSessionResponse(BaseModel):
@@ -128,6 +146,7 @@ class MyRegistrationResponse(BaseModel):
     start_time: str
     registered_at: str
     days_until: int
+    status: str = "registered"
 
 
 class SubjectResponse(BaseModel):
@@ -316,55 +335,7 @@ async def get_performance(
     student: Student = Depends(get_current_student_dep),
     db: AsyncSession = Depends(get_db),
 ):
-    # Attendance
-    att_result = await db.execute(
-        select(LessonAttendance)
-        .options(selectinload(LessonAttendance.lesson))
-        .where(LessonAttendance.student_id == student.id)
-    )
-    attendances = att_result.scalars().all()
-    conducted = [a for a in attendances if a.lesson and a.lesson.status == "conducted"]
-    present = [a for a in conducted if a.attendance in ("present", "late")]
-    attendance_pct = round(len(present) / len(conducted) * 100) if conducted else 0
-
-    # Homework done (lessons where homework_grade is set)
-    hw_done = sum(1 for a in conducted if a.homework_grade and str(a.homework_grade).strip() not in ("", "0"))
-
-    # Subjects
-    gs_result = await db.execute(
-        select(GroupStudent)
-        .options(selectinload(GroupStudent.group).selectinload(Group.subject))
-        .where(
-            GroupStudent.student_id == student.id,
-            GroupStudent.is_archived == False,
-            GroupStudent.is_trial == False,
-        )
-    )
-    memberships = gs_result.scalars().all()
-    subject_ids = set()
-    subject_names = {}
-    for gs in memberships:
-        if gs.group.subject_id:
-            subject_ids.add(gs.group.subject_id)
-            subject_names[gs.group.subject_id] = gs.group.subject.name if gs.group.subject else "Предмет"
-
-    # Per-subject attendance %
-    subject_progress = []
-    for gs in memberships:
-        if not gs.group.subject_id:
-            continue
-        group_att = [a for a in conducted if a.lesson and a.lesson.group_id == gs.group_id]
-        group_present = [a for a in group_att if a.attendance in ("present", "late")]
-        pct = round(len(group_present) / len(group_att) * 100) if group_att else 0
-        name = gs.group.subject.name if gs.group.subject else gs.group.name
-        subject_progress.append({"name": name, "percent": pct})
-
-    return PerformanceResponse(
-        attendance_percent=attendance_pct,
-        homework_done=hw_done,
-        subjects_count=len(subject_ids),
-        subject_progress=subject_progress,
-    )
+    return PerformanceResponse(**await get_student_performance(db, student.id))
 
 
 @router.get("/exam-sessions", response_model=list[ExamSessionResponse])
@@ -377,7 +348,8 @@ async def list_exam_sessions(
         .options(
             selectinload(ExamPortalSession.exam).selectinload(Exam.subject_rel),
             selectinload(ExamPortalSession.school_location),
-            selectinload(ExamPortalSession.time_slots).selectinload(ExamTimeSlot.registrations),
+            # Seat counts are stored on the slot — registrations aren't loaded
+            selectinload(ExamPortalSession.time_slots),
         )
         .join(ExamPortalSession.exam)
         .where(Exam.is_registration_open == True)
@@ -387,9 +359,14 @@ async def list_exam_sessions(
 
     # Get student's existing registrations
     reg_result = await db.execute(
-        select(ExamRegistration).where(ExamRegistration.student_id == student.id)
+        select(ExamRegistration.time_slot_id, ExamRegistration.status)
+        .where(ExamRegistration.student_id == student.id)
     )
-    registered_slot_ids = {str(r.time_slot_id) for r in reg_result.scalars().all()}
+    my_regs = reg_result.all()
+    registered_slot_ids = {str(r.time_slot_id) for r in my_regs}
+    waitlisted_slot_ids = {
+        str(r.time_slot_id) for r in my_regs if r.status == RegistrationStatus.waitlisted.value
+    }
 
     return [
         ExamSessionResponse(
@@ -411,6 +388,8 @@ async def list_exam_sessions(
                     total_seats=slot.total_seats,
                     available_seats=slot.available_seats,
                     is_registered=str(slot.id) in registered_slot_ids,
+                    waitlist_enabled=slot.waitlist_enabled,
+                    is_waitlisted=str(slot.id) in waitlisted_slot_ids,
                 )
                 for slot in s.time_slots
             ],
@@ -419,11 +398,7 @@ async def list_exam_sessions(
     ]
 
 
-@router.get("/subjects", response_model=list[SubjectResponse])
-async def list_subjects(
-    student: Student = Depends(get_current_student_dep),
-    db: AsyncSession = Depends(get_db),
-):
+async def _load_subjects(db: AsyncSession) -> list[SubjectResponse]:
     result = await db.execute(
         select(Subject).where(Subject.is_active == True).order_by(Subject.name)
     )
@@ -431,6 +406,16 @@ async def list_subjects(
     return [SubjectResponse(id=str(s.id), name=s.name, exam_type=s.exam_type) for s in subjects]
 
 
+@router.get("/subjects", response_model=list[SubjectResponse])
+async def list_subjects(
+    request: Request,
+    student: Student = Depends(get_current_student_dep),
+    db: AsyncSession = Depends(get_db),
+):
+    content = await get_portal_content(SUBJECTS, lambda: _load_subjects(db))
+    return portal_content_response(request, content)
+
+
 @router.post("/exam-sessions/{slot_id}/register")
 async def register_for_exam(
     slot_id: uuid.UUID,
@@ -438,38 +423,11 @@ async def register_for_exam(
     student: Student = Depends(get_current_student_dep),
     db: AsyncSession = Depends(get_db),
 ):
-    # Load slot with registrations
-    result = await db.execute(
-        select(ExamTimeSlot)
-        .options(
-            selectinload(ExamTimeSlot.registrations),
-            selectinload(ExamTimeSlot.session).selectinload(ExamPortalSession.exam),
-        )
-        .where(ExamTimeSlot.id == slot_id)
-    )
-    slot = result.scalar_one_or_none()
-    if not slot:
-        raise HTTPException(status_code=404, detail="Слот не найден")
-    if not slot.session.exam.is_registration_open:
-        raise HTTPException(status_code=400, detail="Запись на этот экзамен закрыта")
-    if slot.available_seats <= 0:
-        raise HTTPException(status_code=400, detail="Нет свободных мест")
-
-    # Check not already registered for this slot
-    existing = await db.execute(
-        select(ExamRegistration).where(
-            ExamRegistration.student_id == student.id,
-            ExamRegistration.time_slot_id == slot_id,
-        )
-    )
-    if existing.scalar_one_or_none():
-        raise HTTPException(status_code=400, detail="Вы уже записаны на этот слот")
-
+    # Seat is taken atomically in the DB — safe under a registration rush
     subject_uuid = uuid.UUID(body.subject_id) if body.subject_id else None
-    reg = ExamRegistration(student_id=student.id, time_slot_id=slot_id, subject_id=subject_uuid)
-    db.add(reg)
-    await db.commit()
-    return {"message": "Запись успешна", "registration_id": str(reg.id)}
+    reg_id, status = await reserve_seat(db, slot_id, student.id, subject_uuid)
+    message = "Запись успешна" if status == RegistrationStatus.registered else "Вы в листе ожидания"
+    return {"message": message, "registration_id": str(reg_id), "status": status.value}
 
 
 @router.delete("/registrations/{reg_id}", status_code=204)
@@ -478,17 +436,8 @@ async def cancel_registration(
     student: Student = Depends(get_current_student_dep),
     db: AsyncSession = Depends(get_db),
 ):
-    result = await db.execute(
-        select(ExamRegistration).where(
-            ExamRegistration.id == reg_id,
-            ExamRegistration.student_id == student.id,
-        )
-    )
-    reg = result.scalar_one_or_none()
-    if not reg:
-        raise HTTPException(status_code=404, detail="Запись не найдена")
-    await db.delete(reg)
-    await db.commit()
+    # Frees the seat or hands it to the first student on the waitlist
+    await release_registration(db, reg_id, student_id=student.id)
 
 
 @router.get("/my-registrations", response_model=list[MyRegistrationResponse])
@@ -536,6 +485,7 @@ async def my_registrations(
             ),
             registered_at=r.registered_at.isoformat(),
             days_until=max(0, (r.time_slot.date - today).days),
+            status=r.status,
         )
         for r in registrations
     ]
@@ -640,47 +590,71 @@ async def upload_avatar(
     student: Student = Depends(get_current_student_dep),
     db: AsyncSession = Depends(get_db),
 ):
-    from app.s3 import ALLOWED_IMAGE_TYPES, MAX_FILE_SIZE, _get_s3_client
-    from app.config import settings as app_settings
+    from app.s3 import ALLOWED_IMAGE_TYPES
 
     content_type = file.content_type or "application/octet-stream"
     if content_type not in ALLOWED_IMAGE_TYPES:
         raise HTTPException(status_code=400, detail="Только изображения (jpeg/png/webp)")
 
-    data = await file.read()
-    if len(data) > MAX_FILE_SIZE:
-        raise HTTPException(status_code=400, detail="Файл слишком большой (макс. 10 МБ)")
-
-    original_name = file.filename or "avatar"
-    ext = original_name.rsplit(".", 1)[-1] if "." in original_name else "jpg"
-    key = f"avatars/{uuid.uuid4().hex}.{ext}"
-
-    s3 = _get_s3_client()
-    s3.upload_fileobj(
-        BytesIO(data),
-        app_settings.S3_BUCKET_NAME,
-        key,
-        ExtraArgs={"ContentType": content_type},
-    )
+    stored = await store_upload(db, file, prefix="avatars", content_type=content_type)
 
     # Save key to student record
     s_result = await db.execute(select(Student).where(Student.id == student.id))
     s = s_result.scalar_one()
-    s.avatar_key = key
+    s.avatar_key = stored.key
     await db.commit()
 
-    return {"avatar_url": _build_avatar_url(request, key)}
+    return {"avatar_url": _build_avatar_url(request, stored.key)}
+
+
+@router.post("/avatar/presign", response_model=PresignedUploadResponse)
+async def presign_avatar_upload(
+    body: PresignUploadRequest,
+    student: Student = Depends(get_current_student_dep),
+):
+    """Direct upload, step 1: presigned POST to S3. POST /upload-avatar remains as a fallback."""
+    from app.s3 import ALLOWED_IMAGE_TYPES
+
+    return presign_upload(
+        body,
+        purpose="avatar",
+        owner=f"student:{student.id}",
+        prefix="avatars",
+        allowed_types=ALLOWED_IMAGE_TYPES,
+        default_ext="jpg",
+    )
+
+
+@router.post("/avatar/finalize")
+async def finalize_avatar_upload(
+    request: Request,
+    body: FinalizeUploadRequest,
+    student: Student = Depends(get_current_student_dep),
+    db: AsyncSession = Depends(get_db),
+):
+    """Direct upload, step 2: verify the object and make it the student's avatar."""
+    upload = await finalize_upload(body.upload_token, purpose="avatar", owner=f"student:{student.id}")
+
+    await db.execute(update(Student).where(Student.id == student.id).values(avatar_key=upload.key))
+    await db.commit()
+
+    return {"avatar_url": _build_avatar_url(request, upload.key)}
 
 
 @router.get("/avatars/{key:path}")
-async def serve_avatar(key: str):
-    """Serve avatar image from S3 (no auth — avatar keys are non-guessable UUIDs)."""
-    from app.s3 import download_file
+async def serve_avatar(key: str, request: Request):
+    """
+    Serve an avatar image from S3 without auth. Keys are content hashes (older ones UUIDs),
+    so only keys under avatars/ are served — chat files must not be reachable through here.
+    """
+    if not key.startswith("avatars/"):
+        raise HTTPException(status_code=404, detail="Аватар не найден")
     try:
-        data, content_type = download_file(key)
+        cached = await get_cached_file(key)
     except Exception:
         raise HTTPException(status_code=404, detail="Аватар не найден")
-    return StreamingResponse(BytesIO(data), media_type=content_type)
+    # Every upload gets a new key, so the content behind a key never changes
+    return cached_file_response(request, cached, "public, max-age=86400, immutable")
 
 
 @router.get("/results", response_model=list[ExamResultResponse])
@@ -717,6 +691,15 @@ async def get_exam_results(
     ]
 
 
+@router.get("/progress", response_model=StudentProgressResponse)
+async def get_my_progress(
+    student: Student = Depends(get_current_student_dep),
+    db: AsyncSession = Depends(get_db),
+):
+    """Final score series per subject with cohort rank/percentile and topic mastery trends."""
+    return await get_student_progress(db, student.id)
+
+
 class HomeBannerFormFieldPublic(BaseModel):
     id: str
     field_type: str
@@ -750,11 +733,7 @@ class BannerSignupRequest(BaseModel):
     form_data: dict
 
 
-@router.get("/banners", response_model=list[HomeBannerPublicResponse])
-async def list_home_banners(
-    _: PortalIdentity = Depends(get_portal_identity_dep),
-    db: AsyncSession = Depends(get_db),
-):
+async def _load_home_banners(db: AsyncSession) -> list[HomeBannerPublicResponse]:
     result = await db.execute(
         select(HomeBanner)
         .options(selectinload(HomeBanner.form_fields))
@@ -796,6 +775,16 @@ async def list_home_banners(
     ]
 
 
+@router.get("/banners", response_model=list[HomeBannerPublicResponse])
+async def list_home_banners(
+    request: Request,
+    _: PortalIdentity = Depends(get_portal_identity_dep),
+    db: AsyncSession = Depends(get_db),
+):
+    content = await get_portal_content(BANNERS, lambda: _load_home_banners(db))
+    return portal_content_response(request, content)
+
+
 @router.post("/banners/{banner_id}/signup", status_code=201)
 async def submit_banner_signup(
     banner_id: uuid.UUID,
@@ -839,6 +828,11 @@ class NotificationItem(BaseModel):
     is_read: bool
 
 
+def _is_read_by_watermark(student: Student | None, published_at: datetime | None) -> bool:
+    wm = student.notifications_read_up_to if student is not None else None
+    return wm is not None and published_at is not None and published_at <= wm
+
+
 @router.get("/notifications", response_model=list[NotificationItem])
 async def list_student_notifications(
     identity: PortalIdentity = Depends(get_portal_identity_dep),
@@ -851,6 +845,7 @@ async def list_student_notifications(
     )
     notifs = result.scalars().all()
 
+    # Only reads newer than the watermark are stored explicitly
     read_ids: set = set()
     if identity.student is not None:
         reads_result = await db.execute(
@@ -869,7 +864,7 @@ async def list_student_notifications(
             color=n.color,
             action_url=n.action_url,
             created_at=n.created_at.isoformat(),
-            is_read=n.id in read_ids,
+            is_read=n.id in read_ids or _is_read_by_watermark(identity.student, n.published_at),
         )
         for n in notifs
     ]
@@ -883,20 +878,19 @@ async def student_unread_count(
     if identity.student is None:
         return {"count": 0}
 
-    pub_result = await db.execute(
-        select(Notification.id).where(Notification.is_published.is_(True))
+    query = select(func.count(Notification.id)).where(
+        Notification.is_published.is_(True),
+        ~exists().where(
+            NotificationRead.notification_id == Notification.id,
+            NotificationRead.student_id == identity.student.id,
+        ),
     )
-    published_ids = {nid for nid in pub_result.scalars().all()}
-    if not published_ids:
-        return {"count": 0}
+    watermark = identity.student.notifications_read_up_to
+    if watermark is not None:
+        query = query.where(Notification.published_at > watermark)
 
-    reads_result = await db.execute(
-        select(NotificationRead.notification_id).where(
-            NotificationRead.student_id == identity.student.id
-        )
-    )
-    read_ids = {nid for nid in reads_result.scalars().all()}
-    return {"count": len(published_ids - read_ids)}
+    count = (await db.execute(query)).scalar() or 0
+    return {"count": count}
 
 
 @router.post("/notifications/{notification_id}/read", status_code=204)
@@ -910,19 +904,18 @@ async def mark_notification_read(
             Notification.id == notification_id, Notification.is_published.is_(True)
         )
     )
-    if not n_result.scalar_one_or_none():
+    n = n_result.scalar_one_or_none()
+    if not n:
         raise HTTPException(status_code=404, detail="Уведомление не найдено")
 
-    existing = await db.execute(
-        select(NotificationRead).where(
-            NotificationRead.notification_id == notification_id,
-            NotificationRead.student_id == student.id,
-        )
-    )
-    if existing.scalar_one_or_none():
+    if _is_read_by_watermark(student, n.published_at):
         return
 
-    db.add(NotificationRead(notification_id=notification_id, student_id=student.id))
+    await db.execute(
+        pg_insert(NotificationRead)
+        .values(id=uuid.uuid4(), notification_id=notification_id, student_id=student.id)
+        .on_conflict_do_nothing(constraint="uq_notification_reads_notif_student")
+    )
     await db.commit()
 
 
@@ -931,19 +924,14 @@ async def mark_all_notifications_read(
     student: Student = Depends(get_current_student_dep),
     db: AsyncSession = Depends(get_db),
 ):
-    pub_result = await db.execute(
-        select(Notification.id).where(Notification.is_published.is_(True))
+    # Move the watermark; explicit reads below it become redundant
+    now = datetime.now(timezone.utc)
+    await db.execute(
+        update(Student).where(Student.id == student.id).values(notifications_read_up_to=now)
     )
-    published_ids = set(pub_result.scalars().all())
-
-    reads_result = await db.execute(
-        select(NotificationRead.notification_id).where(NotificationRead.student_id == student.id)
+    await db.execute(
+        sa_delete(NotificationRead).where(NotificationRead.student_id == student.id)
     )
-    already_read = set(reads_result.scalars().all())
-
-    for nid in published_ids - already_read:
-        db.add(NotificationRead(notification_id=nid, student_id=student.id))
-
     await db.commit()
 
 
@@ -987,11 +975,7 @@ class HomeInfoCardPublic(BaseModel):
     is_visible: bool
 
 
-@router.get("/home-info", response_model=HomeInfoCardPublic | None)
-async def get_home_info_card(
-    _: PortalIdentity = Depends(get_portal_identity_dep),
-    db: AsyncSession = Depends(get_db),
-):
+async def _load_home_info_card(db: AsyncSession) -> HomeInfoCardPublic | None:
     result = await db.execute(select(HomeInfoCard).limit(1))
     card = result.scalar_one_or_none()
     if not card or not card.is_visible:
@@ -1018,6 +1002,16 @@ async def get_home_info_card(
     )
 
 
+@router.get("/home-info", response_model=HomeInfoCardPublic | None)
+async def get_home_info_card(
+    request: Request,
+    _: PortalIdentity = Depends(get_portal_identity_dep),
+    db: AsyncSession = Depends(get_db),
+):
+    content = await get_portal_content(HOME_INFO, lambda: _load_home_info_card(db))
+    return portal_content_response(request, content)
+
+
 class SubscriptionPlanPublic(BaseModel):
     id: str
     name: str
@@ -1025,11 +1019,7 @@ class SubscriptionPlanPublic(BaseModel):
     price: float
 
 
-@router.get("/subscription-plans", response_model=list[SubscriptionPlanPublic])
-async def list_subscription_plans(
-    _: PortalIdentity = Depends(get_portal_identity_dep),
-    db: AsyncSession = Depends(get_db),
-):
+async def _load_subscription_plans(db: AsyncSession) -> list[SubscriptionPlanPublic]:
     result = await db.execute(
         select(SubscriptionPlan)
         .where(SubscriptionPlan.is_active.is_(True))
@@ -1047,6 +1037,16 @@ async def list_subscription_plans(
     ]
 
 
+@router.get("/subscription-plans", response_model=list[SubscriptionPlanPublic])
+async def list_subscription_plans(
+    request: Request,
+    _: PortalIdentity = Depends(get_portal_identity_dep),
+    db: AsyncSession = Depends(get_db),
+):
+    content = await get_portal_content(SUBSCRIPTION_PLANS, lambda: _load_subscription_plans(db))
+    return portal_content_response(request, content)
+
+
 class TrialSignupRequest(BaseModel):
     student_name: str
     phone: str
@@ -1197,3 +1197,71 @@ async def unregister_push_token(
 
     await db.execute(sa_delete(PushToken).where(PushToken.token == body.token))
     await db.commit()
+
+
+# ── Home bootstrap ────────────────────────────────────────────────────────────
+
+class HomeSection(BaseModel):
+    etag: str
+    not_modified: bool = False
+    data: Any = None
+
+
+class HomeResponse(BaseModel):
+    sections: dict[str, HomeSection]
+
+
+def _section_etag(data: Any) -> str:
+    raw = json.dumps(jsonable_encoder(data), sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha1(raw.encode()).hexdigest()[:16]
+
+
+def _parse_known_etags(raw: str | None) -> dict[str, str]:
+    """"me:ab12,banners:cd34" → {"me": "ab12", "banners": "cd34"}"""
+    known: dict[str, str] = {}
+    for part in (raw or "").split(","):
+        name, sep, etag = part.strip().partition(":")
+        if sep and name and etag:
+            known[name] = etag
+    return known
+
+
+@router.get("/home", response_model=HomeResponse)
+async def get_home(
+    request: Request,
+    etags: str | None = Query(None, description="Known section ETags: 'me:<etag>,banners:<etag>'"),
+    identity: PortalIdentity = Depends(get_portal_identity_dep),
+    db: AsyncSession = Depends(get_db),
+):
+    """
+    Everything the app's home screen needs in one round trip. Identity is resolved once and
+    sections are read one after another on the request's own session, so a launch holds a
+    single pooled connection. Sections whose ETag matches the one sent by the client come
+    back with not_modified=true and no data.
+    """
+    student = identity.student
+
+    async def cached(kind, loader):
+        # Shared portal content: served from the cache, the DB is read only on a miss
+        content = await get_portal_content(kind, lambda: loader(db))
+        return content.data
+
+    sections = {
+        "me": await get_my_profile(request=request, identity=identity, db=db),
+        "schedule_today": await get_today_schedule(student=student, db=db) if student else [],
+        "performance": await get_performance(student=student, db=db) if student else None,
+        "unread_count": await student_unread_count(identity=identity, db=db),
+        "banners": await cached(BANNERS, _load_home_banners),
+        "home_info": await cached(HOME_INFO, _load_home_info_card),
+        "subscription_plans": await cached(SUBSCRIPTION_PLANS, _load_subscription_plans),
+    }
+
+    known = _parse_known_etags(etags)
+    out: dict[str, HomeSection] = {}
+    for name, data in sections.items():
+        etag = _section_etag(data)
+        if known.get(name) == etag:
+            out[name] = HomeSection(etag=etag, not_modified=True)
+        else:
+            out[name] = HomeSection(etag=etag, data=jsonable_encoder(data))
+    return HomeResponse(sections=out)
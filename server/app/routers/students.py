@@ -1,14 +1,16 @@
+import json
+import time
 from uuid import UUID
 from datetime import date, datetime, timedelta
 from typing import Optional
 
-from fastapi import APIRouter, Depends, HTTPException, status, Query, Body
+from fastapi import APIRouter, Depends, HTTPException, status, Query, Body, Response
+from fastapi.responses import StreamingResponse
 from sqlalchemy import select, or_, exists
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import selectinload
-import httpx
 
-from app.database import get_db
+from app.database import get_db, async_session
 from app.models.student import Student, ParentContact, StudentHistory, HistoryEventType, ParentFeedback, StudentComment, StudentSource, EducationType
 from app.models.finance import SubscriptionPlan, Payment, PaymentStatus
 from app.models.group import GroupStudent, Group
@@ -25,10 +27,16 @@ from app.schemas.student import (
     StudentCommentCreate, StudentCommentResponse,
     StudentPaymentCreate, StudentSubscriptionAssign,
 )
+from app.schemas.exam import StudentProgressResponse
 from app.schemas.report import WeeklyReportResponse, WeeklyReportUpdate, WeeklyReportParentCommentUpdate
 from app.auth.dependencies import get_current_user, get_manager_location_id
-from app.config import settings
 from app.models.lead import Lead, LeadStatus
+from app.services.ai import complete, stream_completion
+from app.services.student_progress import get_student_progress
+from app.services.weekly_reports import (
+    WeeklyStats, collect_weekly_stats, build_weekly_prompt, start_weekly_reports_batch, batch_state,
+    latest_report_period,
+)
 
 router = APIRouter(prefix="/students", tags=["students"])
 
@@ -508,6 +516,21 @@ async def get_student_history(
     return result.scalars().all()
 
 
+# --- Exam progress ---
+
+@router.get("/{student_id}/exam-progress", response_model=StudentProgressResponse)
+async def get_student_exam_progress(
+    student_id: UUID,
+    db: AsyncSession = Depends(get_db),
+    _: Employee = Depends(get_current_user),
+):
+    """Mock exam trend: final scores per subject, cohort rank/percentile, topic mastery."""
+    exists_result = await db.execute(select(Student.id).where(Student.id == student_id))
+    if exists_result.scalar_one_or_none() is None:
+        raise HTTPException(status_code=404, detail="Student not found")
+    return await get_student_progress(db, student_id)
+
+
 # --- Performance ---
 
 @router.get("/{student_id}/performance", response_model=StudentPerformanceResponse)
@@ -600,320 +623,222 @@ async def get_student_performance(
 
 # --- AI Performance Report ---
 
-@router.post("/{student_id}/generate-weekly-report")
-async def generate_weekly_report(
-    student_id: UUID,
-    days: int = Body(7, embed=True),
-    db: AsyncSession = Depends(get_db),
-    current_user: Employee = Depends(get_current_user),
-):
-    """Generate AI-powered weekly performance report for a student."""
+async def _weekly_report_stats(db: AsyncSession, student_id: UUID, days: int) -> tuple[WeeklyStats, date, date]:
     # Verify student exists
     student_result = await db.execute(
-        select(Student).where(Student.id == student_id)
+        select(Student.id).where(Student.id == student_id)
     )
-    student = student_result.scalar_one_or_none()
-    if not student:
+    if student_result.scalar_one_or_none() is None:
         raise HTTPException(status_code=404, detail="Student not found")
 
     # Calculate date range
     end_date = datetime.now().date()
     start_date = end_date - timedelta(days=days)
 
-    # Build query with joins
-    query = (
-        select(
-            LessonAttendance,
-            Lesson,
-            Group,
-            Subject
-        )
-        .join(Lesson, LessonAttendance.lesson_id == Lesson.id)
-        .join(Group, Lesson.group_id == Group.id)
-        .join(Subject, Group.subject_id == Subject.id)
-        .where(
-            LessonAttendance.student_id == student_id,
-            Lesson.status == "conducted",
-            Lesson.is_cancelled == False,
-            Lesson.date >= start_date,
-            Lesson.date <= end_date
-        )
-        .order_by(Lesson.date.desc(), Lesson.time.desc())
-    )
-
-    # Execute query
-    result = await db.execute(query)
-    rows = result.all()
-
-    if not rows:
+    found = await collect_weekly_stats(db, start_date, end_date, student_ids=[student_id])
+    if not found:
         raise HTTPException(
             status_code=404,
             detail=f"No performance data found for the last {days} days"
         )
+    return found[0], start_date, end_date
+
+
+def _weekly_report_result(report: WeeklyReport, stats: WeeklyStats) -> dict:
+    return {
+        "report_id": str(report.id),
+        "report": report.ai_report,
+        "period": {
+            "start": report.period_start.isoformat(),
+            "end": report.period_end.isoformat()
+        },
+        "stats": stats.counters(),
+    }
 
-    # Prepare data for AI
-    attendance_count = 0
-    absent_count = 0
-    late_count = 0
-    homework_completed = 0
-    homework_total = 0
-    comments = []
-    subjects_data = {}
-
-    for attendance, lesson, group, subject in rows:
-        # Count attendance
-        if attendance.attendance == "present":
-            attendance_count += 1
-        elif attendance.attendance == "absent":
-            absent_count += 1
-        elif attendance.attendance == "late":
-            late_count += 1
-            attendance_count += 1
-
-        # Count homework
-        if lesson.had_previous_homework:
-            homework_total += 1
-            if attendance.homework_grade and attendance.homework_grade != "0":
-                homework_completed += 1
-
-        # Collect comments
-        if attendance.comment:
-            comments.append({
-                "date": lesson.date.strftime("%d.%m.%Y"),
-                "subject": subject.name,
-                "comment": attendance.comment
-            })
-
-        # Collect subject data
-        subject_name = subject.name
-        if subject_name not in subjects_data:
-            subjects_data[subject_name] = {
-                "lessons": 0,
-                "lesson_grades": [],
-                "homework_grades": []
-            }
-
-        subjects_data[subject_name]["lessons"] += 1
-        if attendance.lesson_grade:
-            subjects_data[subject_name]["lesson_grades"].append(attendance.lesson_grade)
-        if attendance.homework_grade and attendance.homework_grade != "0":
-            subjects_data[subject_name]["homework_grades"].append(attendance.homework_grade)
-
-    # Construct prompt for AI
-    # ===========================================
-    # НАСТРОЙКА ПРОМПТА - РЕДАКТИРУЙТЕ ЗДЕСЬ
-    # ===========================================
-
-    # Формируем данные по предметам
-    subjects_summary = ""
-    for subject_name, data in subjects_data.items():
-        subjects_summary += f"\n{subject_name}: {data['lessons']} урок(ов)"
-        if data["lesson_grades"]:
-            subjects_summary += f", оценки за уроки: {', '.join(data['lesson_grades'])}"
-        if data["homework_grades"]:
-            subjects_summary += f", оценки за ДЗ: {', '.join(data['homework_grades'])}"
-
-    # Формируем комментарии
-    comments_summary = ""
-    if comments:
-        comments_summary = "\n\nКомментарии преподавателей:\n"
-        for c in comments[:3]:  # Берем только первые 3 комментария для краткости
-            comments_summary += f"- {c['date']} ({c['subject']}): {c['comment']}\n"
-
-    # Основной промпт - шаблон для мессенджера
-    prompt = f"""Составь еженедельный отчет для родителей в формате сообщения для мессенджера.
-
-ДАННЫЕ:
-Студент: {student.first_name} {student.last_name}
-Период: {start_date.strftime('%d.%m.%Y')} - {end_date.strftime('%d.%m.%Y')}
-Посещаемость: {attendance_count}/{attendance_count + absent_count}, Пропусков: {absent_count}, Опозданий: {late_count}
-ДЗ: {homework_completed}/{homework_total}
-{subjects_summary}{comments_summary}
-
-СТРОГИЙ ФОРМАТ ОТЧЕТА (используй ТОЧНО такую структуру):
-
-Здравствуйте! Отчет об успеваемости {student.first_name} за {start_date.strftime('%d.%m')} — {end_date.strftime('%d.%m.%Y')}
-
-📊 Посещаемость
-✅ Присутствовал — {attendance_count} урок(ов)
-[ЕСЛИ БЫЛИ ОПОЗДАНИЯ: ⏰ Опоздание — {late_count} (указать предмет и дату, если известно)]
-[ЕСЛИ БЫЛИ ПРОПУСКИ: ❌ Отсутствовал — {absent_count} (указать предмет и дату, если известно)]
-
-📝 Домашние задания
-Выполнено: {homework_completed} из {homework_total} ({int(homework_completed/homework_total*100) if homework_total > 0 else 0}%)
-[ЕСЛИ ЕСТЬ ОЦЕНКИ: Оценки: [список оценок] → средняя [среднее]]
-
-💬 Обратная связь от преподавателей
-[ДЛЯ КАЖДОГО КОММЕНТАРИЯ: Предмет (дата) — Текст комментария]
-[ЕСЛИ НЕТ КОММЕНТАРИЕВ: Нет комментариев от преподавателей за этот период.]
-
-💡 Рекомендации
-• [Конкретная рекомендация на основе данных]
-• [Еще одна рекомендация]
-[ЕСЛИ ВСЕ ХОРОШО: • Продолжать в том же духе!]
-
-С уважением, администрация школы
-По всем вопросам: +7 (999) 123-45-67
-
-КРИТИЧЕСКИ ВАЖНО - ОБРАБОТКА КОММЕНТАРИЕВ ПРЕПОДАВАТЕЛЕЙ:
-1. ФИЛЬТРАЦИЯ И СМЯГЧЕНИЕ:
-   - Убери любую грубость, сарказм или неуместные выражения
-   - Перефрази негативные комментарии в конструктивный формат
-   - Замени эмоциональные фразы на профессиональные
-   - Пример: "Ученик постоянно отвлекается и мешает другим" → "Рекомендуется больше концентрироваться на уроке"
-
-2. СОКРАЩЕНИЕ ДЛИННЫХ КОММЕНТАРИЕВ:
-   - Если комментарий длиннее 100 символов - сократи до сути (50-80 символов)
-   - Оставь только главную информацию: факты и рекомендации
-   - Убери лишние детали и повторы
-   - Пример: "Сегодня на уроке ученик пришел неподготовленным, не сделал домашнее задание, которое я задавала на прошлом уроке, также забыл тетрадь и учебник" → "Пришел неподготовленным, не выполнил ДЗ, забыл материалы"
-
-3. ПРОФЕССИОНАЛЬНЫЙ ТОН:
-   - Используй нейтральный, уважительный язык
-   - Фокус на фактах, а не на эмоциях
-   - Конструктивные замечания вместо критики
-   - Положительные моменты выделяй, негативные - смягчай
-
-4. ФОРМАТ:
-   - Максимум 2-3 самых важных комментария
-   - Каждый комментарий - не более 80 символов
-   - Если комментариев много - выбери наиболее значимые
-
-ВАЖНО:
-- Используй ТОЧНО такой формат с эмодзи и секциями
-- НЕ добавляй лишний текст или объяснения
-- ОБЯЗАТЕЛЬНО обработай все комментарии преподавателей (смягчи негатив, сократи длинные)
-- Рекомендации должны быть конкретными и основаны на данных
-- Формат: короткие строки, как в мессенджере
-"""
-
-    # Call OpenRouter API
-    if not settings.OPENROUTER_API_KEY:
-        raise HTTPException(
-            status_code=500,
-            detail="OpenRouter API key not configured. Please set OPENROUTER_API_KEY in .env file"
-        )
 
-    try:
-        async with httpx.AsyncClient() as client:
-            response = await client.post(
-                "https://openrouter.ai/api/v1/chat/completions",
-                headers={
-                    "Authorization": f"Bearer {settings.OPENROUTER_API_KEY}",
-                    "Content-Type": "application/json",
-                },
-                json={
-                    "model": "qwen/qwen3.5-plus-02-15",
-                    "messages": [
-                        {
-                            "role": "user",
-                            "content": prompt
-                        }
-                    ],
-                    "max_tokens": 500,  # Увеличено для более подробного отчета (~350 слов)
-                    "temperature": 0.7  # Чуть больше креативности
-                },
-                timeout=30.0
-            )
-            response.raise_for_status()
-            result = response.json()
+@router.post("/{student_id}/generate-weekly-report")
+async def generate_weekly_report(
+    student_id: UUID,
+    days: int = Body(7, embed=True),
+    db: AsyncSession = Depends(get_db),
+    current_user: Employee = Depends(get_current_user),
+):
+    """Generate AI-powered weekly performance report for a student."""
+    stats, start_date, end_date = await _weekly_report_stats(db, student_id, days)
+
+    prompt = build_weekly_prompt(stats, start_date, end_date)
+    ai_report = (await complete(prompt, max_tokens=500, temperature=0.7)).text
+
+    # Сохранить репорт в БД
+    weekly_report = WeeklyReport(
+        student_id=student_id,
+        created_by=current_user.id,
+        period_start=start_date,
+        period_end=end_date,
+        ai_report=ai_report,
+        **stats.counters(),
+    )
+    db.add(weekly_report)
+    await db.commit()
+    await db.refresh(weekly_report)
 
-            if "choices" not in result or len(result["choices"]) == 0:
-                raise HTTPException(
-                    status_code=500,
-                    detail="Failed to generate report from AI"
-                )
+    return _weekly_report_result(weekly_report, stats)
 
-            ai_report = result["choices"][0]["message"]["content"]
 
-            # Сохранить репорт в БД
+def _sse(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+@router.post("/{student_id}/generate-weekly-report/stream")
+async def stream_weekly_report(
+    student_id: UUID,
+    days: int = Body(7, embed=True),
+    db: AsyncSession = Depends(get_db),
+    current_user: Employee = Depends(get_current_user),
+):
+    """
+    То же, что generate-weekly-report, но текст отдается по мере генерации (text/event-stream):
+    события token {"text"}, затем done {report_id, report, period, stats, ttft_ms} или error {status, detail}.
+    Отчет сохраняется, только если генерация дошла до конца; при отключении клиента запрос к модели обрывается.
+    """
+    stats, start_date, end_date = await _weekly_report_stats(db, student_id, days)
+    prompt = build_weekly_prompt(stats, start_date, end_date)
+    creator_id = current_user.id
+
+    async def events():
+        started = time.monotonic()
+        ttft_ms = None
+        parts = []
+        try:
+            async for delta in stream_completion(prompt, max_tokens=500, temperature=0.7):
+                if ttft_ms is None:
+                    ttft_ms = round((time.monotonic() - started) * 1000)
+                parts.append(delta)
+                yield _sse("token", {"text": delta})
+        except HTTPException as e:
+            yield _sse("error", {"status": e.status_code, "detail": e.detail})
+            return
+
+        # The request-scoped session is already closed while the body streams
+        async with async_session() as session:
             weekly_report = WeeklyReport(
                 student_id=student_id,
-                created_by=current_user.id,
+                created_by=creator_id,
                 period_start=start_date,
                 period_end=end_date,
-                attendance_count=attendance_count,
-                absent_count=absent_count,
-                late_count=late_count,
-                homework_completed=homework_completed,
-                homework_total=homework_total,
-                ai_report=ai_report
+                ai_report="".join(parts),
+                **stats.counters(),
             )
-            db.add(weekly_report)
-            await db.commit()
-            await db.refresh(weekly_report)
-
-            return {
-                "report_id": str(weekly_report.id),
-                "report": ai_report,
-                "period": {
-                    "start": start_date.isoformat(),
-                    "end": end_date.isoformat()
-                },
-                "stats": {
-                    "attendance_count": attendance_count,
-                    "absent_count": absent_count,
-                    "late_count": late_count,
-                    "homework_completed": homework_completed,
-                    "homework_total": homework_total
-                }
-            }
-
-    except httpx.HTTPError as e:
-        raise HTTPException(
-            status_code=500,
-            detail=f"Failed to connect to AI service: {str(e)}"
-        )
-    except Exception as e:
-        raise HTTPException(
-            status_code=500,
-            detail=f"Error generating report: {str(e)}"
-        )
+            session.add(weekly_report)
+            await session.commit()
+        yield _sse("done", {**_weekly_report_result(weekly_report, stats), "ttft_ms": ttft_ms})
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
 
 
-@router.get("/weekly-reports/latest-all", response_model=dict[str, WeeklyReportResponse])
-async def get_all_students_latest_reports(
-    db: AsyncSession = Depends(get_db),
+@router.post("/weekly-reports/generate-all", status_code=status.HTTP_202_ACCEPTED)
+async def generate_all_weekly_reports(
+    days: int = Body(7, embed=True),
+    period_start: Optional[date] = Body(None, embed=True),
+    period_end: Optional[date] = Body(None, embed=True),
     current_user: Employee = Depends(get_current_user),
 ):
-    """Получить последний отчет для каждого активного студента."""
-    # Get all active students
-    students_result = await db.execute(
-        select(Student).where(Student.status == "active")
-    )
-    students = students_result.scalars().all()
+    """
+    Запустить генерацию недельных отчетов для всех активных студентов (admin и manager).
+    Период — period_start..period_end, без них — последние days дней.
+    Чтобы продолжить прерванную генерацию, передайте тот же период (см. GET) —
+    отчеты будут догенерированы только для студентов, у которых их еще нет.
+    """
+    if current_user.role not in ("admin", "manager"):
+        raise HTTPException(status_code=403, detail="Access denied.")
 
-    # Get latest report for each student using a subquery
-    from sqlalchemy import func
-    from sqlalchemy.orm import aliased
+    if (period_start is None) != (period_end is None):
+        raise HTTPException(status_code=400, detail="period_start and period_end must be given together")
+    if period_start is None:
+        period_end = datetime.now().date()
+        period_start = period_end - timedelta(days=days)
+    elif period_start > period_end:
+        raise HTTPException(status_code=400, detail="period_start must not be after period_end")
+    return start_weekly_reports_batch(period_start, period_end, current_user.id)
 
-    # Subquery to get max created_at for each student
-    subq = (
-        select(
-            WeeklyReport.student_id,
-            func.max(WeeklyReport.created_at).label('max_created_at')
-        )
-        .group_by(WeeklyReport.student_id)
-        .subquery()
-    )
 
-    # Join to get the full report rows
+@router.get("/weekly-reports/generate-all")
+async def get_weekly_reports_batch_status(
+    db: AsyncSession = Depends(get_db),
+    current_user: Employee = Depends(get_current_user),
+):
+    """
+    Состояние пакетной генерации в этом процессе; сами отчеты — в latest-all.
+    last_period — период последних записанных отчетов: его можно передать в POST,
+    чтобы продолжить генерацию после перезапуска сервера.
+    """
+    if current_user.role not in ("admin", "manager"):
+        raise HTTPException(status_code=403, detail="Access denied.")
+    return {**batch_state, "last_period": await latest_report_period(db)}
+
+
+@router.get("/weekly-reports/latest-all", response_model=dict[str, WeeklyReportResponse])
+async def get_all_students_latest_reports(
+    response: Response,
+    location_id: Optional[UUID] = Query(None, description="Only students in an active (non-archived) group at this location"),
+    is_approved: Optional[bool] = Query(None, description="Only approved / only unapproved reports"),
+    period_from: Optional[date] = Query(None, description="Reports whose period ends on or after this date"),
+    period_to: Optional[date] = Query(None, description="Reports whose period ends on or before this date"),
+    cursor: Optional[UUID] = Query(None, description="Keyset cursor (student id) from the X-Next-Cursor header"),
+    limit: Optional[int] = Query(None, ge=1, le=1000, description="Page size; without it all students are returned"),
+    db: AsyncSession = Depends(get_db),
+    current_user: Employee = Depends(get_current_user),
+):
+    """
+    Получить последний отчет для каждого активного студента.
+    Фильтры применяются к отчетам: с period_from/period_to — последний отчет за этот период.
+    Пагинация по student_id: если есть еще страницы, курсор — в заголовке X-Next-Cursor.
+    """
+    # One pass over ix_weekly_reports_student_id_created_at
     query = (
         select(WeeklyReport)
-        .join(
-            subq,
-            (WeeklyReport.student_id == subq.c.student_id) &
-            (WeeklyReport.created_at == subq.c.max_created_at)
-        )
+        .join(Student, Student.id == WeeklyReport.student_id)
+        .where(Student.status == "active")
+        .distinct(WeeklyReport.student_id)
+        .order_by(WeeklyReport.student_id, WeeklyReport.created_at.desc())
     )
 
+    if location_id:
+        query = query.where(exists(
+            select(GroupStudent.id)
+            .join(Group, GroupStudent.group_id == Group.id)
+            .where(
+                GroupStudent.student_id == WeeklyReport.student_id,
+                Group.school_location_id == location_id,
+                Group.is_archived == False,
+                GroupStudent.is_archived == False,
+            )
+        ))
+    if is_approved is not None:
+        query = query.where(WeeklyReport.is_approved == is_approved)
+    if period_from:
+        query = query.where(WeeklyReport.period_end >= period_from)
+    if period_to:
+        query = query.where(WeeklyReport.period_end <= period_to)
+
+    if cursor:
+        query = query.where(WeeklyReport.student_id > cursor)
+    if limit:
+        query = query.limit(limit + 1)
+
     result = await db.execute(query)
     reports = result.scalars().all()
 
-    # Build dict with student_id as key
-    reports_dict = {str(report.student_id): report for report in reports}
+    if limit and len(reports) > limit:
+        reports = reports[:limit]
+        response.headers["X-Next-Cursor"] = str(reports[-1].student_id)
 
-    return reports_dict
+    # Build dict with student_id as key
+    return {str(report.student_id): report for report in reports}
 
 
 @router.get("/{student_id}/weekly-reports", response_model=list[WeeklyReportResponse])
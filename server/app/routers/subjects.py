@@ -7,8 +7,12 @@ from sqlalchemy.ext.asyncio import AsyncSession
 from app.database import get_db
 from app.models.subject import Subject
 from app.models.employee import Employee
-from app.schemas.subject import SubjectCreate, SubjectUpdate, SubjectResponse
+from app.schemas.exam import ExamRescoreResponse
+from app.schemas.subject import SubjectCreate, SubjectUpdate, SubjectResponse, SubjectRescoreRequest
 from app.auth.dependencies import get_current_user
+from app.services.exam_analytics import invalidate_all_exam_analytics
+from app.services.exam_scoring import invalidate_rescored, rescore_subject_exams
+from app.services.portal_cache import invalidate_portal_content, SUBJECTS
 
 router = APIRouter(prefix="/subjects", tags=["subjects"])
 
@@ -31,6 +35,7 @@ async def create_subject(
     subject = Subject(**data.model_dump())
     db.add(subject)
     await db.commit()
+    await invalidate_portal_content(SUBJECTS)
     await db.refresh(subject)
     return subject
 
@@ -63,11 +68,38 @@ async def update_subject(
     for field, value in data.model_dump(exclude_unset=True).items():
         setattr(subject, field, value)
 
+    # Stored scores stay as they are; re-scoring is a separate action (rescore-exams)
     await db.commit()
+    await invalidate_portal_content(SUBJECTS)
+    invalidate_all_exam_analytics()
     await db.refresh(subject)
     return subject
 
 
+@router.post("/{subject_id}/rescore-exams", response_model=ExamRescoreResponse)
+async def rescore_subject(
+    subject_id: UUID,
+    data: SubjectRescoreRequest,
+    db: AsyncSession = Depends(get_db),
+    current_user: Employee = Depends(get_current_user),
+):
+    """
+    Re-score the subject's exams with an answer key using its current scale and task max scores.
+    Overwrites stored primary and final scores, so it is an explicit admin action;
+    date_from keeps earlier exams (e.g. last year's, on the old scale) untouched.
+    """
+    if current_user.role != "admin":
+        raise HTTPException(status_code=403, detail="Access denied.")
+    result = await db.execute(select(Subject.id).where(Subject.id == subject_id))
+    if result.scalar_one_or_none() is None:
+        raise HTTPException(status_code=404, detail="Subject not found")
+
+    rescored = await rescore_subject_exams(db, subject_id, date_from=data.date_from)
+    await db.commit()
+    invalidate_rescored(rescored)
+    return ExamRescoreResponse(rescored=rescored.count)
+
+
 @router.delete("/{subject_id}")
 async def delete_subject(
     subject_id: UUID,
@@ -81,4 +113,5 @@ async def delete_subject(
 
     await db.delete(subject)
     await db.commit()
+    await invalidate_portal_content(SUBJECTS)
     return {"detail": "Deleted"}
@@ -10,6 +10,7 @@ from app.models.employee import Employee
 from app.models.student import Student
 from app.schemas.finance import SubscriptionPlanCreate, SubscriptionPlanUpdate, SubscriptionPlanResponse
 from app.auth.dependencies import get_current_user, require_role
+from app.services.portal_cache import invalidate_portal_content, SUBSCRIPTION_PLANS
 
 router = APIRouter(prefix="/subscription-plans", tags=["subscription-plans"])
 
@@ -32,6 +33,7 @@ async def create_subscription_plan(
     plan = SubscriptionPlan(**data.model_dump())
     db.add(plan)
     await db.commit()
+    await invalidate_portal_content(SUBSCRIPTION_PLANS)
     await db.refresh(plan)
     return plan
 
@@ -52,6 +54,7 @@ async def update_subscription_plan(
         setattr(plan, field, value)
 
     await db.commit()
+    await invalidate_portal_content(SUBSCRIPTION_PLANS)
     await db.refresh(plan)
     return plan
 
@@ -79,3 +82,4 @@ async def delete_subscription_plan(
 
     await db.delete(plan)
     await db.commit()
+    await invalidate_portal_content(SUBSCRIPTION_PLANS)
@@ -0,0 +1,206 @@
+"""
+Teacher-facing aggregates.
+
+GET /teachers/me/dashboard — уроки на сегодня/завтра, неотмеченные уроки, должники, начисленная зарплата
+"""
+from datetime import date as date_type, time as time_type, datetime, timedelta, timezone
+from uuid import UUID
+
+from fastapi import APIRouter, Depends
+from pydantic import BaseModel
+from sqlalchemy import select, func, exists, or_, and_
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.cache import TTLCache
+from app.database import get_db
+from app.models.employee import Employee
+from app.models.finance import EmployeeSalary, SalaryStatus
+from app.models.group import Group, GroupStudent
+from app.models.lesson import Lesson, LessonAttendance, LessonStatus
+from app.models.student import Student
+from app.auth.dependencies import get_current_user
+
+router = APIRouter(prefix="/teachers", tags=["teachers"])
+
+# Unmarked lessons older than this are left to the journal
+UNMARKED_LOOKBACK_DAYS = 60
+UNMARKED_LIMIT = 50
+
+_dashboard_cache = TTLCache(ttl_seconds=30)
+
+
+# ── Schemas ────────────────────────────────────────────────────────────────────
+
+class DashboardLesson(BaseModel):
+    id: UUID
+    group_id: UUID
+    group_name: str
+    date: date_type
+    time: time_type | None
+    duration: int | None
+    topic: str | None
+    status: LessonStatus | None
+    is_cancelled: bool
+
+
+class UnmarkedLesson(BaseModel):
+    id: UUID
+    group_id: UUID
+    group_name: str
+    date: date_type
+    time: time_type | None
+    missing_status: bool
+    missing_attendance: bool
+
+
+class DebtorStudent(BaseModel):
+    student_id: UUID
+    first_name: str
+    last_name: str
+    balance: float
+    group_id: UUID
+    group_name: str
+
+
+class PendingSalary(BaseModel):
+    period_start: date_type
+    total: float
+    lessons_count: int
+
+
+class TeacherDashboardResponse(BaseModel):
+    today: list[DashboardLesson]
+    tomorrow: list[DashboardLesson]
+    unmarked_lessons: list[UnmarkedLesson]
+    debtors: list[DebtorStudent]
+    pending_salary: PendingSalary
+    generated_at: datetime
+
+
+# ── Endpoints ─────────────────────────────────────────────────────────────────
+
+@router.get("/me/dashboard", response_model=TeacherDashboardResponse)
+async def get_my_dashboard(
+    db: AsyncSession = Depends(get_db),
+    current_user: Employee = Depends(get_current_user),
+):
+    today = date_type.today()
+    cache_key = (current_user.id, today)
+    cached = _dashboard_cache.get(cache_key)
+    if cached is not None:
+        return cached
+
+    tomorrow = today + timedelta(days=1)
+    teacher_groups = Group.teacher_id == current_user.id
+
+    # 1. Today's and tomorrow's lessons
+    upcoming_result = await db.execute(
+        select(Lesson, Group.name)
+        .join(Group, Group.id == Lesson.group_id)
+        .where(teacher_groups, Lesson.date.in_([today, tomorrow]))
+        .order_by(Lesson.date, Lesson.time)
+    )
+    today_lessons: list[DashboardLesson] = []
+    tomorrow_lessons: list[DashboardLesson] = []
+    for lesson, group_name in upcoming_result.all():
+        item = DashboardLesson(
+            id=lesson.id,
+            group_id=lesson.group_id,
+            group_name=group_name,
+            date=lesson.date,
+            time=lesson.time,
+            duration=lesson.duration,
+            topic=lesson.topic,
+            status=lesson.status,
+            is_cancelled=lesson.is_cancelled,
+        )
+        (today_lessons if lesson.date == today else tomorrow_lessons).append(item)
+
+    # 2. Past lessons without status, or conducted without any attendance row
+    #    (not_conducted lessons have no attendance by design)
+    has_attendance = exists().where(LessonAttendance.lesson_id == Lesson.id)
+    unmarked_result = await db.execute(
+        select(
+            Lesson.id, Lesson.group_id, Group.name, Lesson.date, Lesson.time, Lesson.status,
+            has_attendance.label("has_attendance"),
+        )
+        .join(Group, Group.id == Lesson.group_id)
+        .where(
+            teacher_groups,
+            Group.is_archived == False,
+            Lesson.is_cancelled == False,
+            Lesson.date < today,
+            Lesson.date >= today - timedelta(days=UNMARKED_LOOKBACK_DAYS),
+            or_(Lesson.status.is_(None), and_(Lesson.status == LessonStatus.conducted, ~has_attendance)),
+        )
+        .order_by(Lesson.date.desc(), Lesson.time.desc())
+        .limit(UNMARKED_LIMIT)
+    )
+    unmarked = [
+        UnmarkedLesson(
+            id=row.id,
+            group_id=row.group_id,
+            group_name=row.name,
+            date=row.date,
+            time=row.time,
+            missing_status=row.status is None,
+            missing_attendance=row.status != LessonStatus.not_conducted and not row.has_attendance,
+        )
+        for row in unmarked_result.all()
+    ]
+
+    # 3. Students with a negative balance in the teacher's active groups
+    debtors_result = await db.execute(
+        select(Student.id, Student.first_name, Student.last_name, Student.balance, Group.id, Group.name)
+        .join(GroupStudent, GroupStudent.student_id == Student.id)
+        .join(Group, Group.id == GroupStudent.group_id)
+        .where(
+            teacher_groups,
+            Group.is_archived == False,
+            GroupStudent.is_archived == False,
+            GroupStudent.is_trial == False,
+            Student.balance < 0,
+        )
+        .distinct()
+        .order_by(Student.balance, Student.last_name)
+    )
+    debtors = [
+        DebtorStudent(
+            student_id=sid,
+            first_name=first_name,
+            last_name=last_name,
+            balance=float(balance),
+            group_id=gid,
+            group_name=group_name,
+        )
+        for sid, first_name, last_name, balance, gid, group_name in debtors_result.all()
+    ]
+
+    # 4. Pending salary accrued since the start of the current month
+    period_start = today.replace(day=1)
+    salary_result = await db.execute(
+        select(
+            func.coalesce(func.sum(EmployeeSalary.total), 0),
+            func.coalesce(func.sum(EmployeeSalary.lessons_count), 0),
+        ).where(
+            EmployeeSalary.employee_id == current_user.id,
+            EmployeeSalary.status == SalaryStatus.pending,
+            EmployeeSalary.created_at >= datetime.combine(period_start, time_type.min, tzinfo=timezone.utc),
+        )
+    )
+    salary_total, salary_lessons = salary_result.one()
+
+    response = TeacherDashboardResponse(
+        today=today_lessons,
+        tomorrow=tomorrow_lessons,
+        unmarked_lessons=unmarked,
+        debtors=debtors,
+        pending_salary=PendingSalary(
+            period_start=period_start,
+            total=float(salary_total),
+            lessons_count=int(salary_lessons),
+        ),
+        generated_at=datetime.now(timezone.utc),
+    )
+    _dashboard_cache.set(cache_key, response)
+    return response
@@ -4,6 +4,7 @@ from io import BytesIO
 
 import boto3
 from botocore.config import Config as BotoConfig
+from botocore.exceptions import ClientError
 
 from app.config import settings
 
@@ -26,6 +27,7 @@ ALLOWED_SHEET_TYPES = {
 ALLOWED_CONTENT_TYPES = ALLOWED_IMAGE_TYPES | ALLOWED_DOC_TYPES | ALLOWED_SHEET_TYPES
 
 MAX_FILE_SIZE = 10 * 1024 * 1024  # 10 MB
+PRESIGNED_UPLOAD_EXPIRES = 600  # seconds
 
 
 def _get_s3_client():
@@ -60,6 +62,79 @@ async def upload_file(data: bytes, original_name: str, content_type: str) -> str
     return key
 
 
+def new_object_key(prefix: str, original_name: str, default_ext: str = "bin") -> str:
+    ext = original_name.rsplit(".", 1)[-1] if "." in original_name else default_ext
+    return f"{prefix}/{uuid.uuid4().hex}.{ext}"
+
+
+def create_presigned_upload(key: str, content_type: str, max_size: int = MAX_FILE_SIZE) -> dict:
+    """Presigned POST for a direct browser/app upload: {"url", "fields"}.
+
+    The policy pins the key and content type and limits the size, so the client
+    can't upload anything else with it.
+    """
+    client = _get_s3_client()
+    return client.generate_presigned_post(
+        Bucket=settings.S3_BUCKET_NAME,
+        Key=key,
+        Fields={"Content-Type": content_type},
+        Conditions=[
+            {"Content-Type": content_type},
+            ["content-length-range", 1, max_size],
+        ],
+        ExpiresIn=PRESIGNED_UPLOAD_EXPIRES,
+    )
+
+
+def head_object(key: str) -> dict | None:
+    """Object metadata ({"size", "content_type"}) or None if it doesn't exist."""
+    client = _get_s3_client()
+    try:
+        response = client.head_object(Bucket=settings.S3_BUCKET_NAME, Key=key)
+    except ClientError as e:
+        if e.response.get("Error", {}).get("Code") in ("404", "NoSuchKey", "NotFound"):
+            return None
+        raise
+    return {
+        "size": response.get("ContentLength", 0),
+        "content_type": response.get("ContentType", "application/octet-stream"),
+    }
+
+
+def delete_object(key: str) -> None:
+    client = _get_s3_client()
+    client.delete_object(Bucket=settings.S3_BUCKET_NAME, Key=key)
+
+
+def delete_objects(keys: list[str]) -> set[str]:
+    """Batch delete (1000 keys per request). Returns the keys S3 confirmed as deleted."""
+    client = _get_s3_client()
+    deleted: set[str] = set()
+    for i in range(0, len(keys), 1000):
+        response = client.delete_objects(
+            Bucket=settings.S3_BUCKET_NAME,
+            Delete={"Objects": [{"Key": k} for k in keys[i:i + 1000]], "Quiet": False},
+        )
+        deleted.update(item["Key"] for item in response.get("Deleted", []))
+    return deleted
+
+
+def put_object(key: str, data: bytes, content_type: str) -> None:
+    """Upload bytes under an explicit key (derived objects such as thumbnails)."""
+    put_fileobj(key, BytesIO(data), content_type)
+
+
+def put_fileobj(key: str, fileobj, content_type: str) -> None:
+    """Stream a file-like object to S3 under an explicit key."""
+    client = _get_s3_client()
+    client.upload_fileobj(
+        fileobj,
+        settings.S3_BUCKET_NAME,
+        key,
+        ExtraArgs={"ContentType": content_type},
+    )
+
+
 def download_file(key: str) -> tuple[bytes, str]:
     """Download file from S3, return (data, content_type)."""
     client = _get_s3_client()
@@ -67,3 +142,20 @@ def download_file(key: str) -> tuple[bytes, str]:
     data = response["Body"].read()
     content_type = response.get("ContentType", "application/octet-stream")
     return data, content_type
+
+
+def download_to_file(key: str, path: str) -> dict:
+    """Stream an S3 object into a local file without buffering it in memory.
+
+    Returns the object metadata: content_type, etag, last_modified (datetime).
+    """
+    client = _get_s3_client()
+    response = client.get_object(Bucket=settings.S3_BUCKET_NAME, Key=key)
+    with open(path, "wb") as f:
+        for chunk in response["Body"].iter_chunks(chunk_size=64 * 1024):
+            f.write(chunk)
+    return {
+        "content_type": response.get("ContentType", "application/octet-stream"),
+        "etag": response.get("ETag"),
+        "last_modified": response.get("LastModified"),
+    }
@@ -40,6 +40,7 @@ class ChatMessageSchema(BaseModel):
     file_url: Optional[str] = None
     file_name: Optional[str] = None
     file_size: Optional[int] = None
+    file_meta: Optional[dict] = None
     reply_to_id: Optional[str] = None
     is_deleted: bool
     edited_at: Optional[datetime] = None
@@ -66,6 +67,7 @@ class SendMessageRequest(BaseModel):
     file_url: Optional[str] = None
     file_name: Optional[str] = None
     file_size: Optional[int] = None
+    file_meta: Optional[dict] = None
     reply_to_id: Optional[str] = None
 
 
@@ -1,7 +1,7 @@
 from uuid import UUID
 from datetime import date as date_type, datetime
-from typing import Any, Optional, List, Dict
-from pydantic import BaseModel
+from typing import Any, Literal, Optional, List, Dict
+from pydantic import BaseModel, Field
 
 
 class ExamCreate(BaseModel):
@@ -97,6 +97,8 @@ class ExamResultCreate(BaseModel):
     primary_score: Optional[int] = 0
     final_score: Optional[float] = 0.0
     answers: Optional[list[Optional[int]]] = None
+    # When set and the exam has an answer key, answers/primary_score/final_score are computed
+    raw_answers: Optional[list[Optional[str]]] = None
     task_comments: Optional[dict[str, str]] = None
     student_comment: Optional[str] = None
 
@@ -105,6 +107,7 @@ class ExamResultUpdate(BaseModel):
     primary_score: Optional[int] = None
     final_score: Optional[float] = None
     answers: Optional[list[Optional[int]]] = None
+    raw_answers: Optional[list[Optional[str]]] = None
     task_comments: Optional[dict[str, str]] = None
     student_comment: Optional[str] = None
     added_by: Optional[UUID] = None
@@ -117,6 +120,7 @@ class ExamResultResponse(BaseModel):
     primary_score: int
     final_score: float
     answers: Optional[Any]
+    raw_answers: Optional[Any] = None
     task_comments: Optional[Any]
     student_comment: Optional[str]
     added_by: Optional[UUID]
@@ -128,3 +132,133 @@ class ExamResultResponse(BaseModel):
     added_by_employee: Optional[EmployeeInfoForExam] = None
 
     model_config = {"from_attributes": True}
+
+
+class ExamTaskAnalytics(BaseModel):
+    task_number: int
+    label: str
+    max_score: int
+    mean_score: float
+    solve_rate: float  # mean share of the max score, 0..1
+    full_solve_rate: float  # share of students with the max score
+    discrimination: Optional[float]  # upper 27% minus lower 27%, None for < 4 students
+    score_distribution: list[int]  # students per score 0..max_score
+
+
+class ExamTopicAnalytics(BaseModel):
+    topic: str
+    task_numbers: list[int]
+    mastery: float  # earned / possible over the topic's tasks, 0..1
+
+
+class ExamAnalyticsResponse(BaseModel):
+    exam_id: UUID
+    students_count: int
+    mean_primary_score: float
+    median_primary_score: float
+    mean_final_score: float
+    max_primary_score: int
+    threshold_score: Optional[int]
+    threshold_pass_rate: Optional[float]
+    tasks: list[ExamTaskAnalytics]
+    topics: list[ExamTopicAnalytics]
+
+
+class ProgressPoint(BaseModel):
+    exam_id: UUID
+    exam_title: str
+    exam_date: date_type
+    primary_score: int
+    final_score: float
+    delta: Optional[float]  # vs the previous exam of the subject
+    is_passed: Optional[bool]
+    rank: int  # 1 = best final score in the exam's cohort
+    cohort_size: int
+    percentile: float  # share of the cohort with a lower final score, %
+
+
+class TopicTrendPoint(BaseModel):
+    exam_id: UUID
+    exam_date: date_type
+    mastery: float  # 0..1
+
+
+class TopicTrend(BaseModel):
+    topic: str
+    points: list[TopicTrendPoint]
+
+
+class SubjectProgress(BaseModel):
+    subject_id: Optional[UUID]
+    subject_name: Optional[str]
+    points: list[ProgressPoint]
+    topics: list[TopicTrend]
+
+
+class StudentProgressResponse(BaseModel):
+    student_id: UUID
+    subjects: list[SubjectProgress]
+
+
+class AnswerKeyTask(BaseModel):
+    answer: Optional[str] = None  # accepted variants separated by "|"
+    max_score: int = Field(1, ge=0)
+    rule: Literal["exact", "unordered", "one_error", "per_element", "manual"] = "exact"
+
+
+class ExamAnswerKey(BaseModel):
+    tasks: dict[int, AnswerKeyTask]  # task number → key
+
+
+class ExamAnswerKeyResponse(BaseModel):
+    exam_id: UUID
+    tasks: dict[int, AnswerKeyTask]
+    rescored: int = 0
+
+
+class ExamRescoreResponse(BaseModel):
+    rescored: int
+
+
+class ExamSubmission(BaseModel):
+    student_id: UUID
+    raw_answers: list[Optional[str]]
+    answers: Optional[list[Optional[int]]] = None  # teacher scores for manually checked tasks
+
+
+class ExamSubmissionBatch(BaseModel):
+    submissions: list[ExamSubmission]
+
+
+class ScoredResultResponse(BaseModel):
+    result_id: UUID
+    student_id: UUID
+    answers: list[Optional[int]]
+    primary_score: int
+    final_score: float
+    created: bool
+
+
+class ExamResultGridRow(BaseModel):
+    student_id: UUID
+    answers: Optional[list[Optional[int]]] = None
+    raw_answers: Optional[list[Optional[str]]] = None
+    primary_score: Optional[int] = None  # used when there are no per-task scores
+    final_score: Optional[float] = None
+    student_comment: Optional[str] = None
+
+
+class ExamResultGrid(BaseModel):
+    rows: list[ExamResultGridRow]
+
+
+class ExamResultRowError(BaseModel):
+    row: int
+    student: Optional[str]
+    error: str
+
+
+class ExamResultsBulkResponse(BaseModel):
+    created: int
+    updated: int
+    errors: list[ExamResultRowError]
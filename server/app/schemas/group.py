@@ -127,3 +127,48 @@ class GroupStudentResponse(BaseModel):
     student: Optional[StudentInGroup] = None
 
     model_config = {"from_attributes": True}
+
+
+# --- Group journal (students × lessons matrix) ---
+
+class JournalStudent(BaseModel):
+    id: UUID
+    first_name: str
+    last_name: str
+    is_archived: bool = False
+
+
+class JournalLesson(BaseModel):
+    id: UUID
+    date: date_type
+    time: Optional[time_type]
+    topic: Optional[str]
+    status: Optional[str]
+    is_cancelled: bool
+
+
+class JournalCells(BaseModel):
+    """Columnar encoding of filled journal cells: the i-th entry of every array describes one cell."""
+    student_idx: list[int] = []
+    lesson_idx: list[int] = []
+    attendance: list[Optional[int]] = []  # index into GroupJournalResponse.attendance_codes
+    lesson_grade: list[Optional[str]] = []
+    homework_grade: list[Optional[str]] = []
+
+
+class JournalStudentStats(BaseModel):
+    """Per-student aggregates, aligned with GroupJournalResponse.students."""
+    attendance_rate: list[Optional[float]] = []
+    mean_lesson_grade: list[Optional[float]] = []
+    mean_homework_grade: list[Optional[float]] = []
+
+
+class GroupJournalResponse(BaseModel):
+    group_id: UUID
+    date_from: Optional[date_type]
+    date_to: Optional[date_type]
+    attendance_codes: list[str]
+    students: list[JournalStudent]
+    lessons: list[JournalLesson]
+    cells: JournalCells
+    stats: JournalStudentStats
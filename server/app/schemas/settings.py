@@ -1,4 +1,5 @@
 from uuid import UUID
+from datetime import date
 from typing import Optional
 from pydantic import BaseModel
 from decimal import Decimal
@@ -12,6 +13,7 @@ class SettingsUpdate(BaseModel):
     address: Optional[str] = None
     default_rate: Optional[Decimal] = None
     student_fee: Optional[Decimal] = None
+    holidays: Optional[list[date]] = None
 
 
 class SettingsResponse(BaseModel):
@@ -23,5 +25,6 @@ class SettingsResponse(BaseModel):
     address: Optional[str]
     default_rate: Optional[Decimal]
     student_fee: Optional[Decimal]
+    holidays: Optional[list[date]] = None
 
     model_config = {"from_attributes": True}
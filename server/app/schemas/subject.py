@@ -1,3 +1,4 @@
+from datetime import date
 from uuid import UUID
 from typing import Optional, List, Dict, Any
 from pydantic import BaseModel
@@ -46,3 +47,8 @@ class SubjectResponse(BaseModel):
     topics: Optional[List[Dict[str, Any]]] = None
 
     model_config = {"from_attributes": True}
+
+
+class SubjectRescoreRequest(BaseModel):
+    # Only exams on or after this date; None — every exam of the subject with an answer key
+    date_from: Optional[date] = None
@@ -0,0 +1,20 @@
+from typing import Optional
+from pydantic import BaseModel
+
+
+class PresignUploadRequest(BaseModel):
+    file_name: str
+    content_type: str
+    file_size: Optional[int] = None
+
+
+class PresignedUploadResponse(BaseModel):
+    url: str
+    fields: dict[str, str]  # form fields to POST before the file itself
+    key: str
+    upload_token: str  # pass to the finalize endpoint
+    expires_in: int
+
+
+class FinalizeUploadRequest(BaseModel):
+    upload_token: str
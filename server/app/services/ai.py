@@ -0,0 +1,326 @@
+"""
+Шлюз к OpenRouter (chat completions).
+
+Один общий httpx.AsyncClient с keep-alive на процесс, глобальный семафор на
+число одновременных запросов (AI_MAX_CONCURRENCY), повторы с экспоненциальной
+задержкой на 429/5xx и сетевые ошибки (Retry-After учитывается).
+Ответы кэшируются по хэшу промпта и параметров: повторная генерация отчёта
+за неизменную неделю возвращается сразу, без запроса к модели.
+
+stream_completion() отдаёт токены по мере генерации (stream=true); время до
+первого токена (TTFT) копится в stats. Если потребитель перестал читать
+(клиент отключился), ответ закрывается и запрос к модели обрывается.
+
+Каждый вызов учитывается в stats (токены, задержка, повторы, попадания в
+кэш). Для офлайн-проверок OPENROUTER_BASE_URL можно направить на локальную
+заглушку: python ai_stub_server.py.
+"""
+import asyncio
+import hashlib
+import json
+import logging
+import random
+import time
+from collections.abc import AsyncIterator
+from dataclasses import dataclass, replace
+
+import httpx
+from fastapi import HTTPException
+
+from app.cache import TTLCache
+from app.config import settings
+from app.metrics import AI_TIME_TO_FIRST_TOKEN, OUTBOUND_DURATION, observe_outbound
+
+log = logging.getLogger(__name__)
+
+_RETRY_STATUSES = {429, 500, 502, 503, 504}
+_BACKOFF_BASE_SECONDS = 1.0
+_BACKOFF_MAX_SECONDS = 20.0
+
+_client: httpx.AsyncClient | None = None
+_semaphore: asyncio.Semaphore | None = None
+_completion_cache = TTLCache(ttl_seconds=settings.AI_CACHE_TTL_SECONDS, max_entries=2000)
+
+stats = {
+    "calls": 0,
+    "cache_hits": 0,
+    "retries": 0,
+    "failures": 0,
+    "prompt_tokens": 0,
+    "completion_tokens": 0,
+    "latency_ms_total": 0.0,
+    "stream_calls": 0,
+    "stream_cancelled": 0,
+    "ttft_ms_total": 0.0,
+    "ttft_ms_last": 0.0,
+}
+
+
+@dataclass(frozen=True)
+class AICompletion:
+    text: str
+    model: str
+    prompt_tokens: int
+    completion_tokens: int
+    latency_ms: float
+    cached: bool = False
+
+
+def get_ai_client() -> httpx.AsyncClient:
+    global _client
+    if _client is None or _client.is_closed:
+        _client = httpx.AsyncClient(
+            base_url=settings.OPENROUTER_BASE_URL.rstrip("/"),
+            timeout=httpx.Timeout(settings.AI_TIMEOUT_SECONDS, connect=10.0),
+            limits=httpx.Limits(
+                max_connections=settings.AI_MAX_CONCURRENCY * 2,
+                max_keepalive_connections=settings.AI_MAX_CONCURRENCY,
+            ),
+        )
+    return _client
+
+
+def _get_semaphore() -> asyncio.Semaphore:
+    global _semaphore
+    if _semaphore is None:
+        _semaphore = asyncio.Semaphore(settings.AI_MAX_CONCURRENCY)
+    return _semaphore
+
+
+async def close_ai_client() -> None:
+    """Called from the app lifespan on shutdown."""
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
+
+
+def _auth_headers() -> dict:
+    if not settings.OPENROUTER_API_KEY:
+        raise HTTPException(
+            status_code=503,
+            detail="OpenRouter API key not configured. Please set OPENROUTER_API_KEY in .env file",
+        )
+    return {"Authorization": f"Bearer {settings.OPENROUTER_API_KEY}"}
+
+
+def prompt_hash(payload: dict) -> str:
+    return hashlib.sha256(json.dumps(payload, sort_keys=True, ensure_ascii=False).encode()).hexdigest()
+
+
+def build_payload(
+    prompt: str,
+    *,
+    model: str | None = None,
+    max_tokens: int = 500,
+    temperature: float = 0.7,
+) -> dict:
+    return {
+        "model": model or settings.AI_MODEL,
+        "messages": [{"role": "user", "content": prompt}],
+        "max_tokens": max_tokens,
+        "temperature": temperature,
+    }
+
+
+def _retry_delay(attempt: int, response: httpx.Response | None) -> float:
+    retry_after = response.headers.get("Retry-After") if response is not None else None
+    if retry_after and retry_after.isdigit():
+        return min(float(retry_after), _BACKOFF_MAX_SECONDS)
+    # Full jitter so parallel callers don't retry in lockstep
+    return random.uniform(0, min(_BACKOFF_MAX_SECONDS, _BACKOFF_BASE_SECONDS * 2 ** attempt))
+
+
+async def _post_with_retries(path: str, payload: dict) -> httpx.Response:
+    """POST under the global semaphore, retrying 429/5xx and transport errors."""
+    headers = _auth_headers()
+    client = get_ai_client()
+    for attempt in range(settings.AI_MAX_RETRIES + 1):
+        response = None
+        try:
+            async with _get_semaphore():
+                with observe_outbound("ai") as call:
+                    response = await client.post(path, json=payload, headers=headers)
+                    call["ok"] = not response.is_error
+            if response.status_code not in _RETRY_STATUSES:
+                break
+            error = f"HTTP {response.status_code}"
+        except httpx.TimeoutException:
+            error = "timeout"
+        except httpx.TransportError as e:
+            error = type(e).__name__
+        if attempt == settings.AI_MAX_RETRIES:
+            stats["failures"] += 1
+            if error == "timeout":
+                raise HTTPException(status_code=504, detail="AI service timed out")
+            raise HTTPException(status_code=502, detail=f"AI service unavailable: {error}")
+        stats["retries"] += 1
+        delay = _retry_delay(attempt, response)
+        log.warning("AI request failed (%s), retry %s in %.1fs", error, attempt + 1, delay)
+        await asyncio.sleep(delay)
+
+    if response.is_error:
+        stats["failures"] += 1
+        log.error("AI request rejected: %s %s", response.status_code, response.text[:500])
+        raise HTTPException(status_code=502, detail=f"AI service error: HTTP {response.status_code}")
+    return response
+
+
+async def complete(
+    prompt: str,
+    *,
+    model: str | None = None,
+    max_tokens: int = 500,
+    temperature: float = 0.7,
+    use_cache: bool = True,
+) -> AICompletion:
+    """One chat completion. Identical prompts and parameters are served from the cache."""
+    payload = build_payload(prompt, model=model, max_tokens=max_tokens, temperature=temperature)
+    key = prompt_hash(payload)
+    if use_cache:
+        cached = _completion_cache.get(key)
+        if cached is not None:
+            stats["cache_hits"] += 1
+            return cached
+
+    started = time.monotonic()
+    response = await _post_with_retries("/chat/completions", payload)
+    latency_ms = (time.monotonic() - started) * 1000
+
+    body = response.json()
+    choices = body.get("choices") or []
+    text = (choices[0].get("message") or {}).get("content") if choices else None
+    if not text:
+        stats["failures"] += 1
+        raise HTTPException(status_code=502, detail="Failed to generate report from AI")
+
+    usage = body.get("usage") or {}
+    completion = AICompletion(
+        text=text,
+        model=body.get("model") or payload["model"],
+        prompt_tokens=usage.get("prompt_tokens") or 0,
+        completion_tokens=usage.get("completion_tokens") or 0,
+        latency_ms=latency_ms,
+    )
+    stats["calls"] += 1
+    stats["prompt_tokens"] += completion.prompt_tokens
+    stats["completion_tokens"] += completion.completion_tokens
+    stats["latency_ms_total"] += latency_ms
+    log.info(
+        "AI completion: model=%s tokens=%s+%s latency=%.0fms",
+        completion.model, completion.prompt_tokens, completion.completion_tokens, latency_ms,
+    )
+    _completion_cache.set(key, replace(completion, cached=True))
+    return completion
+
+
+async def stream_completion(
+    prompt: str,
+    *,
+    model: str | None = None,
+    max_tokens: int = 500,
+    temperature: float = 0.7,
+) -> AsyncIterator[str]:
+    """
+    Yield text deltas as the model produces them. A cached completion is yielded in one piece.
+    Retries happen only before the first byte; closing the generator aborts the upstream request.
+    """
+    payload = build_payload(prompt, model=model, max_tokens=max_tokens, temperature=temperature)
+    key = prompt_hash(payload)
+    cached = _completion_cache.get(key)
+    if cached is not None:
+        stats["cache_hits"] += 1
+        yield cached.text
+        return
+
+    headers = _auth_headers()
+    client = get_ai_client()
+    started = time.monotonic()
+    first_token_at = None
+    parts: list[str] = []
+    usage: dict = {}
+    try:
+        async with _get_semaphore():
+            for attempt in range(settings.AI_MAX_RETRIES + 1):
+                try:
+                    async with client.stream(
+                        "POST", "/chat/completions", json={**payload, "stream": True}, headers=headers,
+                    ) as response:
+                        if response.status_code in _RETRY_STATUSES and attempt < settings.AI_MAX_RETRIES:
+                            stats["retries"] += 1
+                            delay = _retry_delay(attempt, response)
+                            log.warning("AI stream got HTTP %s, retry %s in %.1fs", response.status_code, attempt + 1, delay)
+                            await asyncio.sleep(delay)
+                            continue
+                        if response.is_error:
+                            stats["failures"] += 1
+                            raise HTTPException(status_code=502, detail=f"AI service error: HTTP {response.status_code}")
+
+                        async for line in response.aiter_lines():
+                            if not line.startswith("data:"):
+                                continue  # blank separators and ": OPENROUTER PROCESSING" keep-alives
+                            data = line[5:].strip()
+                            if data == "[DONE]":
+                                break
+                            chunk = json.loads(data)
+                            usage = chunk.get("usage") or usage
+                            choices = chunk.get("choices") or []
+                            delta = (choices[0].get("delta") or {}).get("content") if choices else None
+                            if not delta:
+                                continue
+                            if first_token_at is None:
+                                first_token_at = time.monotonic()
+                            parts.append(delta)
+                            yield delta
+                        break
+                except httpx.TimeoutException:
+                    if first_token_at is not None or attempt == settings.AI_MAX_RETRIES:
+                        stats["failures"] += 1
+                        raise HTTPException(status_code=504, detail="AI service timed out")
+                    stats["retries"] += 1
+                    await asyncio.sleep(_retry_delay(attempt, None))
+                except httpx.TransportError as e:
+                    if first_token_at is not None or attempt == settings.AI_MAX_RETRIES:
+                        stats["failures"] += 1
+                        raise HTTPException(status_code=502, detail=f"AI service unavailable: {type(e).__name__}")
+                    stats["retries"] += 1
+                    await asyncio.sleep(_retry_delay(attempt, None))
+    except (asyncio.CancelledError, GeneratorExit):
+        # Consumer went away (client disconnect); leaving client.stream() closed the upstream request
+        stats["stream_cancelled"] += 1
+        raise
+
+    text = "".join(parts)
+    if not text:
+        stats["failures"] += 1
+        raise HTTPException(status_code=502, detail="Failed to generate report from AI")
+
+    latency_ms = (time.monotonic() - started) * 1000
+    ttft_ms = (first_token_at - started) * 1000
+    completion = AICompletion(
+        text=text,
+        model=payload["model"],
+        prompt_tokens=usage.get("prompt_tokens") or 0,
+        completion_tokens=usage.get("completion_tokens") or 0,
+        latency_ms=latency_ms,
+    )
+    stats["calls"] += 1
+    stats["stream_calls"] += 1
+    stats["prompt_tokens"] += completion.prompt_tokens
+    stats["completion_tokens"] += completion.completion_tokens
+    stats["latency_ms_total"] += latency_ms
+    stats["ttft_ms_total"] += ttft_ms
+    stats["ttft_ms_last"] = ttft_ms
+    AI_TIME_TO_FIRST_TOKEN.observe(ttft_ms / 1000)
+    OUTBOUND_DURATION.labels("ai_stream", "ok").observe(latency_ms / 1000)
+    log.info("AI stream: model=%s ttft=%.0fms latency=%.0fms", completion.model, ttft_ms, latency_ms)
+    _completion_cache.set(key, replace(completion, cached=True))
+
+
+def get_ai_stats() -> dict:
+    return {
+        **stats,
+        "avg_latency_ms": round(stats["latency_ms_total"] / stats["calls"], 1) if stats["calls"] else 0.0,
+        "avg_ttft_ms": round(stats["ttft_ms_total"] / stats["stream_calls"], 1) if stats["stream_calls"] else 0.0,
+        "max_concurrency": settings.AI_MAX_CONCURRENCY,
+    }
@@ -16,6 +16,7 @@ from email.utils import formataddr
 import httpx
 
 from app.config import settings
+from app.metrics import observe_outbound
 
 log = logging.getLogger(__name__)
 
@@ -78,11 +79,13 @@ def _send_via_smtp(to: str, subject: str, html: str, text: str | None) -> None:
 
 def send_email(to: str, subject: str, html: str, text: str | None = None) -> None:
     if _resend_configured():
-        _send_via_resend(to, subject, html, text)
+        with observe_outbound("email"):
+            _send_via_resend(to, subject, html, text)
         return
 
     if _smtp_configured():
-        _send_via_smtp(to, subject, html, text)
+        with observe_outbound("email"):
+            _send_via_smtp(to, subject, html, text)
         return
 
     log.warning(
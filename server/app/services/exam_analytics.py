@@ -0,0 +1,242 @@
+"""
+Аналитика экзамена по заданиям.
+
+Все результаты экзамена загружаются одним запросом в матрицу баллов
+(ученики × задания, NumPy). По ней считаются: доля решения и распределение
+баллов по каждому заданию, индекс дискриминации (верхние 27% против нижних 27%
+по первичному баллу), освоение тем и доля преодолевших порог.
+
+answers[i] — балл за задание i + 1 предмета, максимум — subject.tasks[i].maxScore
+(если он не задан — лучший балл за задание среди результатов).
+Пустой ответ считается как 0 баллов (так же считает первичный балл CRM).
+
+Результат кэшируется на экзамен; кэш сбрасывается при изменении результатов
+или настроек экзамена (app/routers/exams.py) и целиком — при
+изменении предмета (app/routers/subjects.py).
+"""
+import uuid
+
+import numpy as np
+from fastapi import HTTPException
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import selectinload
+
+from app.cache import TTLCache
+from app.models.exam import Exam, ExamResult
+
+# Same default as the CRM grid when the subject has no task list
+DEFAULT_TASK_COUNT = 27
+# Share of students in the upper/lower groups of the discrimination index
+DISCRIMINATION_GROUP = 0.27
+
+# Invalidation is explicit; the TTL only bounds staleness after out-of-band DB edits
+_analytics_cache = TTLCache(ttl_seconds=3600, max_entries=500)
+
+
+def invalidate_exam_analytics(*exam_ids: uuid.UUID) -> None:
+    for exam_id in exam_ids:
+        _analytics_cache.invalidate(exam_id)
+
+
+def invalidate_all_exam_analytics() -> None:
+    """Subject edits change max scores and topics of every exam of the subject."""
+    _analytics_cache.clear()
+
+
+def task_max_scores(subject_tasks: list | None, task_count: int, answer_key: dict | None = None) -> np.ndarray:
+    """
+    Max points per task: subject.tasks[i].maxScore, overridden by the answer key's max_score.
+    np.inf where neither is known — such scores are taken as entered.
+    """
+    max_scores = np.full(task_count, np.inf)
+    for i, task in enumerate((subject_tasks or [])[:task_count]):
+        if isinstance(task, dict) and task.get("maxScore"):
+            max_scores[i] = task["maxScore"]
+    for number, task in (answer_key or {}).items():
+        index = int(number) - 1
+        if 0 <= index < task_count and task.get("max_score"):
+            max_scores[index] = task["max_score"]
+    return max_scores
+
+
+def _score_matrix(answers: list[list | None], task_count: int) -> np.ndarray:
+    """Students × tasks; missing and empty answers are 0."""
+    matrix = np.zeros((len(answers), task_count))
+    for row, values in enumerate(answers):
+        if not values:
+            continue
+        values = [v if isinstance(v, (int, float)) else 0 for v in values[:task_count]]
+        matrix[row, :len(values)] = values
+    return matrix
+
+
+def _bounded_scores(answers: list[list | None], subject_tasks: list | None, task_count: int) -> tuple[np.ndarray, np.ndarray]:
+    """Score matrix clipped to the task max scores, and those max scores."""
+    scores = np.maximum(_score_matrix(answers, task_count), 0)
+    max_scores = task_max_scores(subject_tasks, task_count)
+    unknown = np.isinf(max_scores)
+    # No declared max: the best score anyone got on the task
+    max_scores[unknown] = np.maximum(scores[:, unknown].max(axis=0, initial=1), 1)
+    return np.minimum(scores, max_scores), max_scores
+
+
+def _topic_tasks(task_topics: dict | None, subject_topics: list | None, task_count: int) -> dict[str, list[int]]:
+    """Topic → 0-based task indexes: the exam's own topics, else the subject's."""
+    topics: dict[str, list[int]] = {}
+    if task_topics:
+        for number, names in task_topics.items():
+            if not str(number).isdigit():
+                continue
+            for name in names or []:
+                topics.setdefault(name, []).append(int(number) - 1)
+    else:
+        for item in subject_topics or []:
+            if isinstance(item, dict) and item.get("topic"):
+                topics[item["topic"]] = [int(n) - 1 for n in item.get("taskNumbers") or []]
+    return {
+        name: sorted({i for i in indexes if 0 <= i < task_count})
+        for name, indexes in topics.items()
+        if any(0 <= i < task_count for i in indexes)
+    }
+
+
+def _task_count(answers: list[list | None], subject_tasks: list | None) -> int:
+    longest = max((len(a) for a in answers if a), default=0)
+    return max(len(subject_tasks or []), longest) or DEFAULT_TASK_COUNT
+
+
+def _mastery(scores: np.ndarray, max_scores: np.ndarray, topic_tasks: dict[str, list[int]]) -> np.ndarray:
+    """Rows × topics: earned / possible over each topic's tasks."""
+    incidence = np.zeros((len(topic_tasks), scores.shape[1]))
+    for row, indexes in enumerate(topic_tasks.values()):
+        incidence[row, indexes] = 1
+    possible = incidence @ max_scores
+    earned = scores @ incidence.T
+    return np.divide(earned, possible, out=np.zeros_like(earned), where=possible > 0)
+
+
+def result_topic_mastery(
+    answers: list[list | None],
+    *,
+    subject_tasks: list | None = None,
+    subject_topics: list | None = None,
+    task_topics: dict | None = None,
+) -> tuple[list[str], np.ndarray]:
+    """Topic names and the results × topics mastery matrix (0..1) of one exam's results."""
+    task_count = _task_count(answers, subject_tasks)
+    scores, max_scores = _bounded_scores(answers, subject_tasks, task_count)
+    topic_tasks = _topic_tasks(task_topics, subject_topics, task_count)
+    return list(topic_tasks), _mastery(scores, max_scores, topic_tasks)
+
+
+def compute_exam_analytics(
+    answers: list[list | None],
+    final_scores: list[float],
+    *,
+    subject_tasks: list | None = None,
+    subject_topics: list | None = None,
+    selected_tasks: list[int] | None = None,
+    task_topics: dict | None = None,
+    threshold_score: int | None = None,
+) -> dict:
+    task_count = _task_count(answers, subject_tasks)
+    scores, max_scores = _bounded_scores(answers, subject_tasks, task_count)
+    students = scores.shape[0]
+
+    covered = {n - 1 for n in selected_tasks or [] if 1 <= n <= task_count}
+    task_indexes = sorted(covered) if covered else list(range(task_count))
+
+    # Normalized to 0..1 per task so tasks with different max scores compare
+    normalized = scores / max_scores
+    totals = scores.sum(axis=1)
+    solve_rate = normalized.mean(axis=0) if students else np.zeros(task_count)
+    full_rate = (scores == max_scores).mean(axis=0) if students else np.zeros(task_count)
+
+    group_size = int(np.floor(students * DISCRIMINATION_GROUP))
+    discrimination = None
+    if group_size >= 1:
+        order = np.argsort(totals, kind="stable")
+        discrimination = normalized[order[-group_size:]].mean(axis=0) - normalized[order[:group_size]].mean(axis=0)
+
+    labels = [
+        str(task.get("label")) if isinstance(task, dict) and task.get("label") else str(i + 1)
+        for i, task in enumerate((subject_tasks or [])[:task_count])
+    ]
+    labels += [str(i + 1) for i in range(len(labels), task_count)]
+
+    tasks = []
+    for i in task_indexes:
+        max_score = int(max_scores[i])
+        distribution = np.bincount(np.rint(scores[:, i]).astype(int), minlength=max_score + 1)
+        tasks.append({
+            "task_number": i + 1,
+            "label": labels[i],
+            "max_score": max_score,
+            "mean_score": round(float(scores[:, i].mean()), 2) if students else 0.0,
+            "solve_rate": round(float(solve_rate[i]), 3),
+            "full_solve_rate": round(float(full_rate[i]), 3),
+            "discrimination": round(float(discrimination[i]), 3) if discrimination is not None else None,
+            "score_distribution": distribution[:max_score + 1].tolist(),
+        })
+
+    topics = []
+    topic_tasks = _topic_tasks(task_topics, subject_topics, task_count)
+    if topic_tasks and students:
+        names = list(topic_tasks)
+        # Every student has the same possible score, so the mean of per-student mastery is the cohort's
+        mastery = _mastery(scores, max_scores, topic_tasks).mean(axis=0)
+        topics = [
+            {"topic": name, "task_numbers": [i + 1 for i in topic_tasks[name]], "mastery": round(float(m), 3)}
+            for name, m in sorted(zip(names, mastery), key=lambda item: item[1])
+        ]
+
+    finals = np.asarray(final_scores, dtype=float)
+    pass_rate = None
+    if threshold_score is not None and students:
+        # Same rule as the student portal: int(final_score) >= threshold
+        pass_rate = round(float((np.trunc(finals) >= threshold_score).mean()), 3)
+
+    return {
+        "students_count": students,
+        "mean_primary_score": round(float(totals.mean()), 2) if students else 0.0,
+        "median_primary_score": float(np.median(totals)) if students else 0.0,
+        "mean_final_score": round(float(finals.mean()), 2) if students else 0.0,
+        "max_primary_score": int(max_scores[task_indexes].sum()),
+        "threshold_score": threshold_score,
+        "threshold_pass_rate": pass_rate,
+        "tasks": tasks,
+        "topics": topics,
+    }
+
+
+async def get_exam_analytics(db: AsyncSession, exam_id: uuid.UUID) -> dict:
+    cached = _analytics_cache.get(exam_id)
+    if cached is not None:
+        return cached
+
+    exam = (await db.execute(
+        select(Exam).options(selectinload(Exam.subject_rel)).where(Exam.id == exam_id)
+    )).scalar_one_or_none()
+    if not exam:
+        raise HTTPException(status_code=404, detail="Exam not found")
+
+    rows = (await db.execute(
+        select(ExamResult.answers, ExamResult.final_score).where(ExamResult.exam_id == exam_id)
+    )).all()
+
+    subject = exam.subject_rel
+    analytics = {
+        "exam_id": exam.id,
+        **compute_exam_analytics(
+            [row.answers if isinstance(row.answers, list) else None for row in rows],
+            [row.final_score for row in rows],
+            subject_tasks=subject.tasks if subject else None,
+            subject_topics=subject.topics if subject else None,
+            selected_tasks=exam.selected_tasks if isinstance(exam.selected_tasks, list) else None,
+            task_topics=exam.task_topics if isinstance(exam.task_topics, dict) else None,
+            threshold_score=exam.threshold_score,
+        ),
+    }
+    _analytics_cache.set(exam_id, analytics)
+    return analytics
@@ -0,0 +1,128 @@
+"""
+Запись на слоты экзаменов без овербукинга.
+
+Место занимается одним условным UPDATE:
+    UPDATE exam_time_slots SET registered_count = registered_count + 1
+    WHERE id = :slot AND registered_count < total_seats RETURNING ...
+поэтому при наплыве сотен записей за секунды мест выдаётся ровно total_seats.
+Повторная запись отсекается уникальным (student_id, time_slot_id).
+
+Лист ожидания (slot.waitlist_enabled): когда мест нет, запись создаётся со
+статусом waitlisted. При отмене занятой записи место под блокировкой строки
+слота передаётся первому в очереди, а если очереди нет — освобождается.
+"""
+import uuid
+
+from fastapi import HTTPException
+from sqlalchemy import select, update, delete
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models.exam import Exam
+from app.models.exam_portal import ExamPortalSession, ExamTimeSlot, ExamRegistration, RegistrationStatus
+
+
+async def _take_seat(db: AsyncSession, slot_id: uuid.UUID) -> bool:
+    result = await db.execute(
+        update(ExamTimeSlot)
+        .where(ExamTimeSlot.id == slot_id, ExamTimeSlot.registered_count < ExamTimeSlot.total_seats)
+        .values(registered_count=ExamTimeSlot.registered_count + 1)
+        .returning(ExamTimeSlot.id)
+    )
+    return result.first() is not None
+
+
+async def reserve_seat(
+    db: AsyncSession,
+    slot_id: uuid.UUID,
+    student_id: uuid.UUID,
+    subject_id: uuid.UUID | None = None,
+) -> tuple[uuid.UUID, RegistrationStatus]:
+    """Register a student for a slot. Returns (registration id, status). Commits."""
+    slot_result = await db.execute(
+        select(ExamTimeSlot.waitlist_enabled, Exam.is_registration_open)
+        .join(ExamPortalSession, ExamPortalSession.id == ExamTimeSlot.session_id)
+        .join(Exam, Exam.id == ExamPortalSession.exam_id)
+        .where(ExamTimeSlot.id == slot_id)
+    )
+    slot = slot_result.first()
+    if slot is None:
+        raise HTTPException(status_code=404, detail="Слот не найден")
+    if not slot.is_registration_open:
+        raise HTTPException(status_code=400, detail="Запись на этот экзамен закрыта")
+
+    status = RegistrationStatus.registered
+    if not await _take_seat(db, slot_id):
+        if not slot.waitlist_enabled:
+            await db.rollback()
+            raise HTTPException(status_code=400, detail="Нет свободных мест")
+        # Serialize with cancellations: a seat freed right now must not be missed
+        # while we join the queue (cancel_registration holds the same row lock)
+        await db.execute(select(ExamTimeSlot.id).where(ExamTimeSlot.id == slot_id).with_for_update())
+        if not await _take_seat(db, slot_id):
+            status = RegistrationStatus.waitlisted
+
+    reg_id = (await db.execute(
+        pg_insert(ExamRegistration)
+        .values(
+            id=uuid.uuid4(),
+            student_id=student_id,
+            time_slot_id=slot_id,
+            subject_id=subject_id,
+            status=status.value,
+        )
+        .on_conflict_do_nothing(constraint="uq_exam_registrations_student_slot")
+        .returning(ExamRegistration.id)
+    )).scalar_one_or_none()
+    if reg_id is None:
+        # Rolls back the seat taken above
+        await db.rollback()
+        raise HTTPException(status_code=400, detail="Вы уже записаны на этот слот")
+
+    await db.commit()
+    return reg_id, status
+
+
+async def release_registration(db: AsyncSession, reg_id: uuid.UUID, student_id: uuid.UUID | None = None) -> None:
+    """
+    Delete a registration; a freed seat goes to the first waitlisted student, if any.
+    student_id limits the deletion to that student's own registration. Commits.
+    """
+    query = delete(ExamRegistration).where(ExamRegistration.id == reg_id)
+    if student_id is not None:
+        query = query.where(ExamRegistration.student_id == student_id)
+    deleted = (await db.execute(
+        query.returning(ExamRegistration.time_slot_id, ExamRegistration.status)
+    )).first()
+    if deleted is None:
+        raise HTTPException(status_code=404, detail="Запись не найдена")
+
+    if deleted.status == RegistrationStatus.registered.value:
+        await db.execute(
+            select(ExamTimeSlot.id).where(ExamTimeSlot.id == deleted.time_slot_id).with_for_update()
+        )
+        next_in_line = (await db.execute(
+            select(ExamRegistration.id)
+            .where(
+                ExamRegistration.time_slot_id == deleted.time_slot_id,
+                ExamRegistration.status == RegistrationStatus.waitlisted.value,
+            )
+            .order_by(ExamRegistration.registered_at, ExamRegistration.id)
+            .limit(1)
+            .with_for_update(skip_locked=True)
+        )).scalar_one_or_none()
+        if next_in_line is not None:
+            # The seat changes hands, registered_count stays the same
+            await db.execute(
+                update(ExamRegistration)
+                .where(ExamRegistration.id == next_in_line)
+                .values(status=RegistrationStatus.registered.value)
+            )
+        else:
+            await db.execute(
+                update(ExamTimeSlot)
+                .where(ExamTimeSlot.id == deleted.time_slot_id, ExamTimeSlot.registered_count > 0)
+                .values(registered_count=ExamTimeSlot.registered_count - 1)
+            )
+
+    await db.commit()
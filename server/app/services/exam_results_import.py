@@ -0,0 +1,361 @@
+"""
+Массовый ввод результатов экзамена: сетка группы целиком и импорт CSV/XLSX.
+
+Экзамен, доступ и шкала проверяются один раз на пакет. Строки проверяются по
+отдельности: ошибка строки (ученик не найден, повтор, балл вне диапазона)
+попадает в отчёт и не мешает сохранить остальные. Баллы считаются движком
+services/exam_scoring.py, запись — многострочным INSERT ... ON CONFLICT
+(exam_id, student_id) DO UPDATE пачками по _UPSERT_CHUNK.
+
+Файл читается построчно (csv.reader / openpyxl read_only) без загрузки в
+память целиком. Ученик находится по логину портала или по имени
+("Фамилия Имя" в любом порядке; при тёзках — среди учеников группы экзамена).
+Колонки заданий — "1", "Задание 1", "Task 1": для заданий из ключа ответов
+это ответ ученика, для остальных — балл.
+"""
+import csv
+import io
+import re
+import uuid
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+
+import numpy as np
+from openpyxl import load_workbook
+from sqlalchemy import select, func, or_, null, literal_column
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models.employee import Employee
+from app.models.exam import Exam, ExamResult
+from app.models.group import GroupStudent
+from app.models.student import Student
+from app.models.subject import Subject
+from app.services.exam_analytics import invalidate_exam_analytics, task_max_scores
+from app.services.exam_scoring import convert_primary_scores, score_batch
+from app.services.student_progress import invalidate_student_progress
+
+_UPSERT_CHUNK = 500
+
+_HEADER_ALIASES = {
+    "login": {"login", "portal_login", "логин"},
+    "name": {"name", "student", "ученик", "студент", "фио"},
+    "last_name": {"last_name", "фамилия"},
+    "first_name": {"first_name", "имя"},
+    "primary_score": {"primary", "primary_score", "первичный", "первичный балл"},
+    "final_score": {"final", "final_score", "итоговый", "итоговый балл", "оценка"},
+    "student_comment": {"comment", "комментарий"},
+}
+_TASK_HEADER = re.compile(r"^(?:задание|task|№)?\s*(\d+)$")
+
+
+@dataclass
+class ResultRow:
+    row: int  # position in the grid / line of the file, for error reports
+    student_id: uuid.UUID | None = None
+    student: str | None = None  # how the file named the student
+    answers: list | None = None
+    raw_answers: list | None = None
+    primary_score: int | None = None
+    final_score: float | None = None
+    student_comment: str | None = None
+
+
+@dataclass
+class RowError:
+    row: int
+    student: str | None
+    error: str
+
+
+@dataclass
+class BulkResult:
+    created: int = 0
+    updated: int = 0
+    errors: list[RowError] = field(default_factory=list)
+
+
+def _task_limits(exam: Exam, subject: Subject | None) -> np.ndarray:
+    """Per-task max points exactly as score_batch clips them (inf: no known max); empty if the exam has no task list."""
+    answer_key = exam.answer_key or {}
+    task_count = max(len(subject.tasks or []) if subject else 0, max((int(n) for n in answer_key), default=0))
+    return task_max_scores(subject.tasks if subject else None, task_count, answer_key)
+
+
+def _validate_row(item: ResultRow, limits: np.ndarray) -> str | None:
+    if item.answers is None and item.raw_answers is None and item.primary_score is None:
+        return "Нет баллов"
+    for i, value in enumerate(item.answers or []):
+        if value is None:
+            continue
+        if len(limits) and i >= len(limits):
+            return f"Задания {i + 1} нет в экзамене"
+        limit = limits[i] if i < len(limits) else np.inf
+        if value < 0 or value > limit:
+            return f"Задание {i + 1}: балл {value} вне диапазона 0..{int(limit)}"
+    if item.primary_score is not None and item.primary_score < 0:
+        return "Отрицательный первичный балл"
+    return None
+
+
+async def upsert_exam_results(
+    db: AsyncSession,
+    exam: Exam,
+    rows: list[ResultRow],
+    current_user: Employee,
+) -> BulkResult:
+    """Validate, score and save a batch of results. Bad rows are reported, not raised. Commits."""
+    outcome = BulkResult()
+    subject = await db.get(Subject, exam.subject_id) if exam.subject_id else None
+    limits = _task_limits(exam, subject)
+
+    ids = {item.student_id for item in rows if item.student_id}
+    known = set()
+    if ids:
+        known = set((await db.execute(select(Student.id).where(Student.id.in_(ids)))).scalars().all())
+
+    valid: list[ResultRow] = []
+    seen: dict[uuid.UUID, int] = {}
+    for item in rows:
+        if item.student_id is None or item.student_id not in known:
+            error = "Ученик не найден"
+        elif item.student_id in seen:
+            error = f"Ученик уже есть в строке {seen[item.student_id]}"
+        else:
+            error = _validate_row(item, limits)
+        if error:
+            outcome.errors.append(RowError(row=item.row, student=item.student or str(item.student_id or ""), error=error))
+            continue
+        seen[item.student_id] = item.row
+        valid.append(item)
+    if not valid:
+        return outcome
+
+    # One scoring pass for every row that has per-task data
+    detailed = [item for item in valid if item.answers is not None or item.raw_answers is not None]
+    if detailed:
+        scored = score_batch(
+            [item.raw_answers for item in detailed],
+            [item.answers for item in detailed],
+            answer_key=exam.answer_key,
+            subject=subject,
+        )
+        for item, answers, primary, final in zip(detailed, scored.answers, scored.primary_scores, scored.final_scores):
+            item.answers, item.primary_score, item.final_score = answers, primary, final
+    totals_only = [item for item in valid if item.final_score is None]
+    if totals_only:
+        finals = convert_primary_scores(np.array([item.primary_score for item in totals_only]), subject)
+        for item, final in zip(totals_only, finals):
+            item.final_score = float(final)
+
+    now = datetime.now(timezone.utc)
+    values = [
+        {
+            "id": uuid.uuid4(),
+            "exam_id": exam.id,
+            "student_id": item.student_id,
+            # null() — SQL NULL, so COALESCE keeps stored values; None would be JSON null
+            "answers": item.answers if item.answers is not None else null(),
+            "raw_answers": item.raw_answers if item.raw_answers is not None else null(),
+            "primary_score": item.primary_score,
+            "final_score": item.final_score,
+            "student_comment": item.student_comment,
+            "added_by": current_user.id,
+            "added_by_first_name": current_user.first_name,
+            "added_by_last_name": current_user.last_name,
+            "added_at": now,
+        }
+        for item in valid
+    ]
+    for start in range(0, len(values), _UPSERT_CHUNK):
+        stmt = pg_insert(ExamResult).values(values[start:start + _UPSERT_CHUNK])
+        stmt = stmt.on_conflict_do_update(
+            constraint="uq_exam_results_exam_student",
+            set_={
+                # Totals-only rows drop stale per-task scores
+                "answers": stmt.excluded.answers,
+                "raw_answers": func.coalesce(stmt.excluded.raw_answers, ExamResult.raw_answers),
+                "primary_score": stmt.excluded.primary_score,
+                "final_score": stmt.excluded.final_score,
+                "student_comment": func.coalesce(stmt.excluded.student_comment, ExamResult.student_comment),
+                "updated_at": now,
+            },
+        )
+        # xmax = 0 only for freshly inserted rows
+        inserted = (await db.execute(stmt.returning(literal_column("xmax = 0")))).scalars().all()
+        created = sum(1 for flag in inserted if flag)
+        outcome.created += created
+        outcome.updated += len(inserted) - created
+    await db.commit()
+
+    invalidate_exam_analytics(exam.id)
+    # Ranks of the whole cohort may move
+    cohort = (await db.execute(select(ExamResult.student_id).where(ExamResult.exam_id == exam.id))).scalars().all()
+    invalidate_student_progress(*cohort)
+    return outcome
+
+
+# ── File import ───────────────────────────────────────────────────────────────
+
+def _cell_text(value) -> str:
+    if value is None:
+        return ""
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)
+    return str(value).strip()
+
+
+def _iter_file_rows(fileobj, file_name: str):
+    """Yield (line number, cells) one row at a time."""
+    if file_name.lower().endswith(".xlsx"):
+        workbook = load_workbook(fileobj, read_only=True, data_only=True)
+        try:
+            for line, cells in enumerate(workbook.active.iter_rows(values_only=True), 1):
+                yield line, [_cell_text(v) for v in cells]
+        finally:
+            workbook.close()
+        return
+    text = io.TextIOWrapper(fileobj, encoding="utf-8-sig", newline="")
+    try:
+        sample = text.read(4096)
+        text.seek(0)
+        try:
+            dialect = csv.Sniffer().sniff(sample, delimiters=",;\t")
+        except csv.Error:
+            dialect = csv.excel
+        for line, cells in enumerate(csv.reader(text, dialect), 1):
+            yield line, [c.strip() for c in cells]
+    finally:
+        text.detach()
+
+
+def _map_header(cells: list[str]) -> tuple[dict[str, int], dict[int, int]]:
+    """Columns of known fields and task columns (column index → task number)."""
+    columns: dict[str, int] = {}
+    tasks: dict[int, int] = {}
+    for index, cell in enumerate(cells):
+        header = cell.lower().replace("ё", "е").strip()
+        match = _TASK_HEADER.match(header)
+        if match:
+            tasks[index] = int(match.group(1))
+            continue
+        for name, aliases in _HEADER_ALIASES.items():
+            if header in aliases and name not in columns:
+                columns[name] = index
+    return columns, tasks
+
+
+def _name_key(*parts: str) -> str:
+    return " ".join(" ".join(parts).lower().replace("ё", "е").split())
+
+
+def parse_result_file(fileobj, file_name: str, exam: Exam) -> tuple[list[tuple[ResultRow, str | None, str | None]], list[RowError]]:
+    """
+    Read the file into rows. Returns (row, login, name) triples for student matching
+    and errors of rows that couldn't be parsed. Blocking — run in a thread.
+    """
+    auto_tasks = {
+        int(number) for number, task in (exam.answer_key or {}).items()
+        if task.get("rule") != "manual"
+    }
+    parsed: list[tuple[ResultRow, str | None, str | None]] = []
+    errors: list[RowError] = []
+    columns: dict[str, int] | None = None
+    tasks: dict[int, int] = {}
+
+    def cell(cells: list[str], name: str) -> str:
+        index = columns.get(name)
+        return cells[index] if index is not None and index < len(cells) else ""
+
+    for line, cells in _iter_file_rows(fileobj, file_name):
+        if not any(cells):
+            continue
+        if columns is None:
+            columns, tasks = _map_header(cells)
+            if "login" not in columns and "name" not in columns and "last_name" not in columns:
+                errors.append(RowError(row=line, student=None, error="Нет колонки с логином или именем ученика"))
+                return parsed, errors
+            continue
+
+        login = cell(cells, "login") or None
+        name = cell(cells, "name") or _name_key(cell(cells, "last_name"), cell(cells, "first_name")) or None
+        item = ResultRow(row=line, student=login or name)
+        try:
+            if tasks:
+                task_count = max(tasks.values())
+                answers: list = [None] * task_count
+                raw: list = [None] * task_count
+                for index, number in tasks.items():
+                    value = cells[index] if index < len(cells) else ""
+                    if not value:
+                        continue
+                    if number in auto_tasks:
+                        raw[number - 1] = value
+                    else:
+                        answers[number - 1] = int(float(value.replace(",", ".")))
+                item.answers = answers if any(v is not None for v in answers) else None
+                item.raw_answers = raw if any(v is not None for v in raw) else None
+            if cell(cells, "primary_score"):
+                item.primary_score = int(float(cell(cells, "primary_score").replace(",", ".")))
+            if cell(cells, "final_score"):
+                item.final_score = float(cell(cells, "final_score").replace(",", "."))
+        except ValueError:
+            errors.append(RowError(row=line, student=item.student, error="Балл должен быть числом"))
+            continue
+        item.student_comment = cell(cells, "student_comment") or None
+        parsed.append((item, login, name))
+    return parsed, errors
+
+
+async def resolve_students(
+    db: AsyncSession,
+    exam: Exam,
+    parsed: list[tuple[ResultRow, str | None, str | None]],
+) -> tuple[list[ResultRow], list[RowError]]:
+    """Fill student_id by portal login or name with one lookup query. Ambiguous names become errors."""
+    logins = {login for _, login, _ in parsed if login}
+    name_keys = set()
+    for _, login, name in parsed:
+        if not login and name:
+            tokens = _name_key(name).split()
+            if len(tokens) >= 2:
+                # "Фамилия Имя [Отчество]" or "Имя Фамилия"
+                name_keys.update({f"{tokens[0]} {tokens[1]}", f"{tokens[1]} {tokens[0]}"})
+
+    student_name = func.replace(func.lower(func.concat(Student.last_name, " ", Student.first_name)), "ё", "е")
+    by_login: dict[str, uuid.UUID] = {}
+    by_name: dict[str, list[uuid.UUID]] = {}
+    if logins or name_keys:
+        result = await db.execute(
+            select(Student.id, Student.portal_login, student_name.label("name_key"))
+            .where(or_(Student.portal_login.in_(logins), student_name.in_(name_keys)))
+        )
+        for row in result.all():
+            if row.portal_login in logins:
+                by_login[row.portal_login] = row.id
+            by_name.setdefault(row.name_key, []).append(row.id)
+
+    group_members: set[uuid.UUID] = set()
+    if exam.group_id:
+        group_members = set((await db.execute(
+            select(GroupStudent.student_id).where(GroupStudent.group_id == exam.group_id)
+        )).scalars().all())
+
+    rows, errors = [], []
+    for item, login, name in parsed:
+        rows.append(item)
+        if login:
+            item.student_id = by_login.get(login)
+            continue
+        tokens = _name_key(name or "").split()
+        if len(tokens) < 2:
+            continue
+        candidates = set(by_name.get(f"{tokens[0]} {tokens[1]}", [])) | set(by_name.get(f"{tokens[1]} {tokens[0]}", []))
+        if len(candidates) > 1 and group_members:
+            candidates = (candidates & group_members) or candidates
+        if len(candidates) > 1:
+            rows.pop()
+            errors.append(RowError(row=item.row, student=name, error="Несколько учеников с таким именем — укажите логин"))
+            continue
+        item.student_id = next(iter(candidates), None)
+    return rows, errors
@@ -0,0 +1,246 @@
+"""
+Автоматическая проверка экзамена по ключу ответов.
+
+Ключ хранится в exams.answer_key: {"<номер задания>": {"answer", "max_score",
+"rule"}}. Правила частичного зачёта:
+  exact        — полный балл при совпадении с одним из вариантов ("12|21")
+  unordered    — совпадение набора символов без учёта порядка
+  one_error    — полный балл без ошибок, на 1 меньше при одной ошибке
+  per_element  — по баллу за каждый верный символ на своём месте
+  manual       — не проверяется автоматически, балл ставит учитель (answers)
+
+Сырые ответы ученика хранятся в exam_results.raw_answers (raw_answers[i] —
+задание i + 1). Пачка работ считается матрицей (ученики × задания):
+первичный балл — сумма строк, итоговый — перевод по шкале предмета
+(ЕГЭ — primary_to_secondary_scale, ОГЭ — grade_scale), так же, как в CRM.
+
+При исправлении ключа все результаты экзамена пересчитываются одним bulk
+UPDATE. Пересчёт экзаменов предмета после правки шкалы — отдельное действие
+администратора (POST /subjects/{id}/rescore-exams), затрагивает только
+экзамены с ключом и, по желанию, только начиная с даты. Кэши аналитики и
+прогресса сбрасываются после коммита (invalidate_rescored).
+"""
+import uuid
+from dataclasses import dataclass, field
+from datetime import date
+
+import numpy as np
+from sqlalchemy import select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models.exam import Exam, ExamResult
+from app.models.subject import Subject
+from app.services.exam_analytics import DEFAULT_TASK_COUNT, invalidate_exam_analytics, task_max_scores
+from app.services.student_progress import invalidate_student_progress
+
+RULES = ("exact", "unordered", "one_error", "per_element", "manual")
+
+# Subjects without a scale: same fallback as the CRM result grid
+_FALLBACK_FACTOR = 3.7
+
+
+@dataclass(frozen=True)
+class ScoredBatch:
+    answers: list[list[int | None]]
+    primary_scores: list[int]
+    final_scores: list[float]
+
+
+@dataclass
+class Rescored:
+    count: int = 0
+    exam_ids: list[uuid.UUID] = field(default_factory=list)
+    student_ids: set[uuid.UUID] = field(default_factory=set)
+
+
+def normalize_answer(value) -> str:
+    if value is None:
+        return ""
+    return str(value).strip().upper().replace(" ", "").replace(",", ".").replace("Ё", "Е")
+
+
+def _variants(answer: str | None) -> list[str]:
+    return [v for v in (normalize_answer(part) for part in str(answer or "").split("|")) if v]
+
+
+def _edit_distance(a: str, b: str) -> int:
+    previous = list(range(len(b) + 1))
+    for i, ca in enumerate(a, 1):
+        current = [i]
+        for j, cb in enumerate(b, 1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (ca != cb)))
+        previous = current
+    return previous[-1]
+
+
+def _score_cell(given: str, variants: list[str], rule: str, max_score: int) -> int:
+    if not given:
+        return 0
+    if rule == "unordered":
+        return max_score if any(sorted(given) == sorted(v) for v in variants) else 0
+    if rule == "one_error":
+        errors = min(_edit_distance(given, v) for v in variants)
+        return max_score if errors == 0 else max(0, max_score - 1) if errors == 1 else 0
+    if rule == "per_element":
+        return min(max_score, max(sum(g == c for g, c in zip(given, v)) for v in variants))
+    return max_score if given in variants else 0
+
+
+def _score_column(column: np.ndarray, task: dict) -> np.ndarray:
+    """Score one task for every student; column holds normalized answers."""
+    variants = _variants(task.get("answer"))
+    max_score = int(task.get("max_score") or 1)
+    if not variants:
+        return np.zeros(len(column))
+    rule = task.get("rule") or "exact"
+    if rule == "exact":
+        return np.isin(column, variants) * max_score
+    return np.array([_score_cell(given, variants, rule, max_score) for given in column], dtype=float)
+
+
+def convert_primary_scores(primary: np.ndarray, subject: Subject | None) -> np.ndarray:
+    """Primary → final score for a whole vector of primary scores."""
+    primary = np.asarray(primary, dtype=int)
+    scale = subject.primary_to_secondary_scale if subject else None
+    grades = subject.grade_scale if subject else None
+    if subject and subject.exam_type == "ЕГЭ" and isinstance(scale, list) and scale:
+        table = np.asarray(scale, dtype=float)
+        # Past the end of the scale → its last value
+        return table[np.clip(primary, 0, len(table) - 1)]
+    if subject and subject.exam_type == "ОГЭ" and isinstance(grades, list) and grades:
+        final = np.zeros(len(primary))
+        assigned = np.zeros(len(primary), dtype=bool)
+        # First matching range wins
+        for item in grades:
+            hit = ~assigned & (primary >= item["min"]) & (primary <= item["max"])
+            final[hit] = item["grade"]
+            assigned |= hit
+        return final
+    return np.minimum(100, np.floor(primary * _FALLBACK_FACTOR + 0.5))
+
+
+def score_batch(
+    raw_answers: list[list | None],
+    manual_answers: list[list | None],
+    *,
+    answer_key: dict | None,
+    subject: Subject | None,
+) -> ScoredBatch:
+    """
+    Score a batch of submissions of one exam at once.
+    raw_answers[s] — the student's answers (None: nothing to check automatically),
+    manual_answers[s] — teacher-entered scores, used for tasks the key doesn't check.
+    """
+    answer_key = answer_key or {}
+    students = len(raw_answers)
+    key_count = max((int(n) for n in answer_key), default=0)
+    longest = max((len(a) for a in [*raw_answers, *manual_answers] if a), default=0)
+    task_count = max(len(subject.tasks or []) if subject else 0, key_count, longest) or DEFAULT_TASK_COUNT
+    max_scores = task_max_scores(subject.tasks if subject else None, task_count, answer_key)
+
+    # NaN marks "no score" so it survives into answers as null
+    scores = np.full((students, task_count), np.nan)
+    for row, values in enumerate(manual_answers):
+        for i, value in enumerate((values or [])[:task_count]):
+            if isinstance(value, (int, float)):
+                scores[row, i] = value
+
+    has_raw = np.array([raw is not None for raw in raw_answers], dtype=bool)
+    if answer_key and has_raw.any():
+        raw = np.full((students, task_count), "", dtype=object)
+        for row, values in enumerate(raw_answers):
+            for i, value in enumerate((values or [])[:task_count]):
+                raw[row, i] = normalize_answer(value)
+        for number, task in answer_key.items():
+            index = int(number) - 1
+            if not 0 <= index < task_count or task.get("rule") == "manual":
+                continue
+            scores[has_raw, index] = _score_column(raw[has_raw, index], task)
+
+    # Tasks without a known max keep the teacher's score as entered
+    scores = np.clip(scores, 0, max_scores)
+    primary = np.nansum(scores, axis=1).astype(int)
+    final = convert_primary_scores(primary, subject)
+    return ScoredBatch(
+        answers=[[None if np.isnan(v) else int(v) for v in row] for row in scores],
+        primary_scores=primary.tolist(),
+        final_scores=final.tolist(),
+    )
+
+
+async def load_exam_for_scoring(db: AsyncSession, exam_id: uuid.UUID) -> tuple[Exam, Subject | None] | None:
+    exam = await db.get(Exam, exam_id)
+    if exam is None:
+        return None
+    subject = await db.get(Subject, exam.subject_id) if exam.subject_id else None
+    return exam, subject
+
+
+async def rescore_exam(db: AsyncSession, exam_id: uuid.UUID) -> Rescored:
+    """Re-score every result of the exam with the current key and scale. Caller commits, then invalidates."""
+    rescored = Rescored()
+    loaded = await load_exam_for_scoring(db, exam_id)
+    if loaded is None:
+        return rescored
+    exam, subject = loaded
+    rows = (await db.execute(
+        select(ExamResult.id, ExamResult.student_id, ExamResult.raw_answers, ExamResult.answers, ExamResult.primary_score)
+        .where(ExamResult.exam_id == exam_id)
+    )).all()
+    if not rows:
+        return rescored
+
+    scored = score_batch(
+        [row.raw_answers if isinstance(row.raw_answers, list) else None for row in rows],
+        [row.answers if isinstance(row.answers, list) else None for row in rows],
+        answer_key=exam.answer_key,
+        subject=subject,
+    )
+    params = []
+    for row, answers, primary, final in zip(rows, scored.answers, scored.primary_scores, scored.final_scores):
+        if row.raw_answers is None and row.answers is None:
+            # Only a hand-typed primary score — convert it, nothing to re-check
+            primary = row.primary_score
+            final = float(convert_primary_scores(np.array([primary]), subject)[0])
+            answers = None
+        params.append({"id": row.id, "answers": answers, "primary_score": primary, "final_score": final})
+
+    # Bulk UPDATE by primary key — one executemany
+    await db.execute(update(ExamResult), params)
+    rescored.count = len(params)
+    rescored.exam_ids.append(exam_id)
+    rescored.student_ids.update(row.student_id for row in rows)
+    return rescored
+
+
+async def rescore_subject_exams(
+    db: AsyncSession,
+    subject_id: uuid.UUID,
+    *,
+    date_from: date | None = None,
+) -> Rescored:
+    """
+    Re-score the subject's exams with an answer key after its scale or task max scores changed.
+    Exams dated before date_from (e.g. a past exam year on the old scale) are left as they are.
+    Caller commits, then invalidates.
+    """
+    query = select(Exam.id).where(
+        Exam.subject_id == subject_id,
+        Exam.is_template == False,
+        Exam.answer_key.isnot(None),
+    )
+    if date_from is not None:
+        query = query.where(Exam.date >= date_from)
+    total = Rescored()
+    for exam_id in (await db.execute(query)).scalars().all():
+        rescored = await rescore_exam(db, exam_id)
+        total.count += rescored.count
+        total.exam_ids.extend(rescored.exam_ids)
+        total.student_ids.update(rescored.student_ids)
+    return total
+
+
+def invalidate_rescored(rescored: Rescored) -> None:
+    """Drop analytics and progress caches of re-scored exams. Call after the commit."""
+    invalidate_exam_analytics(*rescored.exam_ids)
+    invalidate_student_progress(*rescored.student_ids)
@@ -0,0 +1,197 @@
+"""
+Локальный дисковый LRU-кэш объектов S3 (аватары, картинки баннеров, файлы чата).
+
+Ключи S3 неизменяемы (в каждом загруженном файле новый uuid), поэтому объект
+достаточно скачать один раз. Файл лежит в FILE_CACHE_DIR под sha256(key),
+рядом — .json с content-type/ETag/Last-Modified из S3. Отдаётся FileResponse
+прямо с диска, без чтения в память. Давность использования — mtime файла
+(обновляется при попадании), поэтому LRU общий для всех воркеров; при превышении
+FILE_CACHE_MAX_MB удаляются самые давно использованные файлы.
+"""
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import time
+import uuid
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from email.utils import formatdate, parsedate_to_datetime
+
+from fastapi import Request
+from fastapi.responses import FileResponse, Response
+
+from app.cache import TTLCache
+from app.config import settings
+from app.s3 import download_to_file
+
+log = logging.getLogger(__name__)
+
+_META_SUFFIX = ".json"
+# After eviction the cache is trimmed to this share of the limit, so it doesn't evict on every miss
+_EVICT_TARGET_RATIO = 0.9
+
+_meta_cache = TTLCache(ttl_seconds=3600, max_entries=4096)
+_locks: dict[str, asyncio.Lock] = {}
+
+stats = {
+    "hits": 0,
+    "misses": 0,
+    "not_modified": 0,
+    "bytes_saved": 0,
+    "evicted_files": 0,
+}
+
+
+@dataclass(frozen=True)
+class CachedFile:
+    path: str
+    size: int
+    content_type: str
+    etag: str
+    last_modified: str  # HTTP-date
+
+
+def _cache_dir() -> str:
+    os.makedirs(settings.FILE_CACHE_DIR, exist_ok=True)
+    return settings.FILE_CACHE_DIR
+
+
+def _paths(key: str) -> tuple[str, str]:
+    name = hashlib.sha256(key.encode()).hexdigest()
+    base = os.path.join(_cache_dir(), name)
+    return base, base + _META_SUFFIX
+
+
+def _load_hit(key: str) -> CachedFile | None:
+    data_path, meta_path = _paths(key)
+    try:
+        size = os.stat(data_path).st_size
+        meta = _meta_cache.get(key)
+        if meta is None:
+            with open(meta_path) as f:
+                meta = json.load(f)
+            _meta_cache.set(key, meta)
+        os.utime(data_path)  # mark as recently used
+    except (FileNotFoundError, ValueError):
+        return None
+    return CachedFile(path=data_path, size=size, **meta)
+
+
+def _fetch(key: str) -> CachedFile:
+    data_path, meta_path = _paths(key)
+    tmp_path = f"{data_path}.{uuid.uuid4().hex}.tmp"
+    try:
+        info = download_to_file(key, tmp_path)
+        last_modified = info["last_modified"] or datetime.now(timezone.utc)
+        meta = {
+            "content_type": info["content_type"],
+            "etag": info["etag"] or f'"{hashlib.sha256(key.encode()).hexdigest()[:32]}"',
+            "last_modified": formatdate(last_modified.timestamp(), usegmt=True),
+        }
+        with open(meta_path, "w") as f:
+            json.dump(meta, f)
+        # Data file appears last and atomically — its presence means the entry is complete
+        os.replace(tmp_path, data_path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    _meta_cache.set(key, meta)
+    return CachedFile(path=data_path, size=os.stat(data_path).st_size, **meta)
+
+
+def _evict() -> None:
+    limit = settings.FILE_CACHE_MAX_MB * 1024 * 1024
+    entries = []
+    total = 0
+    for entry in os.scandir(_cache_dir()):
+        if not entry.is_file() or entry.name.endswith((_META_SUFFIX, ".tmp")):
+            continue
+        st = entry.stat()
+        entries.append((st.st_mtime, st.st_size, entry.path))
+        total += st.st_size
+    if total <= limit:
+        return
+
+    entries.sort()
+    target = limit * _EVICT_TARGET_RATIO
+    for _, size, path in entries:
+        if total <= target:
+            break
+        for p in (path, path + _META_SUFFIX):
+            try:
+                os.remove(p)
+            except FileNotFoundError:
+                pass
+        total -= size
+        stats["evicted_files"] += 1
+
+
+async def get_cached_file(key: str) -> CachedFile:
+    """Local copy of an S3 object, downloading it on a miss. Raises if the object is missing in S3."""
+    hit = await asyncio.to_thread(_load_hit, key)
+    if hit is not None:
+        stats["hits"] += 1
+        stats["bytes_saved"] += hit.size
+        return hit
+
+    lock = _locks.setdefault(key, asyncio.Lock())
+    try:
+        async with lock:
+            hit = await asyncio.to_thread(_load_hit, key)
+            if hit is not None:
+                stats["hits"] += 1
+                stats["bytes_saved"] += hit.size
+                return hit
+            stats["misses"] += 1
+            started = time.monotonic()
+            cached = await asyncio.to_thread(_fetch, key)
+            log.debug("File cache miss %s: %s bytes in %.3fs", key, cached.size, time.monotonic() - started)
+    finally:
+        if not lock.locked():
+            _locks.pop(key, None)
+
+    try:
+        await asyncio.to_thread(_evict)
+    except OSError:
+        log.exception("File cache eviction failed")
+    return cached
+
+
+def _not_modified(request: Request, cached: CachedFile) -> bool:
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        tags = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+        return "*" in tags or cached.etag in tags
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since:
+        try:
+            return parsedate_to_datetime(cached.last_modified) <= parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError):
+            return False
+    return False
+
+
+def cached_file_response(
+    request: Request,
+    cached: CachedFile,
+    cache_control: str,
+    extra_headers: dict[str, str] | None = None,
+) -> Response:
+    """FileResponse streamed from disk, or 304 when the client's copy is current."""
+    headers = {
+        "ETag": cached.etag,
+        "Last-Modified": cached.last_modified,
+        "Cache-Control": cache_control,
+        **(extra_headers or {}),
+    }
+    if _not_modified(request, cached):
+        stats["not_modified"] += 1
+        return Response(status_code=304, headers=headers)
+    return FileResponse(cached.path, media_type=cached.content_type, headers=headers)
+
+
+def get_file_cache_stats() -> dict:
+    lookups = stats["hits"] + stats["misses"]
+    return {**stats, "hit_rate": round(stats["hits"] / lookups, 4) if lookups else 0.0}
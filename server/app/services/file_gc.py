@@ -0,0 +1,121 @@
+"""
+Сборка мусора в контентно-адресуемом хранилище (stored_files).
+
+Раз в FILE_GC_INTERVAL_HOURS одним запросом пересчитываем ref_count по реальным
+ссылкам: сообщения чата (file_url), аватары учеников (avatar_key), фоны
+баннеров (background_image_url). Объекты без ссылок, которые не загружались
+дольше FILE_GC_GRACE_HOURS (файл могли загрузить, но ещё не отправить),
+удаляются из S3 вместе с превью, затем удаляются их строки.
+"""
+import asyncio
+import logging
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import select, delete, func, text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config import settings
+from app.database import async_session
+from app.models.stored_file import StoredFile
+from app.s3 import delete_objects
+
+log = logging.getLogger(__name__)
+
+# pg advisory lock id — only one worker reconciles ref counts at a time;
+# deletion batches are safe to run concurrently thanks to SKIP LOCKED
+_GC_LOCK_ID = 7_100_038
+_GC_BATCH = 500
+
+_RECOUNT_SQL = text("""
+    WITH refs AS (
+        SELECT file_url AS key, count(*) AS n
+        FROM chat_messages
+        WHERE file_url IS NOT NULL AND is_deleted = false
+        GROUP BY file_url
+        UNION ALL
+        SELECT avatar_key, count(*)
+        FROM students
+        WHERE avatar_key IS NOT NULL
+        GROUP BY avatar_key
+        UNION ALL
+        SELECT sf.key, count(*)
+        FROM home_banners hb
+        JOIN stored_files sf
+          ON sf.prefix = 'banners' AND hb.background_image_url LIKE '%/' || sf.key
+        GROUP BY sf.key
+    ),
+    totals AS (
+        SELECT sf.id, COALESCE(sum(r.n), 0) AS n
+        FROM stored_files sf
+        LEFT JOIN refs r ON r.key = sf.key
+        GROUP BY sf.id
+    )
+    UPDATE stored_files sf
+    SET ref_count = totals.n
+    FROM totals
+    WHERE totals.id = sf.id AND sf.ref_count <> totals.n
+""")
+
+
+def _object_keys(row) -> list[str]:
+    """The object itself plus derived objects (chat image thumbnails)."""
+    keys = [row.key]
+    variants = (row.meta or {}).get("variants") or {}
+    keys.extend(v for v in variants.values() if isinstance(v, str))
+    return keys
+
+
+async def collect_unreferenced_files(db: AsyncSession, now: datetime | None = None) -> int:
+    """Reconcile ref counts and delete unreferenced objects. Returns the number of removed files."""
+    now = now or datetime.now(timezone.utc)
+    locked = (await db.execute(select(func.pg_try_advisory_xact_lock(_GC_LOCK_ID)))).scalar()
+    if not locked:
+        return 0
+
+    await db.execute(_RECOUNT_SQL)
+    await db.commit()
+
+    cutoff = now - timedelta(hours=settings.FILE_GC_GRACE_HOURS)
+    removed = 0
+    while True:
+        # Rows stay locked until commit: an upload reusing one of them waits and then
+        # sees it gone, so it re-uploads instead of pointing at a deleted object
+        rows = (await db.execute(
+            select(StoredFile.id, StoredFile.key, StoredFile.meta)
+            .where(StoredFile.ref_count == 0, StoredFile.last_uploaded_at < cutoff)
+            .limit(_GC_BATCH)
+            .with_for_update(skip_locked=True)
+        )).all()
+        if not rows:
+            await db.rollback()
+            break
+
+        keys = [k for row in rows for k in _object_keys(row)]
+        deleted = await asyncio.to_thread(delete_objects, keys)
+        gone = [row.id for row in rows if row.key in deleted]
+        if gone:
+            await db.execute(
+                delete(StoredFile).where(StoredFile.id.in_(gone)).execution_options(synchronize_session=False)
+            )
+        await db.commit()
+        removed += len(gone)
+        if len(gone) < len(rows):
+            log.warning("File GC: S3 refused to delete %s objects", len(rows) - len(gone))
+            break
+    return removed
+
+
+async def run_file_gc() -> None:
+    """Endless loop started from the app lifespan; cancelled on shutdown."""
+    interval = settings.FILE_GC_INTERVAL_HOURS * 3600
+    while True:
+        try:
+            async with async_session() as db:
+                removed = await collect_unreferenced_files(db)
+            if removed:
+                log.info("File GC: removed %s unreferenced files", removed)
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            log.exception("File GC pass failed")
+        await asyncio.sleep(interval)
@@ -0,0 +1,102 @@
+"""
+Контентно-адресуемое хранение загрузок.
+
+Файл хэшируется (sha256) по мере чтения из запроса и кладётся в S3 под ключом
+<prefix>/<sha256>. Если такой объект уже есть — повторная загрузка не
+делается, у записи stored_files растёт ref_count и переиспользуются
+сохранённые метаданные (например, превью картинок чата).
+
+ref_count поднимается при каждой загрузке и сверяется с реальными ссылками
+(сообщения, аватары, баннеры) фоновой сборкой мусора — services/file_gc.py.
+"""
+import asyncio
+import hashlib
+import tempfile
+from dataclasses import dataclass
+from datetime import datetime, timezone
+
+from fastapi import HTTPException, UploadFile
+from sqlalchemy import update
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models.stored_file import StoredFile
+from app.s3 import MAX_FILE_SIZE, put_fileobj
+
+_READ_CHUNK = 256 * 1024
+# Uploads up to this size are hashed in memory, larger ones spill to a temp file
+_SPOOL_MAX_MEMORY = 2 * 1024 * 1024
+
+
+@dataclass(frozen=True)
+class StoredObject:
+    key: str
+    size: int
+    sha256: str
+    created: bool  # False — deduplicated, nothing was uploaded
+    meta: dict | None
+    data: bytes | None = None  # only with keep_data=True for a new object
+
+
+async def store_upload(
+    db: AsyncSession,
+    file: UploadFile,
+    *,
+    prefix: str,
+    content_type: str,
+    keep_data: bool = False,
+) -> StoredObject:
+    """Hash the upload while reading it and store it once per content. Caller commits."""
+    hasher = hashlib.sha256()
+    size = 0
+    with tempfile.SpooledTemporaryFile(max_size=_SPOOL_MAX_MEMORY) as spool:
+        while chunk := await file.read(_READ_CHUNK):
+            size += len(chunk)
+            if size > MAX_FILE_SIZE:
+                raise HTTPException(status_code=400, detail="Файл слишком большой (макс. 10 МБ)")
+            hasher.update(chunk)
+            spool.write(chunk)
+        if size == 0:
+            raise HTTPException(status_code=400, detail="Пустой файл")
+
+        digest = hasher.hexdigest()
+        now = datetime.now(timezone.utc)
+
+        # UPDATE ... RETURNING doubles as the existence check and locks the row, so the GC
+        # can't delete the object between this check and the caller's commit
+        existing = (await db.execute(
+            update(StoredFile)
+            .where(StoredFile.prefix == prefix, StoredFile.sha256 == digest)
+            .values(ref_count=StoredFile.ref_count + 1, last_uploaded_at=now)
+            .returning(StoredFile.key, StoredFile.meta)
+        )).first()
+        if existing is not None:
+            return StoredObject(key=existing.key, size=size, sha256=digest, created=False, meta=existing.meta)
+
+        key = f"{prefix}/{digest}"
+        spool.seek(0)
+        await asyncio.to_thread(put_fileobj, key, spool, content_type)
+        data = None
+        if keep_data:
+            spool.seek(0)
+            data = spool.read()
+
+    # A concurrent upload of the same content may have inserted the row meanwhile — same key, same bytes
+    row = (await db.execute(
+        pg_insert(StoredFile)
+        .values(
+            key=key, prefix=prefix, sha256=digest, size=size, content_type=content_type,
+            ref_count=1, created_at=now, last_uploaded_at=now,
+        )
+        .on_conflict_do_update(
+            constraint="uq_stored_files_prefix_sha256",
+            set_={"ref_count": StoredFile.ref_count + 1, "last_uploaded_at": now},
+        )
+        .returning(StoredFile.meta)
+    )).first()
+    return StoredObject(key=key, size=size, sha256=digest, created=True, meta=row.meta, data=data)
+
+
+async def set_stored_file_meta(db: AsyncSession, key: str, meta: dict | None) -> None:
+    """Remember derived data (thumbnails) so deduplicated uploads reuse it. Caller commits."""
+    await db.execute(update(StoredFile).where(StoredFile.key == key).values(meta=meta))
@@ -0,0 +1,124 @@
+"""
+Фоновое поддержание уроков на N недель вперёд.
+
+Раз в LESSON_SCHEDULER_INTERVAL_MINUTES берём все неархивные группы, у которых
+изменилось расписание (groups.schedule_changed) или запас уроков стал короче
+горизонта (groups.lessons_generated_until), и одним проходом досоздаём уроки:
+одна выборка групп, один DELETE, один INSERT, один UPDATE.
+"""
+import asyncio
+import logging
+from collections import defaultdict
+from datetime import date, timedelta
+
+from sqlalchemy import select, delete, update, func, or_
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import selectinload
+
+from app.config import settings
+from app.database import async_session
+from app.models.group import Group
+from app.models.lesson import Lesson
+from app.services.lessons import (
+    expand_schedule_dates, build_lesson_rows, insert_lessons, deletable_lessons_filter, get_holidays,
+)
+
+log = logging.getLogger(__name__)
+
+# pg advisory lock id — only one worker materializes lessons at a time
+_SCHEDULER_LOCK_ID = 7_100_028
+
+
+async def materialize_lesson_horizon(db: AsyncSession, today: date | None = None) -> int:
+    """Top up future lessons of every group that needs it. Returns the number of created lessons."""
+    today = today or date.today()
+    horizon_end = today + timedelta(weeks=settings.LESSON_HORIZON_WEEKS)
+    refresh_before = horizon_end - timedelta(days=settings.LESSON_HORIZON_SLACK_DAYS)
+
+    locked = (await db.execute(select(func.pg_try_advisory_xact_lock(_SCHEDULER_LOCK_ID)))).scalar()
+    if not locked:
+        return 0
+
+    result = await db.execute(
+        select(Group)
+        .options(selectinload(Group.schedules))
+        .where(
+            Group.is_archived == False,
+            Group.start_date.isnot(None),
+            or_(
+                Group.schedule_changed == True,
+                Group.lessons_generated_until.is_(None),
+                Group.lessons_generated_until < refresh_before,
+            ),
+        )
+    )
+    groups = result.scalars().all()
+    if not groups:
+        await db.rollback()
+        return 0
+
+    group_ids = [g.id for g in groups]
+
+    # Schedule changed → drop future lessons nobody has touched yet, they are rebuilt below.
+    # Only up to the horizon: lessons beyond it (e.g. generated by hand) would not be rebuilt
+    changed_ids = [g.id for g in groups if g.schedule_changed]
+    if changed_ids:
+        await db.execute(
+            delete(Lesson)
+            .where(
+                *deletable_lessons_filter(Lesson.group_id.in_(changed_ids), today + timedelta(days=1)),
+                Lesson.date <= horizon_end,
+            )
+            .execution_options(synchronize_session=False)
+        )
+
+    existing_result = await db.execute(
+        select(Lesson.group_id, Lesson.date).where(
+            Lesson.group_id.in_(group_ids),
+            Lesson.date >= today,
+        )
+    )
+    existing_dates: dict = defaultdict(set)
+    for gid, d in existing_result.all():
+        existing_dates[gid].add(d)
+
+    holidays = await get_holidays(db)
+
+    rows: list[dict] = []
+    for g in groups:
+        start = max(g.start_date, today)
+        if not g.schedule_changed and g.lessons_generated_until is not None:
+            start = max(start, g.lessons_generated_until + timedelta(days=1))
+        slots = expand_schedule_dates(g.schedules, start, horizon_end, existing_dates[g.id] | holidays)
+        rows.extend(build_lesson_rows(g.id, slots))
+
+    created = await insert_lessons(db, rows)
+
+    await db.execute(
+        update(Group)
+        .where(Group.id.in_(group_ids))
+        # Never move it back: a manual generation may already reach further
+        .values(
+            lessons_generated_until=func.greatest(func.coalesce(Group.lessons_generated_until, horizon_end), horizon_end),
+            schedule_changed=False,
+        )
+        .execution_options(synchronize_session=False)
+    )
+    await db.commit()
+    return len(created)
+
+
+async def run_lesson_scheduler() -> None:
+    """Endless loop started from the app lifespan; cancelled on shutdown."""
+    interval = settings.LESSON_SCHEDULER_INTERVAL_MINUTES * 60
+    while True:
+        try:
+            async with async_session() as db:
+                created = await materialize_lesson_horizon(db)
+            if created:
+                log.info("Lesson scheduler: created %s lessons", created)
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            log.exception("Lesson scheduler pass failed")
+        await asyncio.sleep(interval)
@@ -0,0 +1,131 @@
+"""
+Генерация уроков по расписанию группы.
+
+Календарь раскладывается не обходом по дням, а арифметикой: для каждого
+дня недели из расписания берём первую подходящую дату и шагаем по 7 дней.
+Вставка — одним многострочным INSERT ... RETURNING, удаление — одним DELETE.
+"""
+import uuid
+from datetime import date, timedelta
+from typing import Iterable
+
+from sqlalchemy import select, insert, delete, func, exists
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models.lesson import Lesson, LessonAttendance, LessonStatus, WorkType
+from app.models.schedule import Schedule
+from app.models.settings import Settings
+
+# Mapping of Russian day names to weekday numbers (0 = Monday, 6 = Sunday)
+DAY_NAME_TO_WEEKDAY = {
+    "Понедельник": 0,
+    "Вторник": 1,
+    "Среда": 2,
+    "Четверг": 3,
+    "Пятница": 4,
+    "Суббота": 5,
+    "Воскресенье": 6,
+}
+
+
+def expand_schedule_dates(
+    schedules: Iterable[Schedule],
+    start: date,
+    end: date,
+    skip_dates: set[date] | frozenset[date] = frozenset(),
+) -> list[tuple[date, Schedule]]:
+    """All (date, schedule) pairs in [start, end], ordered by date and start time."""
+    if end < start:
+        return []
+
+    slots: list[tuple[date, Schedule]] = []
+    for schedule in schedules:
+        weekday = DAY_NAME_TO_WEEKDAY.get(schedule.day_of_week)
+        if weekday is None:
+            continue
+        first = start + timedelta(days=(weekday - start.weekday()) % 7)
+        if first > end:
+            continue
+        weeks = (end - first).days // 7 + 1
+        slots.extend(
+            (d, schedule)
+            for d in (first + timedelta(weeks=k) for k in range(weeks))
+            if d not in skip_dates
+        )
+
+    slots.sort(key=lambda item: (item[0], item[1].start_time))
+    return slots
+
+
+async def get_holidays(db: AsyncSession) -> set[date]:
+    """School-wide non-working days from settings.holidays (ISO date strings)."""
+    result = await db.execute(select(Settings.holidays).limit(1))
+    raw = result.scalar_one_or_none() or []
+    holidays = set()
+    for value in raw:
+        try:
+            holidays.add(date.fromisoformat(str(value)))
+        except ValueError:
+            continue
+    return holidays
+
+
+async def get_existing_lesson_dates(db: AsyncSession, group_id: uuid.UUID) -> set[date]:
+    result = await db.execute(select(Lesson.date).where(Lesson.group_id == group_id))
+    return {row[0] for row in result.all()}
+
+
+def build_lesson_rows(group_id: uuid.UUID, slots: list[tuple[date, Schedule]]) -> list[dict]:
+    return [
+        {
+            "group_id": group_id,
+            "date": d,
+            "time": schedule.start_time,
+            "duration": schedule.duration_minutes,
+            "is_cancelled": False,
+            "work_type": WorkType.none,
+            "had_previous_homework": False,
+        }
+        for d, schedule in slots
+    ]
+
+
+async def insert_lessons(db: AsyncSession, rows: list[dict]) -> list[Lesson]:
+    """Insert lessons in a single multi-row INSERT ... RETURNING. Caller commits."""
+    if not rows:
+        return []
+    result = await db.scalars(insert(Lesson).returning(Lesson), rows)
+    return list(result.all())
+
+
+def deletable_lessons_filter(group_clause, from_date: date | None):
+    """Lessons matching group_clause that were never conducted and have no attendance records."""
+    conditions = [
+        group_clause,
+        Lesson.status.is_distinct_from(LessonStatus.conducted),
+        ~exists().where(LessonAttendance.lesson_id == Lesson.id),
+    ]
+    if from_date is not None:
+        conditions.append(Lesson.date >= from_date)
+    return conditions
+
+
+async def delete_unmarked_lessons(
+    db: AsyncSession, group_id: uuid.UUID, from_date: date | None
+) -> tuple[int, int]:
+    """
+    Bulk-delete lessons of a group (from from_date on, or all if None), keeping conducted
+    lessons and lessons with attendance. Returns (deleted, skipped). Caller commits.
+    """
+    total_query = select(func.count(Lesson.id)).where(Lesson.group_id == group_id)
+    if from_date is not None:
+        total_query = total_query.where(Lesson.date >= from_date)
+    total = (await db.execute(total_query)).scalar() or 0
+
+    result = await db.execute(
+        delete(Lesson)
+        .where(*deletable_lessons_filter(Lesson.group_id == group_id, from_date))
+        .execution_options(synchronize_session=False)
+    )
+    deleted = result.rowcount or 0
+    return deleted, total - deleted
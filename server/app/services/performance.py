@@ -0,0 +1,91 @@
+"""
+Сводка успеваемости ученика для портала.
+
+Посещаемость, выполненные ДЗ и прогресс по предметам считаются одним
+сгруппированным запросом по lesson_attendance и кэшируются на ученика.
+Кэш сбрасывается при изменении посещаемости или статуса урока (app/routers/lessons.py).
+"""
+import uuid
+
+from sqlalchemy import select, func, and_
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.cache import TTLCache
+from app.models.group import Group, GroupStudent
+from app.models.lesson import Lesson, LessonAttendance, LessonStatus, AttendanceStatus
+from app.models.subject import Subject
+
+# Invalidation is explicit; the TTL only bounds staleness after out-of-band DB edits
+_performance_cache = TTLCache(ttl_seconds=3600, max_entries=5000)
+
+
+def invalidate_student_performance(*student_ids: uuid.UUID) -> None:
+    for student_id in student_ids:
+        _performance_cache.invalidate(student_id)
+
+
+async def lesson_student_ids(db: AsyncSession, lesson_id: uuid.UUID) -> list[uuid.UUID]:
+    """Students marked in the lesson: read before the change, invalidate after the commit."""
+    result = await db.execute(
+        select(LessonAttendance.student_id).where(LessonAttendance.lesson_id == lesson_id)
+    )
+    return list(result.scalars().all())
+
+
+async def get_student_performance(db: AsyncSession, student_id: uuid.UUID) -> dict:
+    cached = _performance_cache.get(student_id)
+    if cached is not None:
+        return cached
+
+    attended = LessonAttendance.attendance.in_([AttendanceStatus.present, AttendanceStatus.late])
+    hw_done = and_(
+        LessonAttendance.homework_grade.isnot(None),
+        func.trim(LessonAttendance.homework_grade).notin_(["", "0"]),
+    )
+    per_group_result = await db.execute(
+        select(
+            Lesson.group_id,
+            func.count(LessonAttendance.id).label("conducted"),
+            func.count(LessonAttendance.id).filter(attended).label("present"),
+            func.count(LessonAttendance.id).filter(hw_done).label("hw_done"),
+        )
+        .join(Lesson, Lesson.id == LessonAttendance.lesson_id)
+        .where(
+            LessonAttendance.student_id == student_id,
+            Lesson.status == LessonStatus.conducted,
+        )
+        .group_by(Lesson.group_id)
+    )
+    per_group = {row.group_id: row for row in per_group_result.all()}
+
+    memberships_result = await db.execute(
+        select(Group.id, Group.name, Group.subject_id, Subject.name.label("subject_name"))
+        .join(GroupStudent, GroupStudent.group_id == Group.id)
+        .outerjoin(Subject, Subject.id == Group.subject_id)
+        .where(
+            GroupStudent.student_id == student_id,
+            GroupStudent.is_archived == False,
+            GroupStudent.is_trial == False,
+        )
+    )
+    memberships = memberships_result.all()
+
+    conducted_total = sum(row.conducted for row in per_group.values())
+    present_total = sum(row.present for row in per_group.values())
+
+    subject_progress = []
+    for m in memberships:
+        if not m.subject_id:
+            continue
+        stats = per_group.get(m.id)
+        pct = round(stats.present / stats.conducted * 100) if stats and stats.conducted else 0
+        subject_progress.append({"name": m.subject_name or m.name, "percent": pct})
+
+    summary = {
+        "attendance_percent": round(present_total / conducted_total * 100) if conducted_total else 0,
+        "homework_done": sum(row.hw_done for row in per_group.values()),
+        "subjects_count": len({m.subject_id for m in memberships if m.subject_id}),
+        "subject_progress": subject_progress,
+    }
+    _performance_cache.set(student_id, summary)
+    return summary
@@ -0,0 +1,134 @@
+"""
+Кэш публичного контента портала: баннеры, карточка «О центре», абонементы, предметы.
+
+Контент меняется только из админки, а читается при каждом открытии приложения.
+Ключи кэша версионированы: (вид, версия). Админские роуты после commit вызывают
+invalidate_portal_content — версия растёт, старые записи просто истекают по TTL.
+Чтобы узнали остальные воркеры, уходит pg_notify в канал PORTAL_CACHE_CHANNEL;
+каждый воркер слушает его в фоне (run_portal_cache_listener).
+"""
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import uuid
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable
+
+import asyncpg
+from fastapi import Request
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import Response
+from sqlalchemy import select, func
+
+from app.cache import TTLCache
+from app.config import settings
+from app.database import engine
+
+log = logging.getLogger(__name__)
+
+BANNERS = "banners"
+HOME_INFO = "home_info"
+SUBSCRIPTION_PLANS = "subscription_plans"
+SUBJECTS = "subjects"
+PORTAL_CONTENT_KINDS = (BANNERS, HOME_INFO, SUBSCRIPTION_PLANS, SUBJECTS)
+
+PORTAL_CACHE_CHANNEL = "portal_cache_invalidate"
+
+# Identifies this worker so it skips its own notifications (already applied locally)
+_WORKER_ID = f"{os.getpid()}-{uuid.uuid4().hex[:8]}"
+
+_versions: dict[str, int] = {kind: 0 for kind in PORTAL_CONTENT_KINDS}
+_locks: dict[str, asyncio.Lock] = {}
+_content_cache = TTLCache(ttl_seconds=settings.PORTAL_CACHE_TTL_SECONDS, max_entries=64)
+
+
+@dataclass(frozen=True)
+class PortalContent:
+    data: Any  # JSON-compatible payload
+    body: bytes
+    etag: str
+
+
+def _build_entry(value: Any) -> PortalContent:
+    data = jsonable_encoder(value)
+    body = json.dumps(data, ensure_ascii=False, separators=(",", ":")).encode()
+    return PortalContent(data=data, body=body, etag=f'"{hashlib.sha1(body).hexdigest()[:16]}"')
+
+
+async def get_portal_content(kind: str, loader: Callable[[], Awaitable[Any]]) -> PortalContent:
+    """Cached payload of a content kind; on a miss only one coroutine per worker runs the loader."""
+    entry = _content_cache.get((kind, _versions[kind]))
+    if entry is not None:
+        return entry
+
+    lock = _locks.setdefault(kind, asyncio.Lock())
+    async with lock:
+        version = _versions[kind]
+        entry = _content_cache.get((kind, version))
+        if entry is None:
+            entry = _build_entry(await loader())
+            # An invalidation that raced with the load already bumped the version — don't store stale data
+            if _versions[kind] == version:
+                _content_cache.set((kind, version), entry)
+    return entry
+
+
+def portal_content_response(request: Request, content: PortalContent) -> Response:
+    """200 with ETag, or 304 when the client already has this version."""
+    headers = {
+        "ETag": content.etag,
+        "Cache-Control": f"private, max-age={settings.PORTAL_CACHE_CLIENT_MAX_AGE}, must-revalidate",
+    }
+    if_none_match = request.headers.get("if-none-match", "")
+    if content.etag in {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}:
+        return Response(status_code=304, headers=headers)
+    return Response(content=content.body, media_type="application/json", headers=headers)
+
+
+def _bump(*kinds: str) -> None:
+    for kind in kinds:
+        if kind in _versions:
+            _versions[kind] += 1
+
+
+async def invalidate_portal_content(*kinds: str) -> None:
+    """Call after the admin change is committed."""
+    _bump(*kinds)
+    try:
+        async with engine.begin() as conn:
+            for kind in kinds:
+                await conn.execute(select(func.pg_notify(PORTAL_CACHE_CHANNEL, f"{_WORKER_ID}:{kind}")))
+    except Exception:
+        # Other workers fall back to the TTL
+        log.exception("Failed to broadcast portal cache invalidation")
+
+
+def _on_notification(_conn, _pid, _channel, payload: str) -> None:
+    worker_id, _, kind = payload.rpartition(":")
+    if worker_id != _WORKER_ID:
+        _bump(kind)
+
+
+async def run_portal_cache_listener() -> None:
+    """LISTEN on the invalidation channel on a dedicated connection; reconnects on failure."""
+    dsn = engine.url.set(drivername="postgresql").render_as_string(hide_password=False)
+    while True:
+        conn = None
+        try:
+            conn = await asyncpg.connect(dsn)
+            await conn.add_listener(PORTAL_CACHE_CHANNEL, _on_notification)
+            # Anything may have changed while we were not listening
+            _bump(*PORTAL_CONTENT_KINDS)
+            while True:
+                await asyncio.sleep(30)
+                await conn.execute("SELECT 1")
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            log.exception("Portal cache listener failed, reconnecting")
+            await asyncio.sleep(5)
+        finally:
+            if conn is not None and not conn.is_closed():
+                await conn.close()
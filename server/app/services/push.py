@@ -9,9 +9,10 @@ import uuid
 from typing import Iterable
 
 import httpx
-from sqlalchemy import select
+from sqlalchemy import select, tuple_
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from app.metrics import observe_outbound
 from app.models.push_token import PushToken
 
 log = logging.getLogger(__name__)
@@ -62,15 +63,17 @@ async def send_push(
 
     try:
         async with httpx.AsyncClient(timeout=10) as client:
-            resp = await client.post(
-                EXPO_PUSH_URL,
-                json=messages,
-                headers={
-                    "Accept": "application/json",
-                    "Content-Type": "application/json",
-                    "Accept-Encoding": "gzip, deflate",
-                },
-            )
+            with observe_outbound("push") as call:
+                resp = await client.post(
+                    EXPO_PUSH_URL,
+                    json=messages,
+                    headers={
+                        "Accept": "application/json",
+                        "Content-Type": "application/json",
+                        "Accept-Encoding": "gzip, deflate",
+                    },
+                )
+                call["ok"] = resp.status_code < 400
             if resp.status_code >= 400:
                 log.warning("Expo push API %s: %s", resp.status_code, resp.text)
                 return
@@ -105,8 +108,13 @@ async def send_push_to_users(
     body: str,
     data: dict | None = None,
 ) -> None:
-    all_tokens: list[str] = []
-    for owner_id, owner_type in recipients:
-        all_tokens.extend(await get_tokens_for_user(db, owner_id, owner_type))
+    pairs = list(recipients)
+    if not pairs:
+        return
+    # One lookup for all recipients instead of a query per recipient
+    res = await db.execute(
+        select(PushToken.token).where(tuple_(PushToken.owner_id, PushToken.owner_type).in_(pairs))
+    )
+    all_tokens = list(res.scalars().all())
     if all_tokens:
         await send_push(all_tokens, title, body, data)
@@ -0,0 +1,146 @@
+"""
+Динамика ученика по пробным экзаменам.
+
+Один запрос с оконными функциями: для каждого экзамена ученика по всей когорте
+(все результаты экзамена) считаются место (rank), размер когорты и перцентиль
+(percent_rank — доля когорты с баллом ниже), а по предметам ученика —
+изменение итогового балла относительно предыдущего экзамена (lag).
+Освоение тем по каждому результату считается по матрице баллов
+(services/exam_analytics.py) из task_topics экзамена или тем предмета.
+
+Ряд кэшируется на ученика. Место и перцентиль зависят от всей когорты, поэтому
+при изменении результата экзамена сбрасывается кэш всех его участников
+(app/routers/exams.py).
+"""
+import uuid
+
+from sqlalchemy import select, func, cast, Date, Text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.cache import TTLCache
+from app.models.exam import Exam, ExamResult
+from app.models.subject import Subject
+from app.services.exam_analytics import result_topic_mastery
+
+# Invalidation is explicit; the TTL only bounds staleness after subject edits and out-of-band DB edits
+_progress_cache = TTLCache(ttl_seconds=3600, max_entries=5000)
+
+
+def invalidate_student_progress(*student_ids: uuid.UUID) -> None:
+    for student_id in student_ids:
+        _progress_cache.invalidate(student_id)
+
+
+async def exam_student_ids(db: AsyncSession, exam_id: uuid.UUID) -> list[uuid.UUID]:
+    result = await db.execute(select(ExamResult.student_id).where(ExamResult.exam_id == exam_id).distinct())
+    return list(result.scalars().all())
+
+
+async def invalidate_exam_progress(db: AsyncSession, exam_id: uuid.UUID) -> None:
+    """Drop cached series of every student of the exam — their ranks may have moved."""
+    invalidate_student_progress(*await exam_student_ids(db, exam_id))
+
+
+async def get_student_progress(db: AsyncSession, student_id: uuid.UUID) -> dict:
+    cached = _progress_cache.get(student_id)
+    if cached is not None:
+        return cached
+
+    student_exams = select(ExamResult.exam_id).where(ExamResult.student_id == student_id)
+    cohort = (
+        select(
+            ExamResult.exam_id,
+            ExamResult.student_id,
+            ExamResult.primary_score,
+            ExamResult.final_score,
+            ExamResult.answers,
+            ExamResult.added_at,
+            func.rank().over(partition_by=ExamResult.exam_id, order_by=ExamResult.final_score.desc()).label("rank"),
+            func.count().over(partition_by=ExamResult.exam_id).label("cohort_size"),
+            func.percent_rank().over(partition_by=ExamResult.exam_id, order_by=ExamResult.final_score).label("percent_rank"),
+        )
+        .where(ExamResult.exam_id.in_(student_exams))
+        .subquery()
+    )
+    exam_date = func.coalesce(Exam.date, cast(cohort.c.added_at, Date))
+    # Legacy exams have only the subject name
+    subject_key = func.coalesce(cast(Exam.subject_id, Text), Exam.subject)
+    # lag() runs after WHERE, i.e. over this student's results only
+    previous_score = func.lag(cohort.c.final_score).over(
+        partition_by=subject_key,
+        order_by=(exam_date, cohort.c.added_at),
+    )
+    result = await db.execute(
+        select(
+            cohort.c.exam_id,
+            cohort.c.primary_score,
+            cohort.c.final_score,
+            cohort.c.answers,
+            cohort.c.rank,
+            cohort.c.cohort_size,
+            cohort.c.percent_rank,
+            (cohort.c.final_score - previous_score).label("delta"),
+            exam_date.label("exam_date"),
+            subject_key.label("subject_key"),
+            Exam.title,
+            Exam.subject_id,
+            Exam.subject,
+            Exam.task_topics,
+            Exam.threshold_score,
+            Subject.name.label("subject_name"),
+            Subject.tasks.label("subject_tasks"),
+            Subject.topics.label("subject_topics"),
+        )
+        .join(Exam, Exam.id == cohort.c.exam_id)
+        .outerjoin(Subject, Subject.id == Exam.subject_id)
+        .where(cohort.c.student_id == student_id)
+        .order_by(exam_date, cohort.c.added_at)
+    )
+
+    subjects: dict[str | None, dict] = {}
+    for row in result.all():
+        entry = subjects.get(row.subject_key)
+        if entry is None:
+            entry = subjects[row.subject_key] = {
+                "subject_id": row.subject_id,
+                "subject_name": row.subject_name or row.subject,
+                "points": [],
+                "topics": {},
+            }
+        entry["points"].append({
+            "exam_id": row.exam_id,
+            "exam_title": row.title,
+            "exam_date": row.exam_date,
+            "primary_score": row.primary_score,
+            "final_score": row.final_score,
+            "delta": row.delta,
+            "is_passed": int(row.final_score) >= row.threshold_score if row.threshold_score is not None else None,
+            "rank": row.rank,
+            "cohort_size": row.cohort_size,
+            "percentile": round(row.percent_rank * 100, 1),
+        })
+
+        if not isinstance(row.answers, list):
+            continue
+        names, mastery = result_topic_mastery(
+            [row.answers],
+            subject_tasks=row.subject_tasks,
+            subject_topics=row.subject_topics,
+            task_topics=row.task_topics if isinstance(row.task_topics, dict) else None,
+        )
+        for name, value in zip(names, mastery[0]):
+            entry["topics"].setdefault(name, []).append({
+                "exam_id": row.exam_id,
+                "exam_date": row.exam_date,
+                "mastery": round(float(value), 3),
+            })
+
+    progress = {
+        "student_id": student_id,
+        "subjects": [
+            {**entry, "topics": [{"topic": name, "points": points} for name, points in entry["topics"].items()]}
+            for entry in subjects.values()
+        ],
+    }
+    _progress_cache.set(student_id, progress)
+    return progress
@@ -0,0 +1,127 @@
+"""
+Превью картинок чата.
+
+При загрузке изображения в чат строим уменьшенные копии (THUMBNAIL_SIZES) и
+крошечный LQIP-плейсхолдер (data URI на пару сотен байт), чтобы мобильный
+клиент не качал оригинал ради пузыря сообщения. Декодирование и ресайз —
+CPU-работа, поэтому она идёт в пуле процессов, а не в event loop.
+Варианты лежат в S3 рядом с оригиналом: chat/<id>.png → chat/<id>_thumb.jpg.
+"""
+import asyncio
+import base64
+import logging
+from concurrent.futures import ProcessPoolExecutor
+from io import BytesIO
+
+from app.config import settings
+
+log = logging.getLogger(__name__)
+
+# Longest side, px. A variant is only produced when the original is larger.
+THUMBNAIL_SIZES = {
+    "thumb": 320,
+    "preview": 1280,
+}
+LQIP_SIZE = 16
+JPEG_QUALITY = 82
+
+_pool: ProcessPoolExecutor | None = None
+
+
+def variant_key(key: str, variant: str) -> str:
+    stem = key.rsplit(".", 1)[0] if "." in key.rsplit("/", 1)[-1] else key
+    return f"{stem}_{variant}.jpg"
+
+
+def _to_rgb(img):
+    from PIL import Image
+
+    if img.mode in ("RGBA", "LA") or (img.mode == "P" and "transparency" in img.info):
+        img = img.convert("RGBA")
+        background = Image.new("RGB", img.size, (255, 255, 255))
+        background.paste(img, mask=img.getchannel("A"))
+        return background
+    return img.convert("RGB")
+
+
+def _encode_jpeg(img, quality: int) -> bytes:
+    buf = BytesIO()
+    img.save(buf, format="JPEG", quality=quality, optimize=True, progressive=True)
+    return buf.getvalue()
+
+
+def render_image_variants(data: bytes) -> dict:
+    """
+    Runs in a worker process. Returns
+    {"width", "height", "lqip", "variants": {name: jpeg bytes}}; width/height are of the original.
+    """
+    from PIL import Image, ImageOps
+
+    with Image.open(BytesIO(data)) as img:
+        width, height = img.size
+        if img.getexif().get(0x0112) in (5, 6, 7, 8):  # EXIF orientation with a 90° turn
+            width, height = height, width
+        largest = max(THUMBNAIL_SIZES.values())
+        # JPEG: decode at a reduced scale straight away, much cheaper than a full decode
+        img.draft("RGB", (largest, largest))
+        frame = _to_rgb(ImageOps.exif_transpose(img))
+
+    variants: dict[str, bytes] = {}
+    for name, size in sorted(THUMBNAIL_SIZES.items(), key=lambda item: -item[1]):
+        if max(width, height) <= size:
+            continue
+        frame.thumbnail((size, size), Image.Resampling.LANCZOS)
+        variants[name] = _encode_jpeg(frame, JPEG_QUALITY)
+
+    frame.thumbnail((LQIP_SIZE, LQIP_SIZE), Image.Resampling.BILINEAR)
+    lqip = "data:image/jpeg;base64," + base64.b64encode(_encode_jpeg(frame, 40)).decode()
+
+    return {"width": width, "height": height, "lqip": lqip, "variants": variants}
+
+
+def _get_pool() -> ProcessPoolExecutor:
+    global _pool
+    if _pool is None:
+        _pool = ProcessPoolExecutor(max_workers=settings.THUMBNAIL_WORKERS)
+    return _pool
+
+
+def shutdown_thumbnail_pool() -> None:
+    global _pool
+    if _pool is not None:
+        _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
+
+
+async def build_image_variants(data: bytes) -> dict | None:
+    """Render variants off the event loop. None if the image can't be decoded."""
+    loop = asyncio.get_running_loop()
+    try:
+        return await loop.run_in_executor(_get_pool(), render_image_variants, data)
+    except Exception:
+        log.exception("Thumbnail generation failed")
+        return None
+
+
+def clean_file_meta(file_url: str | None, raw) -> dict | None:
+    """
+    file_meta comes back from the client when it sends the message; keep only what
+    the upload endpoint could have produced for this file_url.
+    """
+    if not file_url or not isinstance(raw, dict):
+        return None
+    meta: dict = {}
+    variants = raw.get("variants")
+    if isinstance(variants, dict):
+        meta["variants"] = {
+            name: key
+            for name, key in variants.items()
+            if name in THUMBNAIL_SIZES and key == variant_key(file_url, name)
+        }
+    lqip = raw.get("lqip")
+    if isinstance(lqip, str) and lqip.startswith("data:image/") and len(lqip) <= 4096:
+        meta["lqip"] = lqip
+    for dim in ("width", "height"):
+        if isinstance(raw.get(dim), int) and raw[dim] > 0:
+            meta[dim] = raw[dim]
+    return meta or None
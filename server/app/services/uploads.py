@@ -0,0 +1,108 @@
+"""
+Двухфазная загрузка файлов напрямую в S3.
+
+1. presign: клиент сообщает имя и тип файла, получает presigned POST (ключ,
+   тип и максимальный размер зашиты в политику) и upload_token.
+2. Клиент грузит файл прямо в хранилище, минуя API.
+3. finalize: по upload_token проверяем объект через HEAD (есть, размер,
+   тип) и только после этого записываем метаданные.
+
+upload_token — JWT с type="upload": в нём ключ, назначение и владелец,
+так что финализировать можно только свою загрузку. Старые эндпоинты,
+принимающие файл через API, остаются как запасной путь.
+"""
+import asyncio
+import logging
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+
+from fastapi import HTTPException
+from jose import jwt
+
+from app.auth.security import decode_token
+from app.config import settings
+from app.s3 import (
+    MAX_FILE_SIZE, PRESIGNED_UPLOAD_EXPIRES,
+    new_object_key, create_presigned_upload, head_object, delete_object,
+)
+from app.schemas.upload import PresignUploadRequest, PresignedUploadResponse
+
+log = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class FinalizedUpload:
+    key: str
+    file_name: str
+    size: int
+    content_type: str
+
+
+def presign_upload(
+    body: PresignUploadRequest,
+    *,
+    purpose: str,
+    owner: str,
+    prefix: str,
+    allowed_types: set[str],
+    default_ext: str = "bin",
+) -> PresignedUploadResponse:
+    if body.content_type not in allowed_types:
+        raise HTTPException(status_code=400, detail=f"Неподдерживаемый тип файла: {body.content_type}")
+    if body.file_size is not None and body.file_size > MAX_FILE_SIZE:
+        raise HTTPException(status_code=400, detail="Файл слишком большой (макс. 10 МБ)")
+
+    key = new_object_key(prefix, body.file_name, default_ext)
+    post = create_presigned_upload(key, body.content_type)
+    token = jwt.encode(
+        {
+            "type": "upload",
+            "purpose": purpose,
+            "owner": owner,
+            "key": key,
+            "file_name": body.file_name,
+            "content_type": body.content_type,
+            # A bit longer than the POST policy so a slow upload can still be finalized
+            "exp": datetime.now(timezone.utc) + timedelta(seconds=PRESIGNED_UPLOAD_EXPIRES * 2),
+        },
+        settings.SECRET_KEY,
+        algorithm=settings.ALGORITHM,
+    )
+    return PresignedUploadResponse(
+        url=post["url"],
+        fields=post["fields"],
+        key=key,
+        upload_token=token,
+        expires_in=PRESIGNED_UPLOAD_EXPIRES,
+    )
+
+
+async def finalize_upload(upload_token: str, *, purpose: str, owner: str) -> FinalizedUpload:
+    """Verify the uploaded object with HEAD. Raises HTTPException if it's missing or doesn't match."""
+    payload = decode_token(upload_token)
+    if (
+        not payload
+        or payload.get("type") != "upload"
+        or payload.get("purpose") != purpose
+        or payload.get("owner") != owner
+    ):
+        raise HTTPException(status_code=400, detail="Недействительный токен загрузки")
+
+    key = payload["key"]
+    meta = await asyncio.to_thread(head_object, key)
+    if meta is None:
+        raise HTTPException(status_code=400, detail="Файл не загружен")
+
+    if meta["size"] > MAX_FILE_SIZE or meta["content_type"] != payload["content_type"]:
+        try:
+            await asyncio.to_thread(delete_object, key)
+        except Exception:
+            log.exception("Failed to delete rejected upload %s", key)
+        raise HTTPException(status_code=400, detail="Загруженный файл не соответствует запросу")
+
+    return FinalizedUpload(
+        key=key,
+        file_name=payload["file_name"],
+        size=meta["size"],
+        content_type=meta["content_type"],
+    )
@@ -0,0 +1,374 @@
+"""
+Недельные AI-отчёты для родителей.
+
+Статистика за период собирается одним сгруппированным запросом по
+lesson_attendance (ученик × предмет) — и для одного ученика, и для всей
+школы. Промпт строится здесь же, роутер только вызывает сервис.
+
+Пакетная генерация (generate-all): отчёты по всем активным ученикам
+запрашиваются у модели параллельно (ограничение — AI_MAX_CONCURRENCY в шлюзе
+app/services/ai.py) и пишутся в weekly_reports пачками по
+WEEKLY_REPORT_BATCH_CHUNK с коммитом после каждой. Ученики, у которых отчёт
+за этот период уже есть, пропускаются, поэтому после сбоя задачу достаточно
+запустить ещё раз с тем же периодом (latest_report_period подскажет какой) —
+она продолжит с того места, где остановилась. Готовые
+отчёты сразу видны в /students/weekly-reports/latest-all.
+"""
+import asyncio
+import logging
+import uuid
+from dataclasses import dataclass, field
+from datetime import date, datetime, timezone
+
+from fastapi import HTTPException
+from sqlalchemy import select, insert, func, and_, exists, literal_column
+from sqlalchemy.dialects.postgresql import JSON, aggregate_order_by
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config import settings
+from app.database import async_session
+from app.models.group import Group
+from app.models.lesson import Lesson, LessonAttendance, AttendanceStatus
+from app.models.report import WeeklyReport
+from app.models.student import Student
+from app.models.subject import Subject
+from app.services.ai import complete
+
+log = logging.getLogger(__name__)
+
+# pg advisory lock id — only one batch generation runs at a time across workers
+_BATCH_LOCK_ID = 7_100_046
+
+# Teacher comments quoted in the prompt
+_PROMPT_COMMENTS = 3
+
+
+@dataclass
+class WeeklyStats:
+    student_id: uuid.UUID
+    first_name: str
+    last_name: str
+    attendance_count: int = 0
+    absent_count: int = 0
+    late_count: int = 0
+    homework_completed: int = 0
+    homework_total: int = 0
+    subjects: dict[str, dict] = field(default_factory=dict)
+    comments: list[dict] = field(default_factory=list)
+
+    def counters(self) -> dict:
+        return {
+            "attendance_count": self.attendance_count,
+            "absent_count": self.absent_count,
+            "late_count": self.late_count,
+            "homework_completed": self.homework_completed,
+            "homework_total": self.homework_total,
+        }
+
+
+async def collect_weekly_stats(
+    db: AsyncSession,
+    start_date: date,
+    end_date: date,
+    *,
+    student_ids: list[uuid.UUID] | None = None,
+    skip_existing: bool = False,
+) -> list[WeeklyStats]:
+    """
+    Per-student stats for conducted lessons in [start_date, end_date]: one query
+    grouped by (student, subject). Without student_ids — every active student.
+    skip_existing drops students that already have a report for exactly this period.
+    Students without lessons in the period are not returned.
+    """
+    status = LessonAttendance.attendance
+    has_homework = Lesson.had_previous_homework == True
+    # A grade counts when it is set and not "0", whether or not the lesson had homework assigned
+    has_homework_grade = and_(
+        LessonAttendance.homework_grade.isnot(None),
+        LessonAttendance.homework_grade != "",
+        LessonAttendance.homework_grade != "0",
+    )
+    newest_first = (Lesson.date.desc(), Lesson.time.desc())
+    # Sort key matching ORDER BY date DESC, time DESC (NULL time sorts first within its day)
+    lesson_moment = Lesson.date + func.coalesce(Lesson.time, literal_column("time '24:00'"))
+
+    query = (
+        select(
+            Student.id.label("student_id"),
+            Student.first_name,
+            Student.last_name,
+            Subject.name.label("subject"),
+            func.count().label("lessons"),
+            func.count().filter(status.in_([AttendanceStatus.present, AttendanceStatus.late])).label("attended"),
+            func.count().filter(status == AttendanceStatus.absent).label("absent"),
+            func.count().filter(status == AttendanceStatus.late).label("late"),
+            func.count().filter(has_homework).label("homework_total"),
+            func.count().filter(has_homework, has_homework_grade).label("homework_completed"),
+            func.array_agg(aggregate_order_by(LessonAttendance.lesson_grade, *newest_first))
+            .filter(LessonAttendance.lesson_grade.isnot(None), LessonAttendance.lesson_grade != "")
+            .label("lesson_grades"),
+            func.array_agg(aggregate_order_by(LessonAttendance.homework_grade, *newest_first))
+            .filter(has_homework_grade)
+            .label("homework_grades"),
+            func.json_agg(
+                aggregate_order_by(
+                    func.json_build_object(
+                        literal_column("'date'"), Lesson.date,
+                        literal_column("'at'"), lesson_moment,
+                        literal_column("'comment'"), LessonAttendance.comment,
+                    ),
+                    *newest_first,
+                ),
+                type_=JSON,
+            ).filter(LessonAttendance.comment.isnot(None), LessonAttendance.comment != "").label("comments"),
+        )
+        .join(Lesson, LessonAttendance.lesson_id == Lesson.id)
+        .join(Group, Lesson.group_id == Group.id)
+        .join(Subject, Group.subject_id == Subject.id)
+        .join(Student, LessonAttendance.student_id == Student.id)
+        .where(
+            Lesson.status == "conducted",
+            Lesson.is_cancelled == False,
+            Lesson.date >= start_date,
+            Lesson.date <= end_date,
+        )
+        .group_by(Student.id, Subject.name)
+        # Subjects in the order of their newest lesson, as the per-lesson loop used to produce them
+        .order_by(Student.last_name, Student.first_name, Student.id, func.max(lesson_moment).desc())
+    )
+    if student_ids is not None:
+        query = query.where(LessonAttendance.student_id.in_(student_ids))
+    else:
+        query = query.where(Student.status == "active")
+    if skip_existing:
+        query = query.where(~exists().where(
+            WeeklyReport.student_id == Student.id,
+            WeeklyReport.period_start == start_date,
+            WeeklyReport.period_end == end_date,
+        ))
+
+    by_student: dict[uuid.UUID, WeeklyStats] = {}
+    for row in (await db.execute(query)).all():
+        stats = by_student.get(row.student_id)
+        if stats is None:
+            stats = by_student[row.student_id] = WeeklyStats(row.student_id, row.first_name, row.last_name)
+        stats.attendance_count += row.attended
+        stats.absent_count += row.absent
+        stats.late_count += row.late
+        stats.homework_total += row.homework_total
+        stats.homework_completed += row.homework_completed
+        stats.subjects[row.subject] = {
+            "lessons": row.lessons,
+            "lesson_grades": row.lesson_grades or [],
+            "homework_grades": row.homework_grades or [],
+        }
+        for c in row.comments or []:
+            stats.comments.append({"date": c["date"], "at": c["at"], "subject": row.subject, "comment": c["comment"]})
+
+    for stats in by_student.values():
+        # ISO timestamps sort chronologically; newest comments first, across subjects, as before
+        stats.comments.sort(key=lambda c: c["at"], reverse=True)
+    return list(by_student.values())
+
+
+def build_weekly_prompt(stats: WeeklyStats, start_date: date, end_date: date) -> str:
+    # ===========================================
+    # НАСТРОЙКА ПРОМПТА - РЕДАКТИРУЙТЕ ЗДЕСЬ
+    # ===========================================
+    attendance_count = stats.attendance_count
+    absent_count = stats.absent_count
+    late_count = stats.late_count
+    homework_completed = stats.homework_completed
+    homework_total = stats.homework_total
+
+    # Формируем данные по предметам
+    subjects_summary = ""
+    for subject_name, data in stats.subjects.items():
+        subjects_summary += f"\n{subject_name}: {data['lessons']} урок(ов)"
+        if data["lesson_grades"]:
+            subjects_summary += f", оценки за уроки: {', '.join(data['lesson_grades'])}"
+        if data["homework_grades"]:
+            subjects_summary += f", оценки за ДЗ: {', '.join(data['homework_grades'])}"
+
+    # Формируем комментарии
+    comments_summary = ""
+    if stats.comments:
+        comments_summary = "\n\nКомментарии преподавателей:\n"
+        for c in stats.comments[:_PROMPT_COMMENTS]:  # Берем только первые 3 комментария для краткости
+            comment_date = date.fromisoformat(c["date"]).strftime("%d.%m.%Y")
+            comments_summary += f"- {comment_date} ({c['subject']}): {c['comment']}\n"
+
+    # Основной промпт - шаблон для мессенджера
+    return f"""Составь еженедельный отчет для родителей в формате сообщения для мессенджера.
+
+ДАННЫЕ:
+Студент: {stats.first_name} {stats.last_name}
+Период: {start_date.strftime('%d.%m.%Y')} - {end_date.strftime('%d.%m.%Y')}
+Посещаемость: {attendance_count}/{attendance_count + absent_count}, Пропусков: {absent_count}, Опозданий: {late_count}
+ДЗ: {homework_completed}/{homework_total}
+{subjects_summary}{comments_summary}
+
+СТРОГИЙ ФОРМАТ ОТЧЕТА (используй ТОЧНО такую структуру):
+
+Здравствуйте! Отчет об успеваемости {stats.first_name} за {start_date.strftime('%d.%m')} — {end_date.strftime('%d.%m.%Y')}
+
+📊 Посещаемость
+✅ Присутствовал — {attendance_count} урок(ов)
+[ЕСЛИ БЫЛИ ОПОЗДАНИЯ: ⏰ Опоздание — {late_count} (указать предмет и дату, если известно)]
+[ЕСЛИ БЫЛИ ПРОПУСКИ: ❌ Отсутствовал — {absent_count} (указать предмет и дату, если известно)]
+
+📝 Домашние задания
+Выполнено: {homework_completed} из {homework_total} ({int(homework_completed/homework_total*100) if homework_total > 0 else 0}%)
+[ЕСЛИ ЕСТЬ ОЦЕНКИ: Оценки: [список оценок] → средняя [среднее]]
+
+💬 Обратная связь от преподавателей
+[ДЛЯ КАЖДОГО КОММЕНТАРИЯ: Предмет (дата) — Текст комментария]
+[ЕСЛИ НЕТ КОММЕНТАРИЕВ: Нет комментариев от преподавателей за этот период.]
+
+💡 Рекомендации
+• [Конкретная рекомендация на основе данных]
+• [Еще одна рекомендация]
+[ЕСЛИ ВСЕ ХОРОШО: • Продолжать в том же духе!]
+
+С уважением, администрация школы
+По всем вопросам: +7 (999) 123-45-67
+
+КРИТИЧЕСКИ ВАЖНО - ОБРАБОТКА КОММЕНТАРИЕВ ПРЕПОДАВАТЕЛЕЙ:
+1. ФИЛЬТРАЦИЯ И СМЯГЧЕНИЕ:
+   - Убери любую грубость, сарказм или неуместные выражения
+   - Перефрази негативные комментарии в конструктивный формат
+   - Замени эмоциональные фразы на профессиональные
+   - Пример: "Ученик постоянно отвлекается и мешает другим" → "Рекомендуется больше концентрироваться на уроке"
+
+2. СОКРАЩЕНИЕ ДЛИННЫХ КОММЕНТАРИЕВ:
+   - Если комментарий длиннее 100 символов - сократи до сути (50-80 символов)
+   - Оставь только главную информацию: факты и рекомендации
+   - Убери лишние детали и повторы
+   - Пример: "Сегодня на уроке ученик пришел неподготовленным, не сделал домашнее задание, которое я задавала на прошлом уроке, также забыл тетрадь и учебник" → "Пришел неподготовленным, не выполнил ДЗ, забыл материалы"
+
+3. ПРОФЕССИОНАЛЬНЫЙ ТОН:
+   - Используй нейтральный, уважительный язык
+   - Фокус на фактах, а не на эмоциях
+   - Конструктивные замечания вместо критики
+   - Положительные моменты выделяй, негативные - смягчай
+
+4. ФОРМАТ:
+   - Максимум 2-3 самых важных комментария
+   - Каждый комментарий - не более 80 символов
+   - Если комментариев много - выбери наиболее значимые
+
+ВАЖНО:
+- Используй ТОЧНО такой формат с эмодзи и секциями
+- НЕ добавляй лишний текст или объяснения
+- ОБЯЗАТЕЛЬНО обработай все комментарии преподавателей (смягчи негатив, сократи длинные)
+- Рекомендации должны быть конкретными и основаны на данных
+- Формат: короткие строки, как в мессенджере
+"""
+
+
+def weekly_report_row(stats: WeeklyStats, start_date: date, end_date: date, text: str, created_by: uuid.UUID) -> dict:
+    return {
+        "id": uuid.uuid4(),
+        "student_id": stats.student_id,
+        "created_by": created_by,
+        "period_start": start_date,
+        "period_end": end_date,
+        **stats.counters(),
+        "ai_report": text,
+        "is_approved": False,
+        "created_at": datetime.now(timezone.utc),
+    }
+
+
+# --- Batch generation ---
+
+
+async def latest_report_period(db: AsyncSession) -> dict | None:
+    """Period of the most recently written reports and how many exist for it — what a resumed batch should reuse."""
+    row = (await db.execute(
+        select(WeeklyReport.period_start, WeeklyReport.period_end, func.count().label("reports"))
+        .group_by(WeeklyReport.period_start, WeeklyReport.period_end)
+        .order_by(func.max(WeeklyReport.created_at).desc())
+        .limit(1)
+    )).first()
+    if row is None:
+        return None
+    return {"period_start": row.period_start, "period_end": row.period_end, "reports": row.reports}
+
+
+# State of the batch job in this worker; the reports themselves are in the DB
+batch_state: dict = {"status": "idle"}
+_batch_task: asyncio.Task | None = None
+
+
+async def _generate_one(stats: WeeklyStats, start_date: date, end_date: date) -> str | None:
+    try:
+        return (await complete(build_weekly_prompt(stats, start_date, end_date), max_tokens=500, temperature=0.7)).text
+    except HTTPException as e:
+        log.warning("Weekly report for student %s failed: %s", stats.student_id, e.detail)
+        return None
+
+
+async def generate_weekly_reports_batch(start_date: date, end_date: date, created_by: uuid.UUID) -> dict:
+    """Generate missing reports for every active student. Safe to re-run: finished students are skipped."""
+    async with async_session() as lock_db:
+        # Transaction-scoped lock held by an idle session for the whole run;
+        # released on exit, or by Postgres if the worker dies
+        locked = (await lock_db.execute(select(func.pg_try_advisory_xact_lock(_BATCH_LOCK_ID)))).scalar()
+        if not locked:
+            batch_state.update(status="busy", finished_at=datetime.now(timezone.utc))
+            return batch_state
+
+        async with async_session() as db:
+            pending = await collect_weekly_stats(db, start_date, end_date, skip_existing=True)
+            batch_state.update(total=len(pending))
+            chunk_size = settings.WEEKLY_REPORT_BATCH_CHUNK
+            for offset in range(0, len(pending), chunk_size):
+                chunk = pending[offset:offset + chunk_size]
+                texts = await asyncio.gather(*(_generate_one(s, start_date, end_date) for s in chunk))
+                rows = [
+                    weekly_report_row(s, start_date, end_date, text, created_by)
+                    for s, text in zip(chunk, texts) if text
+                ]
+                if rows:
+                    await db.execute(insert(WeeklyReport), rows)
+                    await db.commit()
+                batch_state["created"] += len(rows)
+                batch_state["failed"] += len(chunk) - len(rows)
+
+        await lock_db.rollback()
+
+    batch_state.update(status="finished", finished_at=datetime.now(timezone.utc))
+    log.info(
+        "Weekly report batch %s..%s: %s created, %s failed of %s",
+        start_date, end_date, batch_state["created"], batch_state["failed"], batch_state["total"],
+    )
+    return batch_state
+
+
+async def _run_batch(start_date: date, end_date: date, created_by: uuid.UUID) -> None:
+    try:
+        await generate_weekly_reports_batch(start_date, end_date, created_by)
+    except Exception:
+        log.exception("Weekly report batch failed")
+        batch_state.update(status="failed", finished_at=datetime.now(timezone.utc))
+
+
+def start_weekly_reports_batch(start_date: date, end_date: date, created_by: uuid.UUID) -> dict:
+    """Start the batch in the background of this worker. 409 if it is already running here."""
+    global _batch_task
+    if _batch_task is not None and not _batch_task.done():
+        raise HTTPException(status_code=409, detail="Генерация отчётов уже запущена")
+    batch_state.clear()
+    batch_state.update(
+        status="running",
+        period_start=start_date,
+        period_end=end_date,
+        total=None,
+        created=0,
+        failed=0,
+        started_at=datetime.now(timezone.utc),
+        finished_at=None,
+    )
+    _batch_task = asyncio.create_task(_run_batch(start_date, end_date, created_by))
+    return batch_state
@@ -0,0 +1,49 @@
+"""
+Бенчмарк AI-шлюза (app/services/ai.py) — удобно запускать против заглушки.
+
+    python ai_stub_server.py --latency-ms 500 --error-rate 0.1 &
+    OPENROUTER_BASE_URL=http://127.0.0.1:8090/v1 OPENROUTER_API_KEY=stub python check_ai_gateway.py 40
+
+Отправляет N разных промптов одновременно (ограничение — AI_MAX_CONCURRENCY),
+затем те же промпты повторно: второй проход должен целиком прийти из кэша.
+"""
+import asyncio
+import statistics
+import sys
+import time
+
+from app.services.ai import complete, close_ai_client, get_ai_stats
+
+# Настройка кодировки для Windows консоли
+if sys.platform == "win32":
+    sys.stdout.reconfigure(encoding='utf-8')
+
+
+async def run_pass(prompts: list[str]) -> list[float]:
+    async def one(prompt: str) -> float:
+        started = time.monotonic()
+        await complete(prompt)
+        return (time.monotonic() - started) * 1000
+
+    return await asyncio.gather(*(one(p) for p in prompts))
+
+
+async def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+    prompts = [f"Отчёт для ученика #{i}" for i in range(count)]
+    try:
+        for name in ("холодный", "из кэша"):
+            started = time.monotonic()
+            latencies = await run_pass(prompts)
+            total = time.monotonic() - started
+            print(
+                f"Проход «{name}»: {count} запросов за {total:.2f} с, "
+                f"p50={statistics.median(latencies):.0f} мс, max={max(latencies):.0f} мс"
+            )
+        print("Статистика шлюза:", get_ai_stats())
+    finally:
+        await close_ai_client()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,57 @@
+"""
+Общие фикстуры тестов.
+
+Тесты с базой работают с DATABASE_URL (dev-база с применёнными миграциями):
+создают свои временные данные и удаляют их. Если база недоступна, такие тесты
+пропускаются.
+
+query_budget — ограничение числа SQL-выражений (app/query_stats.py), N+1 падает
+с QueryBudgetExceeded и списком выполненных запросов:
+
+    async def test_rooms(db, query_budget):
+        with query_budget(3):
+            await list_rooms(db, user)
+"""
+import pytest
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+
+from app.config import settings
+from app.query_stats import install_query_hooks, query_budget as _query_budget
+
+
+@pytest.fixture
+def anyio_backend():
+    return "asyncio"
+
+
+@pytest.fixture
+async def db_engine():
+    # Pool large enough for the concurrency tests
+    engine = create_async_engine(settings.DATABASE_URL, pool_size=50, max_overflow=0, pool_timeout=120)
+    try:
+        async with engine.connect() as conn:
+            await conn.execute(text("SELECT 1"))
+    except Exception as e:
+        await engine.dispose()
+        pytest.skip(f"Database is not available: {e}")
+    install_query_hooks(engine)
+    yield engine
+    await engine.dispose()
+
+
+@pytest.fixture
+def session_maker(db_engine):
+    return async_sessionmaker(db_engine, class_=AsyncSession, expire_on_commit=False)
+
+
+@pytest.fixture
+async def db(session_maker):
+    async with session_maker() as session:
+        yield session
+
+
+@pytest.fixture
+def query_budget():
+    """query_budget(n) context manager: fails the test if the block runs more than n statements."""
+    return _query_budget
@@ -0,0 +1,106 @@
+"""
+Запись на экзамен под наплывом: 500 одновременных записей на слот.
+
+Временные экзамен, сессия, слот (SEATS мест, с листом ожидания) и ученики;
+все ученики параллельно записываются через reserve_seat. Мест выдаётся ровно
+SEATS, остальные — в листе ожидания, повторная запись отклоняется, отмена
+передаёт место первому в очереди. Временные данные удаляются.
+"""
+import asyncio
+import uuid
+from datetime import date
+
+import pytest
+from fastapi import HTTPException
+from sqlalchemy import select, delete, func
+
+from app.models.exam import Exam
+from app.models.exam_portal import ExamPortalSession, ExamTimeSlot, ExamRegistration, RegistrationStatus
+from app.models.student import Student
+from app.services.exam_registration import reserve_seat, release_registration
+
+pytestmark = pytest.mark.anyio
+
+STUDENTS = 500
+SEATS = 30
+
+
+@pytest.fixture
+async def rush_slot(session_maker):
+    """(slot_id, student_ids) of a fresh slot with SEATS seats and STUDENTS students."""
+    marker = f"rush-check-{uuid.uuid4().hex[:8]}"
+    async with session_maker() as db:
+        exam = Exam(title=marker, is_registration_open=True)
+        db.add(exam)
+        await db.flush()
+        portal_session = ExamPortalSession(exam_id=exam.id, is_active=True, notes=marker)
+        db.add(portal_session)
+        await db.flush()
+        slot = ExamTimeSlot(
+            session_id=portal_session.id, date=date(2030, 1, 1), start_time="09:00",
+            total_seats=SEATS, waitlist_enabled=True,
+        )
+        students = [Student(first_name=f"S{i}", last_name=marker) for i in range(STUDENTS)]
+        db.add(slot)
+        db.add_all(students)
+        await db.commit()
+        exam_id, slot_id = exam.id, slot.id
+        student_ids = [s.id for s in students]
+
+    yield slot_id, student_ids
+
+    async with session_maker() as db:
+        await db.execute(delete(Exam).where(Exam.id == exam_id))
+        await db.execute(delete(Student).where(Student.id.in_(student_ids)))
+        await db.commit()
+
+
+async def test_concurrent_registration_fills_seats_exactly(session_maker, rush_slot):
+    slot_id, student_ids = rush_slot
+
+    async def register(student_id):
+        async with session_maker() as db:
+            return await reserve_seat(db, slot_id, student_id)
+
+    results = await asyncio.gather(*(register(sid) for sid in student_ids), return_exceptions=True)
+    errors = [r for r in results if isinstance(r, BaseException)]
+    assert not errors, errors[:3]
+    registered = [r for r in results if r[1] == RegistrationStatus.registered]
+    waitlisted = [r for r in results if r[1] == RegistrationStatus.waitlisted]
+    assert len(registered) == SEATS
+    assert len(waitlisted) == STUDENTS - SEATS
+
+    async with session_maker() as db:
+        count = (await db.execute(
+            select(ExamTimeSlot.registered_count).where(ExamTimeSlot.id == slot_id)
+        )).scalar_one()
+        rows = (await db.execute(
+            select(func.count()).select_from(ExamRegistration).where(
+                ExamRegistration.time_slot_id == slot_id,
+                ExamRegistration.status == RegistrationStatus.registered.value,
+            )
+        )).scalar_one()
+        assert count == rows == SEATS
+
+        with pytest.raises(HTTPException) as repeated:
+            await reserve_seat(db, slot_id, student_ids[0])
+        assert repeated.value.status_code == 400
+
+        first_waiting = (await db.execute(
+            select(ExamRegistration.id)
+            .where(
+                ExamRegistration.time_slot_id == slot_id,
+                ExamRegistration.status == RegistrationStatus.waitlisted.value,
+            )
+            .order_by(ExamRegistration.registered_at, ExamRegistration.id)
+            .limit(1)
+        )).scalar_one()
+        await release_registration(db, registered[0][0])
+        promoted = (await db.execute(
+            select(ExamRegistration.status).where(ExamRegistration.id == first_waiting)
+        )).scalar_one()
+        count = (await db.execute(
+            select(ExamTimeSlot.registered_count).where(ExamTimeSlot.id == slot_id)
+        )).scalar_one()
+        assert promoted == RegistrationStatus.registered.value
+        assert count == SEATS
@@ -0,0 +1,37 @@
+"""Бюджеты SQL-запросов: запрос на каждого получателя (N+1) роняет тест."""
+import uuid
+
+import pytest
+from sqlalchemy import delete
+
+from app.models.push_token import PushToken
+from app.services import push
+
+pytestmark = pytest.mark.anyio
+
+RECIPIENTS = 20
+
+
+async def test_send_push_to_users_looks_up_tokens_once(db, query_budget, monkeypatch):
+    owners = [(uuid.uuid4(), "student" if i % 2 else "app_user") for i in range(RECIPIENTS)]
+    tokens = [f"ExponentPushToken[test-{owner_id.hex}]" for owner_id, _ in owners]
+    db.add_all(
+        PushToken(owner_id=owner_id, owner_type=owner_type, token=token)
+        for (owner_id, owner_type), token in zip(owners, tokens)
+    )
+    await db.commit()
+
+    sent = []
+
+    async def capture_push(tokens, title, body, data=None, **kwargs):
+        # No call to Expo from tests
+        sent.extend(tokens)
+
+    monkeypatch.setattr(push, "send_push", capture_push)
+    try:
+        with query_budget(1):
+            await push.send_push_to_users(db, owners, "title", "body")
+        assert sorted(sent) == sorted(tokens)
+    finally:
+        await db.execute(delete(PushToken).where(PushToken.token.in_(tokens)))
+        await db.commit()